@@ -7,6 +7,7 @@ from flask_bcrypt import Bcrypt
 from flask_login import LoginManager
 from flask_marshmallow import Marshmallow
 from flask_mail import Mail
+from flask_migrate import Migrate
 
 from sqlalchemy_utils import database_exists
 from sqlalchemy import Table, MetaData
@@ -26,8 +27,11 @@ app.logger.setLevel(logging.INFO)
 app.logger.addHandler(logHandler) 
 
 app.config['SECRET_KEY'] = ''
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///site.db'
+# the database is avr/site.db, unless DATABASE_URI names another one (the tests use a temporary one)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URI', 'sqlite:///site.db')
 db = SQLAlchemy(app)
+# schema changes of existing databases, run them with: flask db upgrade
+migrate = Migrate(app, db, render_as_batch=True)
 bcrypt = Bcrypt(app)
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
@@ -45,12 +49,56 @@ app.config['RECAPTCHA_PRIVATE_KEY'] = ''
 app.config['RECAPTCHA_DATA_ATTRS'] = {'theme': 'light'}
 app.config['JSON_AS_ASCII'] = False
 app.config['MAX_CONTENT_LENGTH'] = 800 * 1024 * 1024  # 800MB max file upload limit.
+# seconds the GET showcase responses are fresh, and then served stale while they are revalidated (by their ETag)
+app.config['SHOWCASE_MAX_AGE'] = 60
+app.config['SHOWCASE_STALE_WHILE_REVALIDATE'] = 600
+# seconds between the reads of the cache invalidations of the other server processes (the longest a process shows old
+# filter options or showcase entries after another one changed them), seconds the invalidations are kept
+app.config['CACHE_SYNC_INTERVAL'] = 1
+app.config['CACHE_INVALIDATIONS_KEEP'] = 24 * 60 * 60
+# the showcase cache is kept in this file between restarts (in the instance folder, next to avr/, not served or committed),
+# the least seconds between its saves by the process that runs the YouTube jobs
+app.config['SHOWCASE_CACHE_FILE'] = os.path.join(app.instance_path, 'showcase_cache.json')
+app.config['SHOWCASE_SAVE_INTERVAL'] = 60
+# dynamic responses of these types and sizes (bytes) are compressed, with fast levels (the static files are compressed ahead)
+app.config['COMPRESS_MIN_SIZE'] = 500
+app.config['COMPRESS_MIMETYPES'] = {"text/html", "text/css", "text/plain", "text/xml", "text/javascript",
+	"application/json", "application/javascript", "application/xml", "image/svg+xml"}
+app.config['COMPRESS_GZIP_LEVEL'] = 6
+app.config['COMPRESS_BROTLI_QUALITY'] = 5
+# processes that convert and resize the uploaded images
+app.config['MEDIA_WORKERS'] = 2
+# the project doc videos are uploaded in chunks of this size (bytes), an upload that was not written for VIDEO_UPLOAD_EXPIRATION seconds is deleted
+app.config['VIDEO_UPLOAD_CHUNK_SIZE'] = 8 * 1024 * 1024
+app.config['VIDEO_UPLOAD_MAX_SIZE'] = 800 * 1024 * 1024
+app.config['VIDEO_UPLOAD_EXPIRATION'] = 24 * 60 * 60
+# threads that run the YouTube jobs (uploads etc.) of every server process, 0 when "flask run-youtube-jobs" runs them,
+# seconds between the checks for due jobs (jobs queued by the same process wake the workers up),
+# least and most seconds between the processing checks of a video, seconds after which a video that is still processed is not checked anymore
+app.config['YOUTUBE_WORKERS'] = 2
+app.config['YOUTUBE_JOBS_POLL_INTERVAL'] = 5
+app.config['YOUTUBE_PROCESSING_POLL_INTERVAL'] = 3
+app.config['YOUTUBE_PROCESSING_MAX_POLL_INTERVAL'] = 5 * 60
+app.config['YOUTUBE_PROCESSING_TIMEOUT'] = 4 * 60 * 60
+# seconds between the heartbeats of the running YouTube jobs of a process, seconds without a heartbeat after which a running job is queued again
+app.config['YOUTUBE_JOB_HEARTBEAT_INTERVAL'] = 30
+app.config['YOUTUBE_JOB_LEASE'] = 2 * 60
+# seconds between the heartbeats of a YouTube status stream, seconds without a new status after which it ends (the page connects again),
+# seconds between the status reads of the projects that have streams when the YouTube jobs run in another process
+app.config['STATUS_STREAM_HEARTBEAT'] = 15
+app.config['STATUS_STREAM_MAX_IDLE'] = 10 * 60
+app.config['STATUS_STREAM_POLL_INTERVAL'] = 3
 
 # this import should be at the bottom to avoid circular import
 from avr import routes
+from avr import commands
+from avr import search
+from avr import compression
+from avr import assets
+from avr import youtubeJobs
 
 
-if not database_exists("sqlite:///"+os.path.join("avr", "site.db")):
+if not database_exists(db.engine.url):
 	try:
 		db.create_all()
 		# create students table view
@@ -58,6 +106,10 @@ if not database_exists("sqlite:///"+os.path.join("avr", "site.db")):
 		view_definition = text("SELECT student.id, student.profilePic, project.year, project.semester, student.studentId, student.firstNameHeb, student.lastNameHeb, project.title as lastProjectTitle, project.status as lastProjectStatus, project.id as lastProjectId FROM student LEFT JOIN project ON project.id = (SELECT project.id FROM project LEFT JOIN student_project ON student_project.projectId=project.id WHERE student_project.studentId=student.id ORDER BY project.year DESC, project.semester ASC LIMIT 1)")
 		create_view = CreateView(studentsView, view_definition)
 		db.session.execute(create_view)
+		# full text search tables of the admin tables filters
+		for statement in search.schema():
+			db.session.execute(text(statement))
+		db.session.commit()
 	except Exception as e:
 		app.logger.error('{}\n{}'.format(e, traceback.format_exc()))
 
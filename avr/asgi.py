@@ -0,0 +1,152 @@
+import io
+import re
+import sys
+import asyncio
+import traceback
+from asgiref.wsgi import WsgiToAsgi
+from avr import app, routes
+from avr import statusHub
+
+# ASGI entry point of the site, run it with: uvicorn avr.asgi:application (in the main folder).
+# The YouTube status streams of the project status pages are served by the event loop: a stream is a task that waits for
+# the statuses of its project (statusHub.py), so hundreds of open pages don't need hundreds of threads.
+# Every other request, and a status stream the user can't watch, is passed to the Flask app, that runs in a thread pool.
+# The stream checks the user by the session cookie of the request, in the same way as the Flask view.
+
+flaskApplication = WsgiToAsgi(app)
+
+# path -> async handler of its GET requests, called with the match groups of the path
+streamRoutes = {}
+
+
+def streamRoute(pattern):
+	def register(handler):
+		streamRoutes[re.compile(pattern)] = handler
+		return handler
+	return register
+
+
+class LoopQueue:
+	# a subscriber of the status hub for a stream of the event loop: the hub puts the statuses from the thread that
+	# publishes them, the stream gets them in the loop
+	def __init__(self, loop):
+		self.loop = loop
+		self.queue = asyncio.Queue()
+
+	def put(self, status):
+		try:
+			self.loop.call_soon_threadsafe(self.queue.put_nowait, status)
+		except RuntimeError:
+			# the loop was closed
+			pass
+
+
+def _environ(scope):
+	# the WSGI environ of a request without a body (for the request context of the Flask app)
+	server = scope.get("server") or ("localhost", 80)
+	environ = {
+		"REQUEST_METHOD": scope["method"],
+		"SCRIPT_NAME": scope.get("root_path", ""),
+		"PATH_INFO": scope["path"],
+		"QUERY_STRING": scope["query_string"].decode("latin-1"),
+		"SERVER_NAME": server[0],
+		"SERVER_PORT": str(server[1]),
+		"SERVER_PROTOCOL": "HTTP/{}".format(scope["http_version"]),
+		"REMOTE_ADDR": scope["client"][0] if scope.get("client") else "",
+		"wsgi.version": (1, 0),
+		"wsgi.url_scheme": scope.get("scheme", "http"),
+		"wsgi.input": io.BytesIO(),
+		"wsgi.errors": sys.stderr,
+		"wsgi.multithread": True,
+		"wsgi.multiprocess": True,
+		"wsgi.run_once": False
+	}
+	for name, value in scope["headers"]:
+		name = name.decode("latin-1").upper().replace("-", "_")
+		value = value.decode("latin-1")
+		if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+			name = "HTTP_" + name
+		environ[name] = environ[name] + "," + value if name in environ else value
+	return environ
+
+
+def _youtubeStatus(environ, projectId):
+	# the YouTube status of the project when the user of the request can watch it, None otherwise
+	with app.request_context(environ):
+		project = routes.getYoutubeStatusProject(projectId)
+		return statusHub.projectStatus(project) if project is not None else None
+
+
+async def _waitForDisconnect(receive):
+	# the page was closed when the server receives http.disconnect (the request body comes before it)
+	while True:
+		message = await receive()
+		if message["type"] == "http.disconnect":
+			return
+
+
+async def _sendEvent(send, data):
+	await send({"type": "http.response.body", "body": data.encode("utf-8"), "more_body": True})
+
+
+@streamRoute(r"^/ProjectStatus/(\d+)/YoutubeStatus$")
+async def youtubeStatusStream(scope, receive, send, projectId):
+	# the same events as statusHub.stream, the status is read once (in a thread) and then pushed by the hub
+	projectId = int(projectId)
+	loop = asyncio.get_running_loop()
+	status = await loop.run_in_executor(None, _youtubeStatus, _environ(scope), projectId)
+	if status is None:
+		return await flaskApplication(scope, receive, send)
+
+	heartbeat = app.config['STATUS_STREAM_HEARTBEAT']
+	maxIdle = app.config['STATUS_STREAM_MAX_IDLE']
+	subscriber = statusHub.subscribe(projectId, status, LoopQueue(loop))
+	nextStatus = None
+	disconnected = asyncio.ensure_future(_waitForDisconnect(receive))
+	try:
+		await send({"type": "http.response.start", "status": 200, "headers": [
+			(b"content-type", b"text/event-stream; charset=utf-8"),
+			(b"cache-control", b"no-cache"),
+			(b"x-accel-buffering", b"no")
+		]})
+		await _sendEvent(send, statusHub.formatEvent(status))
+		idle = 0
+		nextStatus = asyncio.ensure_future(subscriber.queue.get())
+		while not statusHub.isFinal(status) and idle < maxIdle:
+			await asyncio.wait({nextStatus, disconnected}, timeout=heartbeat, return_when=asyncio.FIRST_COMPLETED)
+			if disconnected.done():
+				return
+			if nextStatus.done():
+				status = nextStatus.result()
+				nextStatus = asyncio.ensure_future(subscriber.queue.get())
+				idle = 0
+				await _sendEvent(send, statusHub.formatEvent(status))
+			else:
+				idle += heartbeat
+				await _sendEvent(send, ": heartbeat\n\n")
+		await send({"type": "http.response.body", "body": b"", "more_body": False})
+	except Exception as e:
+		app.logger.error('status stream of project {} failed, Error is: {}\n{}'.format(projectId, e, traceback.format_exc()))
+	finally:
+		disconnected.cancel()
+		if nextStatus is not None:
+			nextStatus.cancel()
+		statusHub.unsubscribe(projectId, subscriber)
+
+
+async def application(scope, receive, send):
+	if scope["type"] == "http" and scope["method"] == "GET":
+		for pattern, handler in streamRoutes.items():
+			match = pattern.match(scope["path"])
+			if match:
+				return await handler(scope, receive, send, *match.groups())
+	if scope["type"] == "lifespan":
+		# the Flask app has no startup or shutdown
+		while True:
+			message = await receive()
+			if message["type"] == "lifespan.startup":
+				await send({"type": "lifespan.startup.complete"})
+			elif message["type"] == "lifespan.shutdown":
+				await send({"type": "lifespan.shutdown.complete"})
+				return
+	return await flaskApplication(scope, receive, send)
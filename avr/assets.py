@@ -0,0 +1,194 @@
+import os
+import re
+import json
+import time
+import hashlib
+from flask import request, url_for
+from avr import app
+
+try:
+	import rjsmin
+except ImportError:
+	# rjsmin is optional, without it the bundles are built without minifying them
+	rjsmin = None
+
+# Fingerprinted static files.
+# "flask build-assets" copies every file under avr/static/js, css and fonts to avr/static/assets,
+# with a hash of its content in its name (js/editProject.js -> assets/js/editProject.<hash>.js),
+# builds the bundles and writes the manifest of the copies. A copy never changes, so it is sent with a one year immutable Cache-Control.
+# Templates link to the files with asset("css/layout.css") and to the bundles with bundle("js/adminTables.js") (a list of urls),
+# which fall back to the original files when the manifest has no copy of them (the build step wasn't run, or in debug mode).
+# A running server reads the manifest again when a build replaced it. The copies of the previous builds are kept (the last
+# keptBuilds builds and the builds of the last keptDays days), the pages and bundles browsers and the other server
+# processes still have link to them.
+
+assetsFolder = "assets"
+sourceFolders = ["js", "css", "fonts"]
+manifestFile = os.path.join(app.static_folder, assetsFolder, "manifest.json")
+hashLength = 10
+immutableCacheControl = "public, max-age=31536000, immutable"
+keptBuilds = 3
+keptDays = 7
+# seconds between the checks whether the manifest was replaced
+manifestCheckInterval = 1
+
+# bundle -> the files it joins, in order
+bundles = {
+	# every admin table page
+	"js/adminTables.js": ["js/bootstrap-table.js", "js/bootstrap-table-filter-control.js"],
+	# the admin pages that edit projects (projects and students)
+	"js/adminProjects.js": ["js/bootstrap-table.js", "js/bootstrap-table-filter-control.js", "js/editProject.js"]
+}
+
+_cssUrlPattern = re.compile(r"""url\(\s*(['"]?)([^'")?#]+)([^'")]*)\1\s*\)""")
+
+_manifest = {"files": {}, "bundles": {}}
+# modification time of the manifest that was read, and when it was checked last
+_manifestTime = None
+_manifestChecked = 0.0
+
+
+def _hashedName(path, data):
+	name, extension = os.path.splitext(path)
+	return f"{name}.{hashlib.sha1(data).hexdigest()[:hashLength]}{extension}"
+
+
+def _write(path, data):
+	fullPath = os.path.join(app.static_folder, path)
+	os.makedirs(os.path.dirname(fullPath), exist_ok=True)
+	if os.path.exists(fullPath):
+		return
+	temporaryFile = fullPath + ".tmp"
+	with open(temporaryFile, "wb") as f:
+		f.write(data)
+	os.replace(temporaryFile, fullPath)
+
+
+def _buildFile(path, files, building):
+	# copies the file (and the files a css file links to, first) with its hash, returns the path of the copy
+	if path in files:
+		return files[path]
+	with open(os.path.join(app.static_folder, path), "rb") as f:
+		data = f.read()
+	if path.endswith(".css"):
+		# a css file links to the copies of the files it uses, so its hash changes with theirs
+		building.add(path)
+		folder = os.path.dirname(path)
+
+		def linkCopy(match):
+			quote, url, suffix = match.groups()
+			target = os.path.normpath(os.path.join(folder, url)).replace(os.sep, "/")
+			if "://" in url or url.startswith("/") or target in building or not os.path.isfile(os.path.join(app.static_folder, target)):
+				return match.group(0)
+			copy = _buildFile(target, files, building)
+			return f"url({quote}{os.path.relpath(copy, os.path.join(assetsFolder, folder)).replace(os.sep, '/')}{suffix}{quote})"
+
+		data = _cssUrlPattern.sub(linkCopy, data.decode("utf8")).encode("utf8")
+		building.discard(path)
+	copy = _hashedName(os.path.join(assetsFolder, path).replace(os.sep, "/"), data)
+	_write(copy, data)
+	files[path] = copy
+	return copy
+
+
+def build():
+	# writes the copies, the bundles and the manifest, removes the copies of the builds that are not kept anymore, returns the manifest
+	files = {}
+	for folder in sourceFolders:
+		for root, _, names in os.walk(os.path.join(app.static_folder, folder)):
+			for name in names:
+				path = os.path.relpath(os.path.join(root, name), app.static_folder).replace(os.sep, "/")
+				_buildFile(path, files, set())
+	builtBundles = {}
+	for name, paths in bundles.items():
+		sources = []
+		for path in paths:
+			with open(os.path.join(app.static_folder, path), encoding="utf8") as f:
+				sources.append(f.read())
+		# the ";" ends a file that doesn't end its last statement
+		script = "\n;\n".join(sources)
+		if rjsmin:
+			script = rjsmin.jsmin(script)
+		data = script.encode("utf8")
+		builtBundles[name] = _hashedName(os.path.join(assetsFolder, name).replace(os.sep, "/"), data)
+		_write(builtBundles[name], data)
+	# the builds whose copies are kept, the newest first
+	current = sorted(set(files.values()) | set(builtBundles.values()))
+	builds = [{"builtAt": int(time.time()), "copies": current}] + _read().get("builds", [])
+	builds = [b for i, b in enumerate(builds) if i < keptBuilds or b["builtAt"] > time.time() - keptDays * 24 * 60 * 60]
+	manifest = {"files": files, "bundles": builtBundles, "builds": builds}
+	os.makedirs(os.path.dirname(manifestFile), exist_ok=True)
+	with open(manifestFile + ".tmp", "w", encoding="utf8") as f:
+		json.dump(manifest, f, indent=1, sort_keys=True)
+	os.replace(manifestFile + ".tmp", manifestFile)
+	# the copies (and their compressed siblings) that none of the kept builds links to
+	kept = {copy for b in builds for copy in b["copies"]}
+	for root, _, names in os.walk(os.path.join(app.static_folder, assetsFolder)):
+		for name in names:
+			path = os.path.relpath(os.path.join(root, name), app.static_folder).replace(os.sep, "/")
+			source = re.sub(r"\.(br|gz)$", "", path)
+			if source not in kept and path != os.path.relpath(manifestFile, app.static_folder).replace(os.sep, "/"):
+				os.remove(os.path.join(app.static_folder, path))
+	_load()
+	return manifest
+
+
+def _read():
+	try:
+		with open(manifestFile, encoding="utf8") as f:
+			return json.load(f)
+	except (OSError, ValueError):
+		return {"files": {}, "bundles": {}}
+
+
+def _modificationTime():
+	try:
+		return os.stat(manifestFile).st_mtime_ns
+	except OSError:
+		return None
+
+
+def _load():
+	global _manifest, _manifestTime
+	_manifestTime = _modificationTime()
+	_manifest = _read()
+
+
+def _current():
+	# the manifest, read again when a build replaced it (checked at most every manifestCheckInterval seconds)
+	global _manifestChecked
+	if time.monotonic() - _manifestChecked >= manifestCheckInterval:
+		_manifestChecked = time.monotonic()
+		if _modificationTime() != _manifestTime:
+			_load()
+	return _manifest
+
+
+@app.template_global()
+def asset(path):
+	# url of the fingerprinted copy of a static file
+	manifest = _current()
+	if not app.debug and path in manifest["files"]:
+		return url_for("static", filename=manifest["files"][path])
+	return url_for("static", filename=path)
+
+
+@app.template_global()
+def bundle(name):
+	# urls of a bundle, one url when it is built
+	manifest = _current()
+	if not app.debug and name in manifest["bundles"]:
+		return [url_for("static", filename=manifest["bundles"][name])]
+	return [url_for("static", filename=path) for path in bundles[name]]
+
+
+@app.after_request
+def cacheAssets(response):
+	# a copy never changes, browsers don't need to revalidate it
+	if (request.endpoint == "static" and response.status_code in (200, 304)
+			and request.view_args.get("filename", "").startswith(assetsFolder + "/")):
+		response.headers["Cache-Control"] = immutableCacheControl
+	return response
+
+
+_load()
@@ -0,0 +1,88 @@
+import json
+import time
+import secrets
+import traceback
+from threading import Lock
+from datetime import datetime, timedelta
+from avr import app
+from avr import database
+
+# Invalidations of the in-memory caches between the processes of the server (the gunicorn workers and the YouTube jobs
+# process). Every process has its own caches (facets.py and the table totals, showcase.py), an invalidation clears them
+# in the process that committed the change and is written to the database (a CacheInvalidation row), and every process
+# applies the invalidations of the other processes before it serves a request: one query of the last invalidation id,
+# at most every CACHE_SYNC_INTERVAL seconds, so another process shows a change at most that long after it was committed.
+# The invalidations are kept CACHE_INVALIDATIONS_KEEP seconds, a process that missed some that were deleted since then
+# (it served no request for that long) clears its caches.
+
+# cache name -> function that invalidates it in this process: called with the keys of an invalidation, None clears it
+_handlers = {}
+# this process in the invalidations it writes
+_origin = secrets.token_hex(8)
+_lock = Lock()
+_lastId = None			# the last invalidation applied by this process
+_startId = None			# where the caches that were loaded from a file start (see since())
+_lastSync = 0.0
+_lastCleanup = 0.0
+
+
+def register(cache, handler):
+	_handlers[cache] = handler
+
+
+def since(id):
+	# a cache was loaded from a file that has the invalidations up to this id, the later ones are applied by the first sync
+	global _startId
+	with _lock:
+		_startId = id if _startId is None else min(_startId, id)
+
+
+def publish(cache, keys=None):
+	# writes an invalidation (of the whole cache when keys is None) for the other processes,
+	# after the change was committed and the cache of this process was invalidated
+	global _lastCleanup
+	try:
+		database.addCacheInvalidation(cache, None if keys is None else json.dumps(keys), _origin)
+		if time.monotonic() - _lastCleanup > 60 * 60:
+			_lastCleanup = time.monotonic()
+			database.deleteCacheInvalidations(datetime.utcnow() - timedelta(seconds=app.config['CACHE_INVALIDATIONS_KEEP']))
+	except Exception as e:
+		app.logger.error('could not publish the invalidation of {}, Error is: {}\n{}'.format(cache, e, traceback.format_exc()))
+
+
+def _clearAll():
+	for handler in _handlers.values():
+		handler(None)
+
+
+def sync(force=False):
+	# applies the invalidations the other processes wrote since the last sync, returns the last invalidation id applied
+	global _lastId, _lastSync
+	with _lock:
+		if not force and time.monotonic() - _lastSync < app.config['CACHE_SYNC_INTERVAL']:
+			return _lastId
+		_lastSync = time.monotonic()
+		try:
+			lastId = database.getLastCacheInvalidationId()
+			if _lastId is None:
+				_lastId = lastId if _startId is None else min(_startId, lastId)
+			if lastId == _lastId:
+				return _lastId
+			invalidations = database.getCacheInvalidationsAfter(_lastId)
+			if invalidations and invalidations[0].id != _lastId + 1:
+				# the ones in between were deleted
+				app.logger.info('the cache invalidations after {} were deleted, the caches are cleared'.format(_lastId))
+				_clearAll()
+			else:
+				for invalidation in invalidations:
+					if invalidation.origin != _origin and invalidation.cache in _handlers:
+						_handlers[invalidation.cache](None if invalidation.keys is None else json.loads(invalidation.keys))
+			_lastId = invalidations[-1].id if invalidations else lastId
+		except Exception as e:
+			app.logger.error('could not apply the cache invalidations, Error is: {}\n{}'.format(e, traceback.format_exc()))
+		return _lastId
+
+
+@app.before_request
+def syncCaches():
+	sync()
@@ -0,0 +1,191 @@
+import sys
+import json
+import time
+import click
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import event
+from sqlalchemy.sql import text
+from avr import app, db
+from avr import database
+from avr import showcase
+from avr import compression
+from avr import assets
+from avr import images
+from avr import media
+from avr import filestore
+from avr import youtubeJobs
+from avr.models import StudentLastProject, Project, Student
+
+# flask command line commands, run them with: flask <command name> (FLASK_APP should be set to run.py)
+
+
+@app.cli.command("rebuild-students-table")
+def rebuildStudentsTable():
+	"""Create (if needed) and backfill the student_last_project table."""
+	StudentLastProject.__table__.create(db.engine, checkfirst=True)
+	totalStudents = database.rebuildStudentsLastProject()
+	click.echo(f"student_last_project was rebuilt, {totalStudents} students")
+
+
+@app.cli.command("check-students-table")
+def checkStudentsTable():
+	"""Compare the student_last_project table with students_view."""
+	studentsIds = database.checkStudentsLastProject()
+	if studentsIds:
+		click.echo(f"student_last_project is NOT consistent for students: {studentsIds}")
+		click.echo("run: flask rebuild-students-table")
+		sys.exit(1)
+	click.echo("student_last_project is consistent")
+
+
+@app.cli.command("rebuild-search-index")
+def rebuildSearchIndex():
+	"""Refill the full text search tables of the admin tables text filters."""
+	database.rebuildSearchIndexes()
+	click.echo("the search tables were rebuilt")
+
+
+@app.cli.command("rebuild-showcase-cache")
+def rebuildShowcaseCache():
+	"""Empty the showcase cache of the running server processes and write its file built again from the database."""
+	showcase.rebuild()
+	click.echo("the showcase cache was rebuilt")
+
+
+@app.cli.command("build-image-variants")
+def buildImageVariants():
+	"""Run the media jobs that were left pending and write the missing resized (and WebP) variants of the uploaded images."""
+	pendingJobs = media.runPendingJobs()
+	if pendingJobs:
+		click.echo(f"{pendingJobs} pending media jobs were run")
+	totalImages, writtenFiles = images.buildVariants()
+	# the showcase cache has the urls of the original images of the projects that had no variants
+	showcase.rebuild()
+	click.echo(f"{totalImages} images, {writtenFiles} variant files were written")
+
+
+@app.cli.command("check-file-store")
+def checkFileStore():
+	"""Compare the references of the uploaded files in the file store with the rows that refer to them."""
+	differences = filestore.check()
+	for folder, name, storedReferences, databaseReferences in differences:
+		click.echo(f"{folder}/{name}: {storedReferences} references in the store, {databaseReferences} in the database")
+	if differences:
+		sys.exit(1)
+	click.echo("the file store references are consistent")
+
+
+@app.cli.command("run-youtube-jobs")
+@click.option("--workers", default=2, help="number of worker threads")
+def runYoutubeJobs(workers):
+	"""Run the YouTube jobs and the pending media jobs in this process until it's stopped (for servers whose YOUTUBE_WORKERS is 0)."""
+	media.startPendingJobs()
+	threads = youtubeJobs.startWorkers(workers)
+	# the last threads are the heartbeat of the leases and the processing poller
+	click.echo(f"{len(threads) - 2} YouTube workers and the processing poller are running, stop them with Ctrl+C")
+	# this process saves the showcase cache file of the server
+	threads.append(showcase.startSaving())
+	for thread in threads:
+		thread.join()
+
+
+@app.cli.command("build-assets")
+def buildAssets():
+	"""Write the fingerprinted copies of the js, css and font files, the admin js bundles and their manifest."""
+	manifest = assets.build()
+	click.echo(f"{len(manifest['files'])} files and {len(manifest['bundles'])} bundles were written to avr/static/{assets.assetsFolder}")
+	if not assets.rjsmin:
+		click.echo("rjsmin is not installed, the bundles were not minified")
+
+
+@app.cli.command("compress-static")
+def compressStatic():
+	"""Write the .br and .gz siblings of the compressible files under avr/static that are missing or outdated."""
+	compressedFiles = compression.compressStatic()
+	click.echo(f"{compressedFiles} compressed files were written")
+	if not compression.brotli:
+		click.echo("brotli is not installed, only .gz files were written")
+
+
+@app.cli.command("benchmark-tables")
+@click.option("--iterations", default=1000, help="page requests per table")
+def benchmarkTables(iterations):
+	"""Compare the string built table queries with the table query engine."""
+	years = [str(year) for year, in db.session.query(Project.year).distinct()] or ["2020"]
+	names = [name for name, in db.session.query(Student.firstNameHeb).distinct().limit(20)] or ["a"]
+
+	def legacyProjectsPage(i):
+		# how the projects table was queried before the engine: SQL text with the values inside it, page + count
+		filters_query = f" AND year='{years[i % len(years)]}'"
+		db.session.execute(text("SELECT * FROM project WHERE 1=1" + filters_query + " ORDER BY title asc LIMIT 10 OFFSET 0")).fetchall()
+		db.session.execute(text("SELECT count(*) FROM project WHERE 1=1" + filters_query)).scalar()
+
+	def legacyStudentsPage(i):
+		word = names[i % len(names)]
+		filters_query = f" AND ((firstNameHeb LIKE '%{word}%') OR (lastNameHeb LIKE '%{word}%'))"
+		db.session.execute(text("SELECT * FROM student_last_project WHERE 1=1" + filters_query + " ORDER BY lastNameHeb asc LIMIT 10 OFFSET 0")).fetchall()
+		db.session.execute(text("SELECT count(*) FROM student_last_project WHERE 1=1" + filters_query)).scalar()
+
+	def engineProjectsPage(i):
+		database.projectsTable.getPage("title", "asc", 10, 0, json.dumps({"year": years[i % len(years)]}))
+
+	def engineStudentsPage(i):
+		database.studentsTable.getPage("lastNameHeb", "asc", 10, 0, json.dumps({"firstNameHeb": names[i % len(names)]}))
+
+	def run(name, page):
+		# the statements a page is compiled into are counted by their compiled objects (a statement the compiled
+		# cache returns is compiled once)
+		compiled = set()
+
+		def collect(conn, cursor, statement, parameters, context, executemany):
+			compiled.add(context.compiled)
+
+		event.listen(db.engine, "before_cursor_execute", collect)
+		try:
+			start = time.perf_counter()
+			for i in range(iterations):
+				page(i)
+			elapsed = time.perf_counter() - start
+		finally:
+			event.remove(db.engine, "before_cursor_execute", collect)
+		click.echo(f"{name:<20} {elapsed / iterations * 1000000:10.1f} us per page, {len(compiled)} statements compiled")
+
+	run("legacy projects", legacyProjectsPage)
+	run("engine projects", engineProjectsPage)
+	run("legacy students", legacyStudentsPage)
+	run("engine students", engineStudentsPage)
+	db.session.rollback()
+
+
+@app.cli.command("benchmark-server")
+@click.argument("urls", nargs=-1, required=True)
+@click.option("--requests", "totalRequests", default=2000, help="requests per url")
+@click.option("--concurrency", default=32, help="requests sent at the same time")
+@click.option("--cookie", default="", help="Cookie header of the requests (for the pages that need a login)")
+def benchmarkServer(urls, totalRequests, concurrency, cookie):
+	"""Send GET requests to the urls of a running server (the dev server or gunicorn) and print its throughput and latencies."""
+	def send(url):
+		start = time.perf_counter()
+		try:
+			with urllib.request.urlopen(urllib.request.Request(url, headers={"Cookie": cookie}), timeout=60) as response:
+				response.read()
+				ok = response.status == 200
+		except (urllib.error.URLError, OSError):
+			ok = False
+		return time.perf_counter() - start, ok
+
+	for url in urls:
+		start = time.perf_counter()
+		with ThreadPoolExecutor(max_workers=concurrency) as executor:
+			results = list(executor.map(send, [url] * totalRequests))
+		elapsed = time.perf_counter() - start
+		latencies = sorted(latency for latency, _ in results)
+		errors = sum(1 for _, ok in results if not ok)
+
+		def percentile(p):
+			return latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000
+
+		click.echo(f"{url}\n    {totalRequests / elapsed:8.1f} requests/s, {errors} errors, latency ms: "
+			f"p50 {percentile(0.5):.1f}, p95 {percentile(0.95):.1f}, p99 {percentile(0.99):.1f}, max {latencies[-1] * 1000:.1f}")
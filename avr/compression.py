@@ -0,0 +1,112 @@
+import os
+import gzip
+import mimetypes
+from flask import request, send_from_directory
+from avr import app
+
+try:
+	import brotli
+except ImportError:
+	# brotli is optional, without it responses are compressed with gzip only
+	brotli = None
+
+# Compression of the responses.
+# Dynamic responses (pages, admin tables JSON etc.) above COMPRESS_MIN_SIZE are compressed when they are sent.
+# Static files are never compressed when they are requested:
+# "flask compress-static" writes a .br and a .gz sibling next to every compressible file under avr/static,
+# and the static route sends the sibling the client accepts (or the file itself when there is none or it is older).
+
+# extensions of the static files that are worth compressing (images, woff and documents already are)
+staticExtensions = {".js", ".css", ".svg", ".ttf", ".eot", ".otf", ".json", ".html", ".txt", ".map", ".xml"}
+# encoding -> extension of its sibling, in order of preference
+encodings = {"br": ".br", "gzip": ".gz"}
+
+
+def _acceptedEncoding():
+	# the best encoding the client accepts, None for none
+	available = [encoding for encoding in encodings if encoding != "br" or brotli]
+	return request.accept_encodings.best_match(available)
+
+
+def _compress(data, encoding, best=False):
+	if encoding == "br":
+		return brotli.compress(data, quality=11 if best else app.config['COMPRESS_BROTLI_QUALITY'])
+	return gzip.compress(data, compresslevel=9 if best else app.config['COMPRESS_GZIP_LEVEL'])
+
+
+@app.after_request
+def compressResponse(response):
+	# files (direct passthrough) and streams (the status event streams) are sent as they are
+	if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+			or "Content-Encoding" in response.headers or response.mimetype not in app.config['COMPRESS_MIMETYPES']):
+		return response
+	response.vary.add("Accept-Encoding")
+	if response.content_length is not None and response.content_length < app.config['COMPRESS_MIN_SIZE']:
+		return response
+	encoding = _acceptedEncoding()
+	if encoding is None:
+		return response
+	response.set_data(_compress(response.get_data(), encoding))
+	response.headers["Content-Encoding"] = encoding
+	# the compressed bytes differ from the ones the ETag was computed for,
+	# a weak ETag still answers If-None-Match (which is compared weakly) with 304
+	etag, weak = response.get_etag()
+	if etag and not weak:
+		response.set_etag(etag, weak=True)
+	return response
+
+
+def sendStatic(filename):
+	# replaces the static route of flask, it sends the precompressed sibling of the file when the client accepts it
+	encoding = _acceptedEncoding()
+	if encoding is not None and os.path.splitext(filename)[1].lower() in staticExtensions:
+		path = os.path.join(app.static_folder, filename)
+		compressedPath = path + encodings[encoding]
+		try:
+			upToDate = os.path.getmtime(compressedPath) >= os.path.getmtime(path)
+		except OSError:
+			upToDate = False
+		if upToDate:
+			response = send_from_directory(app.static_folder, filename + encodings[encoding],
+				mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream")
+			response.headers["Content-Encoding"] = encoding
+			response.vary.add("Accept-Encoding")
+			return response
+	response = send_from_directory(app.static_folder, filename)
+	if os.path.splitext(filename)[1].lower() in staticExtensions:
+		response.vary.add("Accept-Encoding")
+	return response
+
+
+app.view_functions["static"] = sendStatic
+
+
+def compressStatic():
+	# writes the missing and outdated siblings of the static files, returns the number of siblings written
+	# (an outdated sibling that isn't written again is never sent, the static route checks that it is newer than its file)
+	compressedFiles = 0
+	for folder, _, files in os.walk(app.static_folder):
+		for name in files:
+			path = os.path.join(folder, name)
+			if os.path.splitext(name)[1].lower() not in staticExtensions:
+				continue
+			data = None
+			for encoding, compressedExtension in encodings.items():
+				if encoding == "br" and not brotli:
+					continue
+				compressedPath = path + compressedExtension
+				if os.path.exists(compressedPath) and os.path.getmtime(compressedPath) >= os.path.getmtime(path):
+					continue
+				if data is None:
+					with open(path, "rb") as f:
+						data = f.read()
+				compressed = _compress(data, encoding, best=True)
+				# a file that doesn't get smaller is sent as it is
+				if len(compressed) >= len(data):
+					continue
+				temporaryFile = compressedPath + ".tmp"
+				with open(temporaryFile, "wb") as f:
+					f.write(compressed)
+				os.replace(temporaryFile, compressedPath)
+				compressedFiles += 1
+	return compressedFiles
@@ -1,14 +1,31 @@
 from avr import models
 from avr import db
-import json
 from avr import utils
-from sqlalchemy import or_
+from avr import facets
+from avr import tables
+from avr import search
+from avr import showcase
+from sqlalchemy.sql import text, bindparam, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from datetime import datetime
 
 ############################ Projects ############################
 
 def getProjectById(id):
 	return models.Project.query.filter_by(id=id).first()
 
+def getProjectsByIds(ids):
+	return models.Project.query.filter(models.Project.id.in_(ids)).all()
+
+def projectWithPeople():
+	# query of projects that loads their students (with their course ids) and supervisors,
+	# 3 queries for any number of projects: the projects, their students and their supervisors
+	return models.Project.query.options(selectinload(models.Project.studentProjects), selectinload(models.Project.supervisorsList))
+
+def getProjectWithPeople(id):
+	return projectWithPeople().filter_by(id=id).first()
+
 def getProjectsCount():
 	return models.Project.query.count()
 
@@ -18,15 +35,28 @@ def addProject(newProject):
 		project.__setattr__(field, data)
 	db.session.add(project)
 	db.session.commit()
+	facets.invalidate("project")
 	return project.id
 
 def updateProject(id, newData):
 	project = getProjectById(id)
 	for field, data in newData.items():
 		project.__setattr__(field, data)
+	# these fields decide which project is the last project of a student and how it is shown
+	tableFieldsChanged = {"title", "year", "semester", "status"} & newData.keys()
+	if tableFieldsChanged:
+		refreshStudentsLastProject(getProjectStudentsIds(id))
+	# these fields decide if the project is in the showcase search and what is found there
+	if {"title", "abstract", "published", "projectDocApproved"} & newData.keys():
+		refreshShowcaseSearch([id])
 	db.session.commit()
+	if tableFieldsChanged:
+		facets.invalidate("project", "student_last_project")
+	if showcase.projectFields & newData.keys():
+		showcase.invalidate([id])
 
 def updateProjectStudents(id, students):
+	oldStudentsIds = getProjectStudentsIds(id)
 	# delete old students
 	models.StudentProject.query.filter_by(projectId=id).delete()
 	# add new students
@@ -35,7 +65,11 @@ def updateProjectStudents(id, students):
 		db.session.add(studentProject)
 		# register students
 		models.Student.query.filter_by(id=s["id"]).first().isRegistered = True
+	refreshStudentsLastProject(set(oldStudentsIds) | {int(s["id"]) for s in students})
+	refreshShowcaseSearch([id])
 	db.session.commit()
+	facets.invalidate("student_last_project")
+	showcase.invalidate([id])
 
 
 def updateProjectPublishState(id, state):
@@ -46,7 +80,9 @@ def updateProjectPublishState(id, state):
 		project.published = True
 	else:
 		project.published = False
+	refreshShowcaseSearch([id])
 	db.session.commit()
+	showcase.invalidate([id])
 	return True
 
 
@@ -57,7 +93,9 @@ def updateProjectSupervisors(id, supervisorsIds):
 	# add new supervisors
 	for supervisorId in supervisorsIds:
 		project.supervisors.append(getSupervisorById(supervisorId)) 
+	refreshShowcaseSearch([id])
 	db.session.commit()
+	showcase.invalidate([id])
 
 def updateProjectStatus(id, statusList):
 	project = getProjectById(id)
@@ -65,52 +103,43 @@ def updateProjectStatus(id, statusList):
 		project.__setattr__(field, data)
 	# overall status
 	project.status = project.calculateStatus()
+	refreshStudentsLastProject(getProjectStudentsIds(id))
 	db.session.commit()
+	facets.invalidate("project", "student_last_project")
 
 def deleteProject(id):
 	project = getProjectById(id)
+	studentsIds = getProjectStudentsIds(id)
 	# delete all students from project
 	models.StudentProject.query.filter_by(projectId=id).delete()
 	# delete all supervisors from project
 	project.supervisors = []
 	# delete project
 	db.session.delete(project)
+	refreshStudentsLastProject(studentsIds)
+	refreshShowcaseSearch([id])
 	db.session.commit()
-
-def getProjectsTableData(sort, order, limit, offset, filters):
-	filters_query = ""
-	if filters:
-		filters = json.loads(filters)
-		if "year" in filters:
-			filters_query += f" AND year='{filters['year']}'"
-		if "semester" in filters:
-			filters_query += f" AND semester='{filters['semester']}'"
-		if "status" in filters:
-			if filters['status'] == "ongoing":
-				filters_query += f" AND status!='הושלם' AND status!='פוסטר'"
-			elif filters['status'] == "הושלם":
-				filters_query += f" AND (status='הושלם' OR status='פוסטר')"
-			else:
-				filters_query += f" AND status='{filters['status']}'"
-			
-	
-	sort_query = ""
-	if sort:
-		if sort == "year":
-			sort_query = " ORDER BY year " + order + ", semester"
-		elif sort == "semester":
-			sort_query = " ORDER BY semester " + order
-		elif sort == "title":
-			sort_query = " ORDER BY title " + order
-		elif sort == "status":
-			sort_query = " ORDER BY status " + order
-
-	
-	result_query = db.session.execute("SELECT * FROM project WHERE 1=1" + filters_query + sort_query + " LIMIT " + limit + " OFFSET " + offset)
-	count_query = db.session.execute("SELECT count(*) FROM project WHERE 1=1" + filters_query)
-	totalResults = count_query.scalar()
-	return totalResults, result_query
-
+	facets.invalidate("project", "student_last_project")
+	showcase.invalidate([id])
+
+projectsTable = tables.Table(models.Project.__table__,
+	sortKeys={
+		"year": [("year", None), ("semester", False)],
+		"semester": [("semester", None)],
+		"title": [("title", None)],
+		"status": [("status", None)]
+	},
+	filters={
+		"year": tables.Equals("year"),
+		"semester": tables.Equals("semester"),
+		"status": tables.Status("status"),
+		"title": tables.Equals("title")
+	})
+
+def getProjectsTableData(sort, order, limit, offset, filters, cursor=None):
+	return projectsTable.getPage(sort, order, limit, offset, filters, cursor)
+
+@facets.cached("projectsTable", tables=["project"])
 def getProjectsTableFilters():
 	# ------- project title filters
 	projectTitleFilters_query = db.session.execute("SELECT DISTINCT title FROM project")
@@ -156,11 +185,26 @@ def getProjectsTableFilters():
 def getPublishedProjectsYears():
 	return [project.year for project in db.session.query(models.Project.year).filter_by(projectDocApproved=True, published=True).order_by(models.Project.year.desc()).distinct()]
 
+def getPublishedProjectsYearsOf(projectsIds):
+	# the years of these projects that are published
+	return [project.year for project in db.session.query(models.Project.year).filter(models.Project.id.in_(projectsIds)).filter_by(projectDocApproved=True, published=True).distinct()]
+
 def getPublishedProjectsByYear(year):
 	return models.Project.query.filter_by(year=year, projectDocApproved=True, published=True).with_entities(models.Project.id, models.Project.projectDocImage, models.Project.title, models.Project.abstract)
 
 def getPublishedProjectDetails(id):
-	return models.Project.query.filter_by(id=id, projectDocApproved=True, published=True).first()
+	return projectWithPeople().filter_by(id=id, projectDocApproved=True, published=True).first()
+
+def searchPublishedProjects(query, limit):
+	# the published projects that have all the words (as prefixes) in their title, abstract, supervisors or students, best first
+	matchQuery = search.matchQuery(query, allWords=True)
+	if matchQuery is None:
+		return []
+	weights = ", ".join(str(weight) for weight in search.showcaseWeights)
+	return db.session.execute(text("SELECT project.id, project.title, project.projectDocImage, project.abstract, project.year "
+		"FROM showcase_search JOIN project ON project.id = showcase_search.rowid "
+		"WHERE showcase_search MATCH :matchQuery AND project.published = 1 AND project.projectDocApproved = 1 "
+		f"ORDER BY bm25(showcase_search, {weights}) LIMIT :limit"), {"matchQuery": matchQuery, "limit": limit}).fetchall()
 
 ############################ Students ############################
 
@@ -173,6 +217,10 @@ def getStudentById(id):
 def getStudentByStudentId(studentId):
 	return models.Student.query.filter_by(studentId=studentId).first()
 
+def getStudentWithProjects(studentId):
+	# the student and their projects in 2 queries
+	return models.Student.query.options(selectinload(models.Student.projects)).filter_by(studentId=studentId).first()
+
 def getStudentByEmail(email):
 	return models.Student.query.filter_by(email=email).first()
 
@@ -180,6 +228,12 @@ def getCourseIdForStudentInProject(projectId, studentId):
 	studentProject =  models.StudentProject.query.filter_by(projectId=projectId, studentId=studentId).first()
 	return studentProject.courseId
 
+def getProjectStudentsIds(projectId):
+	return [sp.studentId for sp in db.session.query(models.StudentProject.studentId).filter_by(projectId=projectId)]
+
+def getStudentProjectsIds(id):
+	return [sp.projectId for sp in db.session.query(models.StudentProject.projectId).filter_by(studentId=id)]
+
 def studentHasRelatedProjects(id):
 	hasRelatedProjects = models.StudentProject.query.filter_by(studentId=id).first()
 	return hasRelatedProjects
@@ -193,7 +247,13 @@ def updateStudent(id, newData):
 
 	for field, data in newData.items():
 		student.__setattr__(field, data)
+	refreshStudentsLastProject([student.id])
+	if {"firstNameHeb", "lastNameHeb", "firstNameEng", "lastNameEng"} & newData.keys():
+		refreshShowcaseSearch(getStudentProjectsIds(id))
 	db.session.commit()
+	facets.invalidate("student", "student_last_project")
+	if showcase.studentFields & newData.keys():
+		showcase.invalidate(getStudentProjectsIds(id))
 
 def registerStudent(studentData):
 	student = models.Student()
@@ -202,94 +262,54 @@ def registerStudent(studentData):
 	user = models.User(userId=student.studentId, userType="student")
 	db.session.add(student)
 	db.session.add(user)
+	db.session.flush()
+	refreshStudentsLastProject([student.id])
 	db.session.commit()
+	facets.invalidate("student", "student_last_project")
 
 def deleteStudent(id):
+	projectsIds = getStudentProjectsIds(id)
 	# remove all projects that this student is related to
 	models.StudentProject.query.filter_by(studentId=id).delete()
 	# remove from users table
 	student = getStudentById(id)
 	models.User.query.filter_by(userId=student.studentId).delete()
+	models.StudentLastProject.query.filter_by(id=id).delete()
 	db.session.delete(student)
+	refreshShowcaseSearch(projectsIds)
 	db.session.commit()
+	facets.invalidate("student", "student_last_project")
+	showcase.invalidate(projectsIds)
 
 def isStudentEnrolledInProject(projectId, studentId):
 	return models.StudentProject.query.filter_by(projectId=projectId, studentId=studentId).first()
 
-def getStudentsTableData(sort, order, limit, offset, filters):
-	filters_query = ""
-	if filters:
-		filters = json.loads(filters)
-		if "year" in filters:
-			if filters['year'] == "----":
-				filters_query += f" AND year IS NULL"
-			else:
-				filters_query += f" AND year='{filters['year']}'"
-		if "semester" in filters:
-			if filters['semester'] == "----":
-				filters_query += f" AND semester IS NULL"
-			else:
-				filters_query += f" AND semester='{filters['semester']}'"
-		if "firstNameHeb" in filters:
-			filters_query += " AND ("
-			words_splitted = filters['firstNameHeb'].split()
-			# search any word in first name
-			for word in words_splitted:
-				filters_query += f" (firstNameHeb LIKE '%{word}%')"
-				if word != words_splitted[-1]:
-					filters_query += " OR"
-			
-			filters_query += " OR"
-			# also, search any word in last name
-			for word in words_splitted:
-				filters_query += f" (lastNameHeb LIKE '%{word}%')"
-				if word != words_splitted[-1]:
-					filters_query += " OR" 
-
-			filters_query += ")"
-
-			
-		if "lastProjectTitle" in filters:
-			if filters['lastProjectTitle'] == "NO PROJECT":
-				filters_query += f" AND lastProjectTitle IS NULL"
-			else:
-				filters_query += f" AND lastProjectTitle='{filters['lastProjectTitle']}'"
-		if "lastProjectStatus" in filters:
-			if filters['lastProjectStatus'] == "----":
-				filters_query += f" AND lastProjectStatus IS NULL"
-			elif filters['lastProjectStatus'] == "ongoing":
-				filters_query += f" AND lastProjectStatus!='הושלם' AND lastProjectStatus!='פוסטר'"
-			elif filters['lastProjectStatus'] == "הושלם":
-				filters_query += f" AND (lastProjectStatus='הושלם' OR lastProjectStatus='פוסטר')"
-			else:
-				filters_query += f" AND lastProjectStatus='{filters['lastProjectStatus']}'"
-	
-	sort_query = ""
-	if sort:
-		if sort == "year":
-			sort_query = " ORDER BY year " + order
-		elif sort == "semester":
-			sort_query = " ORDER BY semester " + order
-		elif sort == "studentId":
-			sort_query = " ORDER BY studentId " + order
-		elif sort == "firstNameHeb":
-			sort_query = " ORDER BY firstNameHeb " + order
-		elif sort == "lastNameHeb":
-			sort_query = " ORDER BY lastNameHeb " + order
-		elif sort == "lastProjectTitle":
-			sort_query = " ORDER BY lastProjectTitle " + order
-		elif sort == "lastProjectStatus":
-			sort_query = " ORDER BY lastProjectStatus " + order
-
-	
-	result_query = db.session.execute("SELECT * FROM students_view WHERE 1=1" + filters_query + sort_query + " LIMIT " + limit + " OFFSET " + offset)
-	count_query = db.session.execute("SELECT count(*) FROM students_view WHERE 1=1" + filters_query)
-	totalResults = count_query.scalar()
-	return totalResults, result_query
-
+studentsTable = tables.Table(models.StudentLastProject.__table__,
+	sortKeys={
+		"year": [("year", None)],
+		"semester": [("semester", None)],
+		"studentId": [("studentId", None)],
+		"firstNameHeb": [("firstNameHeb", None)],
+		"lastNameHeb": [("lastNameHeb", None)],
+		"lastProjectTitle": [("lastProjectTitle", None)],
+		"lastProjectStatus": [("lastProjectStatus", None)]
+	},
+	filters={
+		"year": tables.Equals("year", nullValue="----"),
+		"semester": tables.Equals("semester", nullValue="----"),
+		# search any word in the names, id or email
+		"firstNameHeb": tables.Search("student_search"),
+		"lastProjectTitle": tables.Equals("lastProjectTitle", nullValue="NO PROJECT"),
+		"lastProjectStatus": tables.Status("lastProjectStatus", nullValue="----")
+	})
+
+def getStudentsTableData(sort, order, limit, offset, filters, cursor=None):
+	return studentsTable.getPage(sort, order, limit, offset, filters, cursor)
+
+@facets.cached("studentsTable", tables=["student_last_project"])
 def getStudentsTableFilters():
 	# ------- lastProjectTitle filters
-	lastProjectTitleFilters_query = db.session.execute("SELECT DISTINCT lastProjectTitle FROM students_view")
+	lastProjectTitleFilters_query = db.session.execute("SELECT DISTINCT lastProjectTitle FROM student_last_project")
 	lastProjectTitleFilters = [{"value": "", "text": "ALL"}]
 	for r in lastProjectTitleFilters_query:
 		lastProjectTitleFilters.append({
@@ -297,7 +317,7 @@ def getStudentsTableFilters():
 			"text": r.lastProjectTitle or "NO PROJECT"
 		})
 	# ------- lastProjectStatus filters
-	lastProjectStatusFilters_query = db.session.execute("SELECT DISTINCT lastProjectStatus FROM students_view")
+	lastProjectStatusFilters_query = db.session.execute("SELECT DISTINCT lastProjectStatus FROM student_last_project")
 	lastProjectStatusFilters = [{"value": "", "text": "ALL"}, {"value": "ongoing", "text": "Ongoing"}]
 	for r in lastProjectStatusFilters_query:
 		lastProjectStatusFilters.append({
@@ -305,7 +325,7 @@ def getStudentsTableFilters():
 			"text": r.lastProjectStatus or "----"
 		})
 	# ------- year filters
-	yearFilters_query = db.session.execute("SELECT DISTINCT year FROM students_view")
+	yearFilters_query = db.session.execute("SELECT DISTINCT year FROM student_last_project")
 	yearFilters = [{"value": "", "text": "ALL"}]
 	for r in yearFilters_query:
 		yearFilters.append({
@@ -313,7 +333,7 @@ def getStudentsTableFilters():
 			"text": r.year or "----"
 		})
 	# ------- semester filters
-	semesterFilters_query = db.session.execute("SELECT DISTINCT semester FROM students_view")
+	semesterFilters_query = db.session.execute("SELECT DISTINCT semester FROM student_last_project")
 	semesterFilters = [{"value": "", "text": "ALL"}]
 	for r in semesterFilters_query:
 		semesterFilters.append({
@@ -328,38 +348,26 @@ def getStudentsTableFilters():
 	}
 	return filterOptions
 
+studentsForProjectTable = tables.Table(models.Student.__table__,
+	sortKeys={
+		"registrationYear": [("year", None)],
+		"registrationSemester": [("semester", None)],
+		"studentId": [("studentId", None)],
+		"firstNameHeb": [("firstNameHeb", None)],
+		"lastNameHeb": [("lastNameHeb", None)]
+	},
+	filters={
+		"registrationYear": tables.Equals("year"),
+		"registrationSemester": tables.Equals("semester"),
+		# search any word in the names, id or email
+		"firstNameHeb": tables.Search("student_search")
+	})
+
 def getStudentsTableForProjectData(sort, order, limit, offset, filters):
-	query = models.Student.query.filter()
-	if filters:
-		filters = json.loads(filters)
-		if "registrationYear" in filters:
-			query = query.filter_by(year=filters["registrationYear"])
-		if "registrationSemester" in filters:
-			query = query.filter_by(semester=filters["registrationSemester"])
-		if "firstNameHeb" in filters:
-			query = query.filter(
-					or_(
-						*[models.Student.firstNameHeb.like("%"+name+"%") for name in filters["firstNameHeb"].split()],
-						*[models.Student.lastNameHeb.like("%"+name+"%") for name in filters["firstNameHeb"].split()],
-					)
-			) 
-	
-	if sort:
-		if sort == "registrationYear":
-			query = query.order_by(models.Student.year.desc() if order == "desc" else models.Student.year.asc())
-		elif sort == "registrationSemester":
-			query = query.order_by(models.Student.semester.desc() if order == "desc" else models.Student.semester.asc())
-		elif sort == "studentId":
-			query = query.order_by(models.Student.studentId.desc() if order == "desc" else models.Student.studentId.asc())
-		elif sort == "firstNameHeb":
-			query = query.order_by(models.Student.firstNameHeb.desc() if order == "desc" else models.Student.firstNameHeb.asc())
-		elif sort == "lastNameHeb":
-			query = query.order_by(models.Student.lastNameHeb.desc() if order == "desc" else models.Student.lastNameHeb.asc())
-	
-	totalResults = query.count()
-	query_results = query.paginate(int(int(offset)/int(limit))+1, int(limit), False).items
-	return totalResults, query_results
+	totalResults, results, _ = studentsForProjectTable.getPage(sort, order, limit, offset, filters)
+	return totalResults, results
 
+@facets.cached("studentsForProjectTable", tables=["student"])
 def getStudentsTableForProjectFilters():
 	# ------- year filters
 	years = [{"value": "", "text": "ALL"}]
@@ -381,6 +389,52 @@ def getStudentsTableForProjectFilters():
 	}
 	return filterOptions
 
+############################ Students last project ############################
+
+studentLastProjectColumns = "id, profilePic, year, semester, studentId, firstNameHeb, lastNameHeb, lastProjectTitle, lastProjectStatus, lastProjectId"
+
+def refreshStudentsLastProject(studentsIds):
+	# recalculate the student_last_project rows of these students from students_view (the caller commits).
+	# students_view is filtered by id so the last project subquery runs only for these students
+	studentsIds = list(studentsIds)
+	if not studentsIds:
+		return
+	db.session.flush()
+	db.session.execute(text("DELETE FROM student_last_project WHERE id IN :ids").bindparams(bindparam("ids", expanding=True)), {"ids": studentsIds})
+	db.session.execute(text(f"INSERT INTO student_last_project ({studentLastProjectColumns}) SELECT {studentLastProjectColumns} FROM students_view WHERE id IN :ids").bindparams(bindparam("ids", expanding=True)), {"ids": studentsIds})
+
+def rebuildStudentsLastProject():
+	# backfill the whole table, returns the number of students
+	db.session.execute(text("DELETE FROM student_last_project"))
+	db.session.execute(text(f"INSERT INTO student_last_project ({studentLastProjectColumns}) SELECT {studentLastProjectColumns} FROM students_view"))
+	db.session.commit()
+	facets.invalidate("student_last_project")
+	return models.StudentLastProject.query.count()
+
+def checkStudentsLastProject():
+	# returns the ids of students whose student_last_project row is missing, stale or redundant
+	expected = {r.id: tuple(r) for r in db.session.execute(text(f"SELECT {studentLastProjectColumns} FROM students_view"))}
+	actual = {r.id: tuple(r) for r in db.session.execute(text(f"SELECT {studentLastProjectColumns} FROM student_last_project"))}
+	return sorted(id for id in expected.keys() | actual.keys() if expected.get(id) != actual.get(id))
+
+############################ Search ############################
+
+def rebuildSearchIndexes():
+	# refill the full text search tables, the triggers and refreshShowcaseSearch keep them up to date
+	for statement in search.fillStatements():
+		db.session.execute(text(statement))
+	db.session.commit()
+
+def refreshShowcaseSearch(projectsIds):
+	# recalculate the showcase search rows of these projects (the caller commits),
+	# a project that isn't published and approved (or was deleted) is removed from it
+	projectsIds = list(projectsIds)
+	if not projectsIds:
+		return
+	db.session.flush()
+	db.session.execute(text("DELETE FROM showcase_search WHERE rowid IN :ids").bindparams(bindparam("ids", expanding=True)), {"ids": projectsIds})
+	db.session.execute(text(f"INSERT INTO showcase_search (rowid, {', '.join(search.showcaseColumns)}) {search.showcaseRows()} AND project.id IN :ids").bindparams(bindparam("ids", expanding=True)), {"ids": projectsIds})
+
 ############################ Courses ############################
 
 def getCoursesCount():
@@ -392,32 +446,26 @@ def getCourseById(id):
 def getAllCourses():
 	return models.Course.query.all()
 
-def getCoursesTableData(sort, order, limit, offset, filters):
-	query = models.Course.query.filter()
-	if filters:
-		filters = json.loads(filters)
-		if "name" in filters:
-			query = query.filter(models.Course.name.contains(filters["name"]))
-		if "number" in filters:
-			query = query.filter(models.Course.number.contains(filters["number"]))
-	
-	if sort:
-		if sort == "number":
-			query = query.order_by(models.Course.number.desc() if order == "desc" else models.Course.number.asc())
-		if sort == "name":
-			query = query.order_by(models.Course.name.desc() if order == "desc" else models.Course.name.asc())
-		if sort == "academicPoints":
-			query = query.order_by(models.Course.academicPoints.desc() if order == "desc" else models.Course.academicPoints.asc())
-	
-	totalResults = query.count()
-	query_results = query.paginate(int(int(offset)/int(limit))+1, int(limit), False).items
-	return totalResults, query_results
+coursesTable = tables.Table(models.Course.__table__,
+	sortKeys={
+		"number": [("number", None)],
+		"name": [("name", None)],
+		"academicPoints": [("academicPoints", None)]
+	},
+	filters={
+		"name": tables.Contains("name"),
+		"number": tables.Contains("number")
+	})
+
+def getCoursesTableData(sort, order, limit, offset, filters, cursor=None):
+	return coursesTable.getPage(sort, order, limit, offset, filters, cursor)
 
 def updateCourse(id, newData):
 	course = getCourseById(id)
 	for field, data in newData.items():
 		course.__setattr__(field, data)
 	db.session.commit()
+	facets.invalidate("course")
 
 def addCourse(newCourse):
 	course = models.Course()
@@ -425,6 +473,7 @@ def addCourse(newCourse):
 		course.__setattr__(field, data)
 	db.session.add(course)
 	db.session.commit()
+	facets.invalidate("course")
 	
 def deleteCourse(id):
 	course = getCourseById(id)
@@ -434,6 +483,7 @@ def deleteCourse(id):
 	if not relatedToProject:
 		db.session.delete(course)
 		db.session.commit()
+		facets.invalidate("course")
 		if isDefaultCourse and getCoursesCount() > 0:	# make sure there is a default course
 			newDefaultCourse = models.Course.query.first()
 			newDefaultCourse.isDefault = True
@@ -469,12 +519,19 @@ def addSupervisor(newSupervisor):
 		supervisor.__setattr__(field, data)
 	db.session.add(supervisor)
 	db.session.commit()
+	facets.invalidate("supervisor")
 
 def updateSupervisor(id, newData):
 	supervisor = getSupervisorById(id)
 	for field, data in newData.items():
 		supervisor.__setattr__(field, data)
+	# the names are shown (and searched) in the showcase with the supervisor's projects
+	namesChanged = {"firstNameHeb", "lastNameHeb", "firstNameEng", "lastNameEng"} & newData.keys()
+	projectsIds = [project.id for project in supervisor.projects] if namesChanged else []
+	refreshShowcaseSearch(projectsIds)
 	db.session.commit()
+	facets.invalidate("supervisor")
+	showcase.invalidate(projectsIds)
 
 def deleteSupervisor(id):
 	supervisor = getSupervisorById(id)
@@ -487,28 +544,22 @@ def deleteSupervisor(id):
 	else:
 		db.session.delete(supervisor)
 	db.session.commit()
+	facets.invalidate("supervisor")
 	return "not deleted" if hadProjects else "deleted"
 
-def getSupervisorsTableData(sort, order, limit, offset, filters):
-	query = models.Supervisor.query.filter()
-	if filters:
-		filters = json.loads(filters)
-		if "status" in filters:
-			query = query.filter_by(status=filters["status"])
-	
-	if sort:
-		if sort == "status":
-			query = query.order_by(models.Supervisor.status.desc() if order == "desc" else models.Supervisor.status.asc())
-		elif sort == "supervisorId":
-			query = query.order_by(models.Supervisor.supervisorId.desc() if order == "desc" else models.Supervisor.supervisorId.asc())
-		elif sort == "firstNameHeb":
-			query = query.order_by(models.Supervisor.firstNameHeb.desc() if order == "desc" else models.Supervisor.firstNameHeb.asc())
-		elif sort == "lastNameHeb":
-			query = query.order_by(models.Supervisor.lastNameHeb.desc() if order == "desc" else models.Supervisor.lastNameHeb.asc())
-	
-	totalResults = query.count()
-	query_results = query.paginate(int(int(offset)/int(limit))+1, int(limit), False).items
-	return totalResults, query_results
+supervisorsTable = tables.Table(models.Supervisor.__table__,
+	sortKeys={
+		"status": [("status", None)],
+		"supervisorId": [("supervisorId", None)],
+		"firstNameHeb": [("firstNameHeb", None)],
+		"lastNameHeb": [("lastNameHeb", None)]
+	},
+	filters={
+		"status": tables.Equals("status")
+	})
+
+def getSupervisorsTableData(sort, order, limit, offset, filters, cursor=None):
+	return supervisorsTable.getPage(sort, order, limit, offset, filters, cursor)
 
 ############################ Proposed Projects ############################
 def getAllPublishedProposedProjects():
@@ -535,6 +586,7 @@ def addProposedProject(newProposedProject):
 		proposedProject.__setattr__(field, data)
 	db.session.add(proposedProject)
 	db.session.commit()
+	facets.invalidate("proposed_project")
 	return proposedProject.id
 
 def updateProposedProject(id, newData):
@@ -542,6 +594,7 @@ def updateProposedProject(id, newData):
 	for field, data in newData.items():
 		proposedProject.__setattr__(field, data)
 	db.session.commit()
+	facets.invalidate("proposed_project")
 
 def updateProposedProjectSupervisors(id, supervisorsIds):
 	proposedProject = getProposedProjectById(id)
@@ -570,21 +623,33 @@ def deleteProposedProject(id):
 	# delete proposed project
 	db.session.delete(proposedProject)
 	db.session.commit()
-
-def getProposedProjectsTableData(sort, order, limit, offset, filters):
-	query = models.ProposedProject.query.filter()
-	if filters:
-		filters = json.loads(filters)
-		if "title" in filters:
-			query = query.filter(models.ProposedProject.title.contains(filters["title"]))				
-	
-	if sort:
-		if sort == "title":
-			query = query.order_by(models.ProposedProject.title.desc() if order == "desc" else models.ProposedProject.title.asc())
-	
-	totalResults = query.count()
-	query_results = query.paginate(int(int(offset)/int(limit))+1, int(limit), False).items
-	return totalResults, query_results
+	facets.invalidate("proposed_project")
+
+proposedProjectsTable = tables.Table(models.ProposedProject.__table__,
+	sortKeys={
+		"title": [("title", None)]
+	},
+	filters={
+		"title": tables.Equals("title")
+	})
+
+def getProposedProjectsTableData(sort, order, limit, offset, filters, cursor=None):
+	return proposedProjectsTable.getPage(sort, order, limit, offset, filters, cursor)
+
+@facets.cached("proposedProjectsTable", tables=["proposed_project"])
+def getProposedProjectsTableFilters():
+	# ------- proposed project title filters
+	titleFilters_query = db.session.execute("SELECT title FROM proposed_project ORDER BY title")
+	titleFilters = [{"value": "", "text": "ALL"}]
+	for r in titleFilters_query:
+		titleFilters.append({
+			"value": r.title,
+			"text": r.title
+		})
+	filterOptions={
+		"title": titleFilters
+	}
+	return filterOptions
 
 ############################ Users ############################
 
@@ -608,6 +673,228 @@ def addAdmin(adminData):
 	db.session.add(user)
 	db.session.commit()
 
+############################ Media jobs ############################
+
+def addMediaJob(folder, sourceName, imageName):
+	job = models.MediaJob(folder=folder, sourceName=sourceName, imageName=imageName, status="pending")
+	db.session.add(job)
+	db.session.commit()
+	return job.id
+
+def getMediaJobById(id):
+	return models.MediaJob.query.get(id)
+
+def getPendingMediaJobs(createdBefore=None):
+	query = models.MediaJob.query.filter_by(status="pending")
+	if createdBefore is not None:
+		query = query.filter(models.MediaJob.createdAt < createdBefore)
+	return query.order_by(models.MediaJob.id).all()
+
+def finishMediaJob(id, error=None):
+	job = models.MediaJob.query.get(id)
+	job.status = "failed" if error else "done"
+	job.error = error
+	job.finishedAt = datetime.utcnow()
+	projectsIds = getProjectsIdsShowingImage(job.folder, job.imageName)
+	db.session.commit()
+	# the showcase entries of these projects have the placeholder of the image
+	showcase.invalidate(projectsIds)
+
+def getProjectsIdsShowingImage(folder, imageName):
+	# the projects whose showcase entries show the image
+	if folder == "project_doc/image":
+		return [id for id, in db.session.query(models.Project.id).filter_by(projectDocImage=imageName)]
+	if folder == "images/profile":
+		return [id for id, in db.session.query(models.StudentProject.projectId).join(models.Student, models.Student.id == models.StudentProject.studentId).filter(models.Student.profilePic == imageName)]
+	return []
+
+############################ Stored files ############################
+
+def addFileReference(folder, name, hash, size):
+	# returns the number of references of the file after this one
+	for attempt in range(2):
+		updatedRows = models.StoredFile.query.filter_by(folder=folder, name=name).update({"refCount": models.StoredFile.refCount + 1}, synchronize_session=False)
+		if not updatedRows:
+			db.session.add(models.StoredFile(folder=folder, name=name, hash=hash, size=size, refCount=1))
+		try:
+			db.session.commit()
+			break
+		except IntegrityError:
+			# another request added it at the same time
+			db.session.rollback()
+	return db.session.query(models.StoredFile.refCount).filter_by(folder=folder, name=name).scalar()
+
+def removeFileReference(folder, name):
+	# returns (the number of references left, hash), None when the file is not in the store. the row is deleted with its last reference
+	storedFile = models.StoredFile.query.filter_by(folder=folder, name=name).first()
+	if storedFile is None:
+		return None
+	hash = storedFile.hash
+	models.StoredFile.query.filter_by(id=storedFile.id).update({"refCount": models.StoredFile.refCount - 1}, synchronize_session=False)
+	references = db.session.query(models.StoredFile.refCount).filter_by(id=storedFile.id).scalar()
+	if references <= 0:
+		models.StoredFile.query.filter_by(id=storedFile.id).delete(synchronize_session=False)
+	db.session.commit()
+	return references, hash
+
+def getStoredFile(folder, name):
+	return models.StoredFile.query.filter_by(folder=folder, name=name).first()
+
+def getStoredFiles():
+	return models.StoredFile.query.all()
+
+def isBlobReferenced(hash):
+	return db.session.query(models.StoredFile.query.filter_by(hash=hash).exists()).scalar()
+
+def getFilesReferences():
+	# (folder, name) -> number of rows that refer to the file, of every uploaded file the database refers to
+	columns = {
+		"static/images/profile": models.Student.profilePic,
+		"static/images/projects": models.Project.image,
+		"static/images/proposed_projects": models.ProposedProject.image,
+		"static/project_doc/image": models.Project.projectDocImage,
+		"static/project_doc/video": models.Project.localVideo,
+		"static/project_doc/report": models.Project.report,
+		"static/project_doc/presentation": models.Project.presentation,
+		"static/project_doc/code": models.Project.code,
+		"static/project_doc/poster": models.Project.poster
+	}
+	references = {}
+	for folder, column in columns.items():
+		for name, count in db.session.query(column, func.count()).filter(column != None, column != "").group_by(column):
+			references[(folder, name)] = count
+	return references
+
+############################ Cache invalidations ############################
+
+def addCacheInvalidation(cache, keys, origin):
+	invalidation = models.CacheInvalidation(cache=cache, keys=keys, origin=origin)
+	db.session.add(invalidation)
+	db.session.commit()
+	return invalidation.id
+
+def getLastCacheInvalidationId():
+	return db.session.query(func.max(models.CacheInvalidation.id)).scalar() or 0
+
+def getCacheInvalidationsAfter(id):
+	return models.CacheInvalidation.query.filter(models.CacheInvalidation.id > id).order_by(models.CacheInvalidation.id).all()
+
+def deleteCacheInvalidations(createdBefore):
+	# the last invalidation is kept, the next id is always after it
+	lastId = getLastCacheInvalidationId()
+	models.CacheInvalidation.query.filter(models.CacheInvalidation.createdAt < createdBefore, models.CacheInvalidation.id < lastId).delete(synchronize_session=False)
+	db.session.commit()
+
+############################ YouTube jobs ############################
+
+def addYoutubeJob(projectId, kind, maxAttempts):
+	job = models.YoutubeJob(projectId=projectId, kind=kind, status="queued", maxAttempts=maxAttempts, runAt=datetime.utcnow())
+	db.session.add(job)
+	db.session.commit()
+	return job.id
+
+def getYoutubeJobById(id):
+	return models.YoutubeJob.query.get(id)
+
+def getActiveYoutubeJob(projectId, kind):
+	# the queued or running job of this kind of a project
+	return models.YoutubeJob.query.filter(models.YoutubeJob.projectId == projectId, models.YoutubeJob.kind == kind,
+		models.YoutubeJob.status.in_(["queued", "running"])).first()
+
+def getDueYoutubeJob():
+	# the processing jobs are run by the processing poller
+	return models.YoutubeJob.query.filter(models.YoutubeJob.status == "queued", models.YoutubeJob.runAt <= datetime.utcnow(),
+		models.YoutubeJob.kind != "processing").order_by(models.YoutubeJob.runAt, models.YoutubeJob.id).first()
+
+def claimYoutubeJob(claimedBy):
+	# marks the next queued job that is due as running, leased by claimedBy, and returns it, None when there is none.
+	# the status is changed only if it is still queued, so a job is run by one worker of one process
+	while True:
+		job = getDueYoutubeJob()
+		if job is None:
+			db.session.commit()
+			return None
+		now = datetime.utcnow()
+		claimedRows = models.YoutubeJob.query.filter_by(id=job.id, status="queued").update({"status": "running", "startedAt": now,
+			"claimedBy": claimedBy, "heartbeatAt": now}, synchronize_session=False)
+		db.session.commit()
+		if claimedRows:
+			db.session.refresh(job)
+			return job
+
+def heartbeatYoutubeJobs(ids, claimedBy):
+	# renews the leases of the running jobs of claimedBy, returns the ids of the jobs it still has
+	if not ids:
+		return []
+	models.YoutubeJob.query.filter(models.YoutubeJob.id.in_(ids), models.YoutubeJob.status == "running",
+		models.YoutubeJob.claimedBy == claimedBy).update({"heartbeatAt": datetime.utcnow()}, synchronize_session=False)
+	db.session.commit()
+	return [id for id, in db.session.query(models.YoutubeJob.id).filter(models.YoutubeJob.id.in_(ids), models.YoutubeJob.status == "running",
+		models.YoutubeJob.claimedBy == claimedBy)]
+
+def _leasedYoutubeJob(id, claimedBy):
+	# the job, filtered to the lease of claimedBy when it's given (a worker whose lease expired doesn't change it anymore)
+	query = models.YoutubeJob.query.filter_by(id=id)
+	if claimedBy is not None:
+		query = query.filter_by(status="running", claimedBy=claimedBy)
+	return query
+
+def finishYoutubeJob(id, claimedBy=None):
+	_leasedYoutubeJob(id, claimedBy).update({"status": "done", "error": None, "finishedAt": datetime.utcnow(), "claimedBy": None},
+		synchronize_session=False)
+	db.session.commit()
+
+def failYoutubeJob(id, error, claimedBy=None):
+	_leasedYoutubeJob(id, claimedBy).update({"status": "failed", "error": error, "finishedAt": datetime.utcnow(), "claimedBy": None},
+		synchronize_session=False)
+	db.session.commit()
+
+def getWatchedYoutubeJobs():
+	# [(job, project)] of the queued processing jobs, the videos the processing poller checks
+	return db.session.query(models.YoutubeJob, models.Project).outerjoin(models.Project, models.Project.id == models.YoutubeJob.projectId).filter(
+		models.YoutubeJob.status == "queued", models.YoutubeJob.kind == "processing").order_by(models.YoutubeJob.id).all()
+
+def retryYoutubeJob(id, runAt, error=None, countAttempt=True, claimedBy=None):
+	# queues a job again to run at runAt, returns its status: "queued", or "failed" when it failed its last attempt,
+	# None when claimedBy doesn't have its lease anymore (it was queued again after the lease expired)
+	job = _leasedYoutubeJob(id, claimedBy).first()
+	if job is None:
+		db.session.commit()
+		return None
+	if countAttempt:
+		job.attempts += 1
+	job.error = error
+	job.claimedBy = None
+	if job.attempts >= job.maxAttempts:
+		job.status = "failed"
+		job.finishedAt = datetime.utcnow()
+	else:
+		job.status = "queued"
+		job.runAt = runAt
+	db.session.commit()
+	return job.status
+
+def requeueYoutubeJob(id):
+	# runs a failed job again (an admin retries it), returns False when it is not failed
+	requeuedRows = models.YoutubeJob.query.filter_by(id=id, status="failed").update({"status": "queued", "attempts": 0,
+		"runAt": datetime.utcnow(), "finishedAt": None}, synchronize_session=False)
+	db.session.commit()
+	return requeuedRows > 0
+
+def requeueExpiredYoutubeJobs(expiredBefore):
+	# the running jobs whose lease was not renewed since expiredBefore (their process stopped) are queued again, returns their number.
+	# the lease is checked again in the update, a heartbeat that came in between keeps the job running
+	expired = (models.YoutubeJob.status == "running") & ((models.YoutubeJob.heartbeatAt == None) | (models.YoutubeJob.heartbeatAt < expiredBefore))
+	requeuedRows = models.YoutubeJob.query.filter(expired).update({"status": "queued", "runAt": datetime.utcnow(), "claimedBy": None},
+		synchronize_session=False)
+	db.session.commit()
+	return requeuedRows
+
+def getYoutubeJobsOverview(limit=50):
+	# [(job, project title)] of the queued, running and failed jobs, the newest first
+	return db.session.query(models.YoutubeJob, models.Project.title).outerjoin(models.Project, models.Project.id == models.YoutubeJob.projectId).filter(
+		models.YoutubeJob.status.in_(["queued", "running", "failed"])).order_by(models.YoutubeJob.id.desc()).limit(limit).all()
+
 ############################ Overview ############################
 
 def getLabOverview():
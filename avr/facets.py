@@ -0,0 +1,75 @@
+import functools
+import secrets
+from threading import Lock
+from cachetools import Cache
+from avr import cacheSync
+
+# Filter options (facets) of the admin tables, kept in memory until one of the tables they are read from is changed.
+# The database module invalidates them after committing a write that can change them.
+# Every facet has a version, the table endpoints send it to the browser with the options
+# and skip sending the options again while the browser already has the current version.
+# The other processes of the server invalidate them when they apply the invalidation (see cacheSync.py).
+
+_cache = Cache(maxsize=32)
+_lock = Lock()
+_dependencies = {}	# facet name -> names of the tables it is read from
+_versions = {}		# facet name -> number of times it was invalidated
+_tableVersions = {}	# table name -> number of committed writes that invalidated it
+_clearedVersion = 0	# number of times all of them were invalidated
+# versions of different runs of the server must not be equal
+_epoch = secrets.token_hex(4)
+
+
+def cached(name, tables):
+	def decorator(getFilters):
+		_dependencies[name] = set(tables)
+
+		@functools.wraps(getFilters)
+		def wrapper():
+			with _lock:
+				if name in _cache:
+					return _cache[name]
+				version = _versions.get(name, 0)
+			filterOptions = getFilters()
+			with _lock:
+				# don't keep options that were invalidated while they were read
+				if _versions.get(name, 0) == version:
+					_cache[name] = filterOptions
+			return filterOptions
+		return wrapper
+	return decorator
+
+
+def invalidate(*tables):
+	_invalidate(tables)
+	cacheSync.publish("facets", list(tables))
+
+
+def _invalidate(tables):
+	# tables is None for all of them (the invalidations of this process were missed)
+	global _clearedVersion
+	with _lock:
+		if tables is None:
+			_clearedVersion += 1
+			tables = set().union(*_dependencies.values())
+		for table in tables:
+			_tableVersions[table] = _tableVersions.get(table, 0) + 1
+		for name, dependsOn in _dependencies.items():
+			if dependsOn.intersection(tables):
+				_versions[name] = _versions.get(name, 0) + 1
+				_cache.pop(name, None)
+
+
+def version(name):
+	# should be taken before the options, so a change in between only makes the browser download them again
+	with _lock:
+		return f"{_epoch}.{_versions.get(name, 0)}"
+
+
+def tablesVersion(tables):
+	# changes whenever one of these tables is invalidated, for caches of other data read from them
+	with _lock:
+		return (_clearedVersion,) + tuple(_tableVersions.get(table, 0) for table in tables)
+
+
+cacheSync.register("facets", _invalidate)
@@ -0,0 +1,202 @@
+import os
+import hashlib
+import secrets
+import traceback
+from shutil import copyfile
+from avr import app
+from avr import database
+from avr import locks
+
+# Content addressed store of the uploaded files.
+# An uploaded file is named by the hash of its content (<first 32 hex digits of its sha256><extension>), so the same file
+# uploaded twice (or a proposed project image used by its projects) is kept once. Its content is kept in the store folder,
+# sharded by the hash (filestore/ab/cd/abcd...), and the file in its folder under avr/static is a hard link to it (a copy
+# where the file system has no hard links), so copying a file to another folder writes nothing.
+# The database counts the references of every name in every folder (StoredFile), release() deletes the file when its last
+# reference goes, and its content when no folder has it anymore.
+# Files that were uploaded before the store (random names) have no StoredFile, release() deletes them like before.
+# A reference is added (with its file) and removed (with its file and blob) under the lock of the store, in every process
+# of the server, so a blob is never deleted while a new reference links to it.
+
+storeFolder = os.path.join(app.root_path, "filestore")
+hashNameLength = 32
+
+
+def _folderKey(folder):
+	# folders are kept relative to avr/ with forward slashes: static/images/profile
+	return folder.replace(os.sep, "/").strip("/")
+
+
+def _storeLock():
+	os.makedirs(storeFolder, exist_ok=True)
+	return locks.fileLock(os.path.join(storeFolder, "store"))
+
+
+def _blobPath(hash):
+	return os.path.join(storeFolder, hash[:2], hash[2:4], hash)
+
+
+def _link(source, destination):
+	os.makedirs(os.path.dirname(destination), exist_ok=True)
+	try:
+		os.link(source, destination)
+	except FileExistsError:
+		pass
+	except OSError:
+		copyfile(source, destination)
+
+
+def _writeBlob(stream):
+	# writes a stream to a temporary file of the store, returns (hash, size, temporary path)
+	os.makedirs(storeFolder, exist_ok=True)
+	temporaryPath = os.path.join(storeFolder, "upload-" + secrets.token_hex(8))
+	digest = hashlib.sha256()
+	size = 0
+	try:
+		with open(temporaryPath, "wb") as f:
+			while True:
+				data = stream.read(1024 * 1024)
+				if not data:
+					break
+				digest.update(data)
+				f.write(data)
+				size += len(data)
+	except Exception:
+		if os.path.exists(temporaryPath):
+			os.remove(temporaryPath)
+		raise
+	return digest.hexdigest(), size, temporaryPath
+
+
+def _keepBlob(hash, temporaryPath):
+	# the temporary file becomes the blob of its hash, once (called under the lock of the store)
+	blobPath = _blobPath(hash)
+	if os.path.exists(blobPath):
+		os.remove(temporaryPath)
+	else:
+		os.makedirs(os.path.dirname(blobPath), exist_ok=True)
+		os.replace(temporaryPath, blobPath)
+
+
+def _hashFile(path):
+	digest = hashlib.sha256()
+	with open(path, "rb") as f:
+		for data in iter(lambda: f.read(1024 * 1024), b""):
+			digest.update(data)
+	return digest.hexdigest()
+
+
+def _importFile(path):
+	# the hash and size of a file that is not in the store yet, its content becomes a blob (a hard link to it)
+	hash = _hashFile(path)
+	if not os.path.exists(_blobPath(hash)):
+		_link(path, _blobPath(hash))
+	return hash, os.path.getsize(path)
+
+
+def _addReference(folder, name, hash, size, sourcePath, sourceName):
+	# references a file by name in a folder, when it's not there yet it's linked to sourcePath as sourceName
+	# (the media workers make the file from its source when they differ). returns True when the name was not referenced before
+	references = database.addFileReference(folder, name, hash, size)
+	if not os.path.exists(os.path.join(app.root_path, folder, name)) and not os.path.exists(os.path.join(app.root_path, folder, sourceName)):
+		_link(sourcePath, os.path.join(app.root_path, folder, sourceName))
+	return references == 1
+
+
+def storeFile(file, folder, extension=None):
+	# stores an uploaded file (a FileStorage) in a folder (relative to avr/), returns (name, source name, created):
+	# extension is the extension of the file the upload becomes (a .tga image becomes a .png by the media workers),
+	# source name is the uploaded file name in the folder and created is False when the folder already had the file
+	folder = _folderKey(folder)
+	_, fileExtension = os.path.splitext(file.filename)
+	fileExtension = fileExtension.lower()
+	hash, size, temporaryPath = _writeBlob(file.stream)
+	name = hash[:hashNameLength] + (extension or fileExtension)
+	sourceName = hash[:hashNameLength] + fileExtension
+	try:
+		with _storeLock():
+			_keepBlob(hash, temporaryPath)
+			created = _addReference(folder, name, hash, size, _blobPath(hash), sourceName)
+	finally:
+		if os.path.exists(temporaryPath):
+			os.remove(temporaryPath)
+	return name, sourceName, created
+
+
+def storeLocalFile(path, folder, extension):
+	# stores a file the server wrote (a finished chunked upload) in a folder, its content is moved into the store (not copied)
+	# and it's removed. returns (name, created) like storeFile
+	folder = _folderKey(folder)
+	hash = _hashFile(path)
+	size = os.path.getsize(path)
+	name = hash[:hashNameLength] + extension
+	with _storeLock():
+		_keepBlob(hash, path)
+		created = _addReference(folder, name, hash, size, _blobPath(hash), name)
+	return name, created
+
+
+def saveFile(file, folder):
+	name, _, _ = storeFile(file, folder)
+	return name
+
+
+def copyFile(fromFolder, name, toFolder):
+	# references a file of a folder in another folder (a hard link, no copy), returns (name in the other folder, created)
+	fromFolder = _folderKey(fromFolder)
+	toFolder = _folderKey(toFolder)
+	path = os.path.join(app.root_path, fromFolder, name)
+	with _storeLock():
+		storedFile = database.getStoredFile(fromFolder, name)
+		if storedFile is not None:
+			hash, size, newName = storedFile.hash, storedFile.size, name
+		else:
+			# a file from before the store
+			hash, size = _importFile(path)
+			newName = hash[:hashNameLength] + os.path.splitext(name)[1].lower()
+		# the file is linked (not its blob), the file of a converted upload is not its blob
+		created = _addReference(toFolder, newName, hash, size, path, newName)
+	return newName, created
+
+
+def _remove(path):
+	try:
+		os.remove(path)
+		app.logger.info(f'deleted: {path}')
+	except FileNotFoundError:
+		pass
+	except OSError as e:
+		app.logger.error('Could not delete file: {}, {}\n{}'.format(path, e, traceback.format_exc()))
+
+
+def release(folder, name):
+	# removes a reference to a file, returns True when it was the last one (the file was deleted)
+	folder = _folderKey(folder)
+	if not name:
+		return False
+	with _storeLock():
+		result = database.removeFileReference(folder, name)
+		if result is None:
+			# not in the store
+			_remove(os.path.join(app.root_path, folder, name))
+			return True
+		references, hash = result
+		if references > 0:
+			return False
+		_remove(os.path.join(app.root_path, folder, name))
+		if not database.isBlobReferenced(hash):
+			_remove(_blobPath(hash))
+	return True
+
+
+def check():
+	# compares the references of the store with the files the database refers to, returns the differences:
+	# [(folder, name, references in the store, references in the database)]
+	storedReferences = {(storedFile.folder, storedFile.name): storedFile.refCount for storedFile in database.getStoredFiles()}
+	databaseReferences = database.getFilesReferences()
+	differences = []
+	# files from before the store are not counted
+	for key in sorted(storedReferences):
+		if storedReferences[key] != databaseReferences.get(key, 0):
+			differences.append((key[0], key[1], storedReferences[key], databaseReferences.get(key, 0)))
+	return differences
@@ -369,7 +369,9 @@ class resetPasswordForm(FlaskForm):
 
 class sendProjectDocForm(FlaskForm):
 	image = FileField('Image', validators=[DataRequired(), FileAllowed(['jpg', 'jpeg', 'png', 'gif', 'bmp'])])
-	video = FileField('Video Clip', validators=[DataRequired(), FileAllowed(['mp4'])])
+	video = FileField('Video Clip', validators=[FileAllowed(['mp4'])])
+	# id of the chunked upload of the video (uploads.py), the video file is not sent with the form when it's set
+	videoUpload = HiddenField()
 	report = FileField('Project Report', validators=[DataRequired(), FileAllowed(['doc', 'docx', 'pdf'])])
 	presentation = FileField('Presentation', validators=[DataRequired(), FileAllowed(['ppt', 'pptx'])])
 	abstract = TextAreaField('Abstract', validators=[DataRequired()])
@@ -377,6 +379,10 @@ class sendProjectDocForm(FlaskForm):
 	githubLink = StringField('Github Link')
 	submitForm = SubmitField('Send')
 
+	def validate_video(self, video):
+		if not video.data and not self.videoUpload.data:
+			raise ValidationError('This field is required.')
+
 	def validate_githubLink(self, githubLink):
 		if githubLink.data.strip():
 			if not githubLink.data.startswith("https://github.com/") and not githubLink.data.startswith("github.com/"):
@@ -386,6 +392,7 @@ class sendProjectDocForm(FlaskForm):
 class editProjectDocForm(FlaskForm):
 	image = FileField('Image', validators=[FileAllowed(['jpg', 'jpeg', 'png', 'gif', 'bmp'])])
 	video = FileField('Video Clip', validators=[FileAllowed(['mp4'])])
+	videoUpload = HiddenField()
 	report = FileField('Project Report', validators=[FileAllowed(['doc', 'docx', 'pdf'])])
 	presentation = FileField('Presentation', validators=[FileAllowed(['ppt', 'pptx'])])
 	abstract = TextAreaField('Abstract', validators=[DataRequired()])
@@ -0,0 +1,240 @@
+import os
+import traceback
+from threading import Lock
+from PIL import Image, ImageOps
+from cachetools import LRUCache
+from markupsafe import Markup, escape
+from avr import app
+from avr import cacheSync
+
+# Resized variants of the uploaded images.
+# Every uploaded image gets a small copy for every size the site shows it in, in WebP and in its own format
+# (PNG for images with transparency, JPEG for the others) for browsers without WebP, next to it in a "variants" folder:
+# static/images/profile/<name>.png -> static/images/profile/variants/<name>.thumb.webp and <name>.thumb.png
+# The variants of an uploaded image are written by the media workers (see media.py), the image is shown as a placeholder until they are.
+# "flask build-image-variants" writes the missing variants of the existing images.
+# The urls of an image fall back to the original while it has no variants (or they couldn't be made).
+# Which variants an image has is looked up once (on its first render) and kept in memory, the functions that write or
+# delete its variants or its pending marker forget it, in every process of the server (see cacheSync.py).
+
+variantsFolder = "variants"
+placeholderUrl = "/static/images/processing.svg"
+imageExtensions = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"}
+
+# folder (under avr/static) -> variant -> (width, height), a variant with a height is cropped to fill it,
+# one without a height keeps the image proportions. The sizes are twice the sizes they are shown in (high density screens).
+imageFolders = {
+	# admin tables (50x50), the navigation bar (40x40) and the showcase students (5rem)
+	"images/profile": {"thumb": (160, 160)},
+	# admin tables (80x70) and the project cards
+	"images/projects": {"thumb": (160, 140), "card": (700, None)},
+	"images/proposed_projects": {"thumb": (160, 140), "card": (700, None)},
+	# the showcase cards and the project page preview, the showcase project details show the original
+	"project_doc/image": {"card": (700, None)}
+}
+
+webpQuality = 80
+jpegQuality = 85
+
+# (folder, image name) -> (media job id or None, variant -> (WebP url, url in the image format))
+_variants = LRUCache(maxsize=10000)
+_lock = Lock()
+
+
+def _variantPath(folder, imageName, variant, extension):
+	name, _ = os.path.splitext(imageName)
+	return f"{folder}/{variantsFolder}/{name}.{variant}{extension}"
+
+
+def _hasTransparency(image):
+	return image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+
+
+def variantsPaths(folder, imageName):
+	# [(full path without extension, width, height)] of the variants of an image
+	return [(os.path.join(app.static_folder, _variantPath(folder, imageName, variant, "")), width, height)
+		for variant, (width, height) in imageFolders[folder].items()]
+
+
+def writeVariants(imagePath, variants, sourcePath=None, overwrite=True):
+	# runs in the media workers, it uses only its arguments (no app or database).
+	# writes the image from its source first when they are different files (a .tga upload is converted to .png),
+	# then its variants, returns the number of files written
+	if sourcePath and sourcePath != imagePath:
+		with Image.open(sourcePath) as source:
+			source.convert("RGB").save(imagePath)
+		os.remove(sourcePath)
+	writtenFiles = 0
+	with Image.open(imagePath) as image:
+		# phone photos are rotated by their exif orientation
+		image = ImageOps.exif_transpose(image)
+		image = image.convert("RGBA" if _hasTransparency(image) else "RGB")
+		fallbackExtension = ".png" if image.mode == "RGBA" else ".jpg"
+		for path, width, height in variants:
+			os.makedirs(os.path.dirname(path), exist_ok=True)
+			if not overwrite and os.path.exists(path + ".webp") and os.path.exists(path + fallbackExtension):
+				continue
+			if height:
+				resized = ImageOps.fit(image, (width, height), Image.LANCZOS)
+			else:
+				resized = image.copy()
+				resized.thumbnail((width, width * 10), Image.LANCZOS)
+			resized.save(path + ".webp", "WEBP", quality=webpQuality, method=4)
+			if fallbackExtension == ".png":
+				resized.save(path + fallbackExtension, "PNG", optimize=True)
+			else:
+				resized.save(path + fallbackExtension, "JPEG", quality=jpegQuality, optimize=True, progressive=True)
+			writtenFiles += 2
+	return writtenFiles
+
+
+def saveVariants(folder, imageName, overwrite=True):
+	# writes the variants of an image of one of the image folders in this process, returns the number of files written
+	try:
+		return writeVariants(os.path.join(app.static_folder, folder, imageName), variantsPaths(folder, imageName), overwrite=overwrite)
+	except Exception as e:
+		app.logger.error('could not make the variants of image {}, Error is: {}\n{}'.format(os.path.join(folder, imageName), e, traceback.format_exc()))
+		return 0
+
+
+def _pendingPath(folder, imageName):
+	# the marker of an image whose variants are being made, it has the id of its media job
+	return os.path.join(app.static_folder, folder, variantsFolder, os.path.splitext(imageName)[0] + ".pending")
+
+
+def markPending(folder, imageName, jobId):
+	os.makedirs(os.path.join(app.static_folder, folder, variantsFolder), exist_ok=True)
+	with open(_pendingPath(folder, imageName), "w") as f:
+		f.write(str(jobId))
+	forget(folder, imageName)
+
+
+def _removePending(folder, imageName):
+	try:
+		os.remove(_pendingPath(folder, imageName))
+	except OSError:
+		pass
+
+
+def clearPending(folder, imageName):
+	_removePending(folder, imageName)
+	forget(folder, imageName)
+
+
+def _pendingJob(folder, imageName):
+	# the id of the media job that makes the variants of an image, None when there is none
+	try:
+		with open(_pendingPath(folder, imageName)) as f:
+			return int(f.read())
+	except (OSError, ValueError):
+		return None
+
+
+def deleteVariants(folder, imageName):
+	if not imageName:
+		return
+	_removePending(folder, imageName)
+	for variant in imageFolders[folder]:
+		for extension in (".webp", ".jpg", ".png"):
+			path = os.path.join(app.static_folder, _variantPath(folder, imageName, variant, extension))
+			if os.path.exists(path):
+				try:
+					os.remove(path)
+				except OSError as e:
+					app.logger.error('could not delete image variant {}, Error is: {}'.format(path, e))
+	forget(folder, imageName)
+
+
+def _lookUp(folder, imageName):
+	# (media job id, variant -> urls) of an image, from the files of its variants and its pending marker
+	originalUrl = f"/static/{folder}/{imageName}"
+	jobId = None
+	urls = {}
+	for variant in imageFolders[folder]:
+		urls[variant] = (originalUrl, originalUrl)
+		webpPath = _variantPath(folder, imageName, variant, ".webp")
+		if not os.path.exists(os.path.join(app.static_folder, webpPath)):
+			if jobId is None:
+				jobId = _pendingJob(folder, imageName)
+			if jobId is not None:
+				urls[variant] = (placeholderUrl, placeholderUrl)
+			continue
+		for extension in (".jpg", ".png"):
+			fallbackPath = _variantPath(folder, imageName, variant, extension)
+			if os.path.exists(os.path.join(app.static_folder, fallbackPath)):
+				urls[variant] = (f"/static/{webpPath}", f"/static/{fallbackPath}")
+				break
+	return jobId, urls
+
+
+def _variantsOf(folder, imageName):
+	key = (folder, imageName)
+	with _lock:
+		if key in _variants:
+			return _variants[key]
+	variants = _lookUp(folder, imageName)
+	with _lock:
+		_variants[key] = variants
+	return variants
+
+
+def forget(folder, imageName):
+	# the variants of this image changed, they are looked up again on its next render (in every process)
+	_forget([[folder, imageName]])
+	cacheSync.publish("images", [[folder, imageName]])
+
+
+def _forget(keys):
+	# keys is None for all the images
+	with _lock:
+		if keys is None:
+			_variants.clear()
+			return
+		for folder, imageName in keys:
+			_variants.pop((folder, imageName), None)
+
+
+def refresh(folder, imageName):
+	# looks up the variants of an image again in this process, before the invalidation of the process that changed them is applied
+	_forget([[folder, imageName]])
+
+
+def variantUrls(folder, imageName, variant):
+	# (WebP url, url in the image format) of a variant of an image, the url of the original for both when it has no variants
+	# and the placeholder while they are being made
+	return _variantsOf(folder, imageName)[1][variant]
+
+
+@app.template_global()
+def picture(folder, imageName, variant, **attributes):
+	# <picture> of a variant of an image, browsers with WebP load the WebP file and the others the img src.
+	# a placeholder has the id of its media job, the page replaces it with the variant when the job is done (js/mediaJobs.js)
+	jobId, urls = _variantsOf(folder, imageName)
+	webpUrl, url = urls[variant]
+	if url == placeholderUrl:
+		attributes = dict(attributes, **{"data-media-job": jobId, "data-media-variant": variant})
+	imgAttributes = "".join(f" {name}='{escape(value)}'" for name, value in attributes.items())
+	source = f"<source srcset='{escape(webpUrl)}' type='image/webp'>" if webpUrl != url else ""
+	return Markup(f"<picture>{source}<img src='{escape(url)}'{imgAttributes}></picture>")
+
+
+def buildVariants():
+	# writes the missing variants of every image in the image folders, returns (images, files written)
+	images = 0
+	writtenFiles = 0
+	for folder in imageFolders:
+		folderPath = os.path.join(app.static_folder, folder)
+		if not os.path.isdir(folderPath):
+			continue
+		for name in sorted(os.listdir(folderPath)):
+			if not os.path.isfile(os.path.join(folderPath, name)) or os.path.splitext(name)[1].lower() not in imageExtensions:
+				continue
+			images += 1
+			writtenFiles += saveVariants(folder, name, overwrite=False)
+	# every process looks up the variants of the images again
+	_forget(None)
+	cacheSync.publish("images")
+	return images, writtenFiles
+
+
+cacheSync.register("images", _forget)
@@ -0,0 +1,33 @@
+from threading import Lock
+from contextlib import contextmanager
+try:
+	import fcntl
+except ImportError:
+	# Windows: the files are locked only between the threads of this process
+	fcntl = None
+
+# Locks of the files that several processes of the server change (the gunicorn workers and the YouTube jobs process).
+# fileLock(path) holds an exclusive lock (flock) of the file <path>.lock while its block runs, any other process or
+# thread that locks the same path waits for it. The lock is released when the process dies, a crashed request leaves
+# nothing locked.
+
+# path -> lock of the threads of this process, where there is no flock
+_threadLocks = {}
+_threadLocksLock = Lock()
+
+
+@contextmanager
+def fileLock(path):
+	if fcntl is None:
+		with _threadLocksLock:
+			threadLock = _threadLocks.setdefault(path, Lock())
+		with threadLock:
+			yield
+		return
+	# every call opens the file again, flock locks of different open files wait for each other in the same process too
+	with open(path + ".lock", "a") as f:
+		fcntl.flock(f, fcntl.LOCK_EX)
+		try:
+			yield
+		finally:
+			fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,125 @@
+import os
+import traceback
+from threading import Thread, Lock
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from avr import app
+from avr import database
+from avr import images
+
+# Media workers: a pool of MEDIA_WORKERS processes that convert and resize the uploaded images,
+# so a request that uploads an image only saves it and returns.
+# Every image they process has a media job (a MediaJob row), its status is pending until the worker is done.
+# While a job is pending the image is shown as a placeholder, the page replaces it when the job is done (/Media/Jobs/<id>).
+# The jobs that were pending when the server stopped are run by the YouTube jobs process when it starts
+# ("flask run-youtube-jobs") and by "flask build-image-variants".
+
+_pool = None
+_poolLock = Lock()
+
+
+def _submit(function, *args):
+	global _pool
+	with _poolLock:
+		for attempt in range(2):
+			if _pool is None:
+				_pool = ProcessPoolExecutor(max_workers=app.config['MEDIA_WORKERS'])
+			try:
+				return _pool.submit(function, *args)
+			except BrokenProcessPool:
+				# a worker died (the pool can't run jobs anymore), start a new pool
+				_pool = None
+		raise BrokenProcessPool("could not start the media workers")
+
+
+def processImage(folder, sourceName, imageName=None):
+	# queues the conversion (when imageName is another file name) and the variants of an uploaded image, returns its job id
+	imageName = imageName or sourceName
+	jobId = database.addMediaJob(folder, sourceName, imageName)
+	images.markPending(folder, imageName, jobId)
+	sourcePath = os.path.join(app.static_folder, folder, sourceName)
+	imagePath = os.path.join(app.static_folder, folder, imageName)
+	try:
+		future = _submit(images.writeVariants, imagePath, images.variantsPaths(folder, imageName), sourcePath)
+	except Exception as e:
+		app.logger.error('could not queue media job {}, Error is: {}\n{}'.format(jobId, e, traceback.format_exc()))
+		_finish(jobId, folder, imageName, str(e))
+		return jobId
+	future.add_done_callback(lambda future: _finish(jobId, folder, imageName, _errorOf(future)))
+	return jobId
+
+
+def _errorOf(future):
+	error = future.exception()
+	return "{}: {}".format(type(error).__name__, error) if error else None
+
+
+def _finish(jobId, folder, imageName, error):
+	# called in a thread of the pool when the worker is done
+	with app.app_context():
+		try:
+			if error:
+				app.logger.error('media job {} of image {} failed, Error is: {}'.format(jobId, os.path.join(folder, imageName), error))
+			images.clearPending(folder, imageName)
+			database.finishMediaJob(jobId, error)
+		except Exception as e:
+			app.logger.error('could not finish media job {}, Error is: {}\n{}'.format(jobId, e, traceback.format_exc()))
+
+
+def runPendingJobs(createdBefore=None):
+	# runs the jobs that are still pending in this process (the server stopped before they were done), returns their number
+	# the rows are read first, _finish ends the session they are in
+	jobs = [(job.id, job.folder, job.sourceName, job.imageName) for job in database.getPendingMediaJobs(createdBefore)]
+	for jobId, folder, sourceName, imageName in jobs:
+		imagePath = os.path.join(app.static_folder, folder, imageName)
+		sourcePath = os.path.join(app.static_folder, folder, sourceName)
+		if not os.path.exists(sourcePath):
+			# the image was converted before the server stopped (its .tga source was removed)
+			sourcePath = None
+		if sourcePath is None and not os.path.exists(imagePath):
+			# the image was deleted since then, its job is over (and its marker removed)
+			_finish(jobId, folder, imageName, "the image {} no longer exists".format(os.path.join(folder, imageName)))
+			continue
+		error = None
+		try:
+			images.writeVariants(imagePath, images.variantsPaths(folder, imageName), sourcePath)
+		except Exception as e:
+			error = "{}: {}".format(type(e).__name__, e)
+		_finish(jobId, folder, imageName, error)
+	return len(jobs)
+
+
+def startPendingJobs():
+	# runs the jobs that were pending when this process started in a thread of it (the YouTube jobs process runs them,
+	# the jobs queued since then are run by the media workers of the process that queued them)
+	startTime = datetime.utcnow()
+
+	def run():
+		with app.app_context():
+			try:
+				pendingJobs = runPendingJobs(startTime)
+				if pendingJobs:
+					app.logger.info(f'{pendingJobs} pending media jobs were run')
+			except Exception as e:
+				app.logger.error('could not run the pending media jobs, Error is: {}\n{}'.format(e, traceback.format_exc()))
+
+	thread = Thread(target=run, name="media-pending-jobs", daemon=True)
+	thread.start()
+	return thread
+
+
+def jobStatus(id):
+	# the status of a job, and the urls of the variants of its image when it is over (the original image when it failed)
+	job = database.getMediaJobById(id)
+	if job is None:
+		return None
+	status = {"status": job.status}
+	if job.status != "pending":
+		# the job was finished by another process, which has just written the variants
+		images.refresh(job.folder, job.imageName)
+		status["variants"] = {}
+		for variant in images.imageFolders[job.folder]:
+			webpUrl, url = images.variantUrls(job.folder, job.imageName, variant)
+			status["variants"][variant] = {"webp": webpUrl, "image": url}
+	return status
@@ -1,3 +1,4 @@
+from datetime import datetime
 from itsdangerous import TimedJSONWebSignatureSerializer as Serializer
 from avr import db, login_manager, app
 from flask_login import UserMixin
@@ -28,11 +29,16 @@ class Student(db.Model):
 	academicStatus = db.Column(db.String(30), nullable=True)
 	faculty = db.Column(db.String(30), nullable=False)
 	cellPhone = db.Column(db.String(30), nullable=True)
-	email = db.Column(db.String(150), nullable=False)
+	email = db.Column(db.String(150), nullable=False, index=True)
 	semester = db.Column(db.String(20), nullable=False)
 	year = db.Column(db.Integer, nullable=False)
 	profilePic = db.Column(db.String(50), nullable=True)
 	isRegistered = db.Column(db.Boolean, nullable=True, default=False)
+
+	__table_args__ = (
+		# students of a registration semester (lab overview, students table for a project)
+		db.Index('ix_student_year_semester', 'year', 'semester'),
+	)
 	
 	projects = db.relationship('Project', secondary='student_project', backref=db.backref('students', lazy='dynamic'), order_by='Project.year.desc(),Project.semester.asc()')
 	courses = db.relationship('Course', secondary='student_project', backref=db.backref('students', lazy='dynamic'))
@@ -60,7 +66,7 @@ class ProposedProject(db.Model):
 	title = db.Column(db.String(60), unique=True, nullable=False)
 	description = db.Column(db.Text, nullable=False)
 	image = db.Column(db.String(50), nullable=True)
-	published = db.Column(db.Boolean, nullable=True, default=False)
+	published = db.Column(db.Boolean, nullable=True, default=False, index=True)
 	oneAcademicPoint = db.Column(db.Boolean, nullable=True, default=False)
 	twoAcademicPoints = db.Column(db.Boolean, nullable=True, default=False)
 	threeAcademicPoints = db.Column(db.Boolean, nullable=True, default=False)
@@ -79,14 +85,14 @@ class ProposedProject(db.Model):
 
 class Project(db.Model):
 	id = db.Column(db.Integer, primary_key=True)
-	title = db.Column(db.String(60), nullable=False)
+	title = db.Column(db.String(60), nullable=False, index=True)
 	semester = db.Column(db.String(20), nullable=False)
 	year = db.Column(db.Integer, nullable=False)
 	grade = db.Column(db.Integer, nullable=True)
 	comments = db.Column(db.Text, nullable=True)
 	image = db.Column(db.String(50), nullable=True)
 	
-	status = db.Column(db.String(50), nullable=True)
+	status = db.Column(db.String(50), nullable=True, index=True)
 	requirementsDoc = db.Column(db.Boolean, nullable=True, default=False)
 	firstMeeting = db.Column(db.Boolean, nullable=True, default=False)
 	halfwayPresentation = db.Column(db.Boolean, nullable=True, default=False)
@@ -118,7 +124,18 @@ class Project(db.Model):
 	poster = db.Column(db.String(50), nullable=True)
 	posterEditableByStudents = db.Column(db.Boolean, nullable=False, default=True)
 
+	__table_args__ = (
+		# projects of a semester (lab overview, projects table filters)
+		db.Index('ix_project_year_semester_status', 'year', 'semester', 'status'),
+		# the showcase, published and approved projects by year
+		db.Index('ix_project_published_projectDocApproved_year', 'published', 'projectDocApproved', 'year'),
+	)
+
 	courses = db.relationship('Course', secondary='student_project', backref=db.backref('projects', lazy='dynamic'))	
+	# read only and not dynamic, unlike "students" and "supervisors", so they can be loaded together with the project
+	# (see database.getProjectWithPeople). every StudentProject row has its student and course id
+	studentProjects = db.relationship('StudentProject', viewonly=True, order_by='StudentProject.studentId')
+	supervisorsList = db.relationship('Supervisor', secondary='supervisor_project', viewonly=True, order_by='Supervisor.id')
 	
 	def __repr__(self):
 		return "Project({}, {}, {}, {}, {}, {}, {}, {}, {}, {}, {}, {}, {})".format(self.id, self.title, self.semester, self.year, self.grade, self.comments, self.requirementsDoc, self.firstMeeting, self.halfwayPresentation, self.finalMeeting, self.equipmentReturned, self.projectDoc, self.gradeStatus)
@@ -155,22 +172,25 @@ class Project(db.Model):
 
 	@property
 	def studentsFullNameEng(self):
-		return [s.firstNameEng + ' ' + s.lastNameEng for s in self.students]
+		return [sp.student.firstNameEng + ' ' + sp.student.lastNameEng for sp in self.studentProjects]
 
 	@property
 	def studentsForPublishedProject(self):
+		# imported here, images imports cacheSync and the database module, which import this module
+		from avr import images
 		students = []
-		for s in self.students:
-			profilePic = f"static/images/profile/{s.profilePic}" if s.profilePic else "static/images/profile/default.png"
+		for s in [sp.student for sp in self.studentProjects]:
+			profilePicWebp, profilePic = images.variantUrls("images/profile", s.profilePic or "default.png", "thumb")
 			students.append({
 				"profilePic": profilePic,
+				"profilePicWebp": profilePicWebp,
 				"fullNameEng": s.firstNameEng + ' ' + s.lastNameEng
 			})
 		return students
 	
 	@property
 	def supervisorsFullNameEng(self):
-		return [s.firstNameEng + ' ' + s.lastNameEng for s in self.supervisors]
+		return [s.firstNameEng + ' ' + s.lastNameEng for s in self.supervisorsList]
 	
 
 class Supervisor(db.Model):
@@ -182,7 +202,7 @@ class Supervisor(db.Model):
 	lastNameHeb = db.Column(db.String(40),nullable=False)
 	email = db.Column(db.String(150), nullable=True)
 	phone = db.Column(db.String(20), nullable=True)
-	status = db.Column(db.String(30), nullable=False, default="active")
+	status = db.Column(db.String(30), nullable=False, default="active", index=True)
 
 	projects = db.relationship('Project', secondary='supervisor_project', backref=db.backref('supervisors', lazy='dynamic'), order_by='Project.year.desc(),Project.semester.asc()')
 
@@ -192,21 +212,42 @@ class Supervisor(db.Model):
 
 # bridge table between supervisors and proposed projects
 supervisor_proposed_project = db.Table('supervisor_proposed_project',
-					db.Column('supervisorId', db.Integer, db.ForeignKey('supervisor.id')),
-					db.Column('proposedProjectId', db.Integer, db.ForeignKey('proposed_project.id')))
+					db.Column('supervisorId', db.Integer, db.ForeignKey('supervisor.id'), index=True),
+					db.Column('proposedProjectId', db.Integer, db.ForeignKey('proposed_project.id'), index=True))
 
 
 # bridge table between supervisors and projects
 supervisor_project = db.Table('supervisor_project',
-					db.Column('supervisorId', db.Integer, db.ForeignKey('supervisor.id')),
-					db.Column('projectId', db.Integer, db.ForeignKey('project.id')))
+					db.Column('supervisorId', db.Integer, db.ForeignKey('supervisor.id'), index=True),
+					db.Column('projectId', db.Integer, db.ForeignKey('project.id'), index=True))
 
 
-# bridge table between students and projects
+# bridge table between students and projects.
+# lookups by studentId use the primary key index (studentId is its first column)
 class StudentProject(db.Model):
 	studentId = db.Column(db.Integer, db.ForeignKey('student.id') ,nullable=False, primary_key=True)
-	projectId = db.Column(db.Integer, db.ForeignKey('project.id') ,nullable=False, primary_key=True)
-	courseId = db.Column(db.Integer, db.ForeignKey('course.id') ,nullable=False, primary_key=True)
+	projectId = db.Column(db.Integer, db.ForeignKey('project.id') ,nullable=False, primary_key=True, index=True)
+	courseId = db.Column(db.Integer, db.ForeignKey('course.id') ,nullable=False, primary_key=True, index=True)
+
+	# loaded in the same query as the row, a project's students are always read with it
+	student = db.relationship('Student', viewonly=True, lazy='joined', innerjoin=True)
+
+# each student and their last project, a materialized copy of students_view for the students admin table.
+# the rows are kept up to date by the database module whenever a student or his projects change
+class StudentLastProject(db.Model):
+	id = db.Column(db.Integer, db.ForeignKey('student.id'), primary_key=True)
+	profilePic = db.Column(db.String(50), nullable=True)
+	year = db.Column(db.Integer, nullable=True, index=True)
+	semester = db.Column(db.String(20), nullable=True, index=True)
+	studentId = db.Column(db.String(20), nullable=False, index=True)
+	firstNameHeb = db.Column(db.String(30), nullable=False, index=True)
+	lastNameHeb = db.Column(db.String(30), nullable=False, index=True)
+	lastProjectTitle = db.Column(db.String(60), nullable=True, index=True)
+	lastProjectStatus = db.Column(db.String(50), nullable=True, index=True)
+	lastProjectId = db.Column(db.Integer, nullable=True, index=True)
+
+	def __repr__(self):
+		return "StudentLastProject({}, {}, {}, {})".format(self.id, self.studentId, self.lastProjectId, self.lastProjectTitle)
 
 class Admin(db.Model):
 	id = db.Column(db.Integer, primary_key=True)
@@ -224,4 +265,79 @@ class Course(db.Model):
 	isDefault = db.Column(db.Boolean, unique=True, nullable=True)
 
 	def __repr__(self):
-		return "Course({}, {}, {}, {})".format(self.id, self.number, self.name, self.academicPoints) 
\ No newline at end of file
+		return "Course({}, {}, {}, {})".format(self.id, self.number, self.name, self.academicPoints) 
+
+# an uploaded image that the media workers convert and resize (see media.py)
+class MediaJob(db.Model):
+	id = db.Column(db.Integer, primary_key=True)
+	folder = db.Column(db.String(50), nullable=False)
+	# the uploaded file, and the image it becomes (they differ when it is converted)
+	sourceName = db.Column(db.String(50), nullable=False)
+	imageName = db.Column(db.String(50), nullable=False)
+	# pending, done or failed
+	status = db.Column(db.String(20), nullable=False, default="pending", index=True)
+	error = db.Column(db.Text, nullable=True)
+	createdAt = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+	finishedAt = db.Column(db.DateTime, nullable=True)
+
+	def __repr__(self):
+		return "MediaJob({}, {}, {}, {})".format(self.id, self.folder, self.imageName, self.status)
+
+# a file of the content addressed file store (see filestore.py): a name in a folder and the number of references to it
+class StoredFile(db.Model):
+	__table_args__ = (db.UniqueConstraint('folder', 'name'),)
+	id = db.Column(db.Integer, primary_key=True)
+	# relative to avr/: static/images/profile
+	folder = db.Column(db.String(50), nullable=False)
+	name = db.Column(db.String(50), nullable=False)
+	# sha256 of the content, the name of its blob
+	hash = db.Column(db.String(64), nullable=False, index=True)
+	size = db.Column(db.Integer, nullable=False)
+	refCount = db.Column(db.Integer, nullable=False, default=1)
+	createdAt = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+	def __repr__(self):
+		return "StoredFile({}, {}, {}, {})".format(self.id, self.folder, self.name, self.refCount)
+
+# a YouTube operation of a project's video, run by the YouTube workers (see youtubeJobs.py)
+class YoutubeJob(db.Model):
+	__table_args__ = (db.Index('ix_youtube_job_status_runAt', 'status', 'runAt'),)
+	id = db.Column(db.Integer, primary_key=True)
+	projectId = db.Column(db.Integer, nullable=False, index=True)
+	# upload, overwrite, setPublic or processing
+	kind = db.Column(db.String(20), nullable=False)
+	# queued, running, done or failed
+	status = db.Column(db.String(20), nullable=False, default="queued")
+	# failed runs so far, a job is retried until it fails maxAttempts times
+	attempts = db.Column(db.Integer, nullable=False, default=0)
+	maxAttempts = db.Column(db.Integer, nullable=False)
+	# a queued job runs from this time on (later when it's retried)
+	runAt = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+	error = db.Column(db.Text, nullable=True)
+	createdAt = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+	startedAt = db.Column(db.DateTime, nullable=True)
+	finishedAt = db.Column(db.DateTime, nullable=True)
+	# the lease of a running job: the worker that runs it and the last time it said it still does,
+	# a job whose lease expired (its process stopped) is queued again
+	claimedBy = db.Column(db.String(64), nullable=True)
+	heartbeatAt = db.Column(db.DateTime, nullable=True)
+
+	def __repr__(self):
+		return "YoutubeJob({}, {}, {}, {})".format(self.id, self.projectId, self.kind, self.status)
+
+
+# an invalidation of an in-memory cache, applied by the other processes of the server (see cacheSync.py).
+# the ids are never reused (AUTOINCREMENT), so a process can tell the invalidations it missed
+class CacheInvalidation(db.Model):
+	__table_args__ = {"sqlite_autoincrement": True}
+	id = db.Column(db.Integer, primary_key=True)
+	# facets or showcase
+	cache = db.Column(db.String(20), nullable=False)
+	# json of what was invalidated (null for the whole cache)
+	keys = db.Column(db.Text, nullable=True)
+	# the process that invalidated it (its own caches are already invalidated)
+	origin = db.Column(db.String(16), nullable=False)
+	createdAt = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+	def __repr__(self):
+		return "CacheInvalidation({}, {}, {})".format(self.id, self.cache, self.keys)
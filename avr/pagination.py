@@ -0,0 +1,65 @@
+from itsdangerous import URLSafeSerializer, BadSignature
+from avr import app
+
+# Cursors of the keyset (seek) pagination of the admin tables.
+# A page is located by the key values of the row it starts after, instead of by an offset,
+# so every page costs the same no matter how deep it is (the seek condition is built by the tables module).
+# "keys" is a list of (columnName, descending) pairs, always ending with the id column
+# so the order is total.
+
+
+def _serializer():
+	return URLSafeSerializer(app.config['SECRET_KEY'], salt='table-cursor')
+
+
+def encodeCursor(sort, order, values, direction):
+	return _serializer().dumps({"s": sort or "", "o": order, "v": values, "d": direction})
+
+
+def decodeCursor(cursor, sort, order):
+	# returns (values, direction), or (None, "next") for the first page / an invalid or stale cursor
+	if not cursor:
+		return None, "next"
+	try:
+		data = _serializer().loads(cursor)
+	except BadSignature:
+		return None, "next"
+	# a cursor is only valid for the sort it was created with
+	if data.get("s") != (sort or "") or data.get("o") != order:
+		return None, "next"
+	return data["v"], data["d"]
+
+
+def noPageCursors():
+	# offset based pagination has no cursors
+	return {"next": None, "prev": None}
+
+
+def tableKeys(sortKeys, sort, order):
+	# sortKeys maps a sort name to its columns as (columnName, descending), None means "in the requested order"
+	descending = order == "desc"
+	if sort not in sortKeys:
+		return [("id", False)]
+	return [(name, descending if fixed is None else fixed) for name, fixed in sortKeys[sort]] + [("id", descending)]
+
+
+def rowKey(row, keys):
+	return [getattr(row, name) for name, _ in keys]
+
+
+def keysetPage(rows, keys, limit, sort, order, values, direction):
+	# "rows" were fetched with limit+1 so we know if there is another page in the fetch direction
+	rows = list(rows)
+	hasMore = len(rows) > limit
+	rows = rows[:limit]
+	if direction == "prev":
+		rows.reverse()
+	nextCursor = None
+	prevCursor = None
+	if rows:
+		if direction == "next" and hasMore or direction == "prev":
+			nextCursor = encodeCursor(sort, order, rowKey(rows[-1], keys), "next")
+		if direction == "prev" and hasMore or direction == "next" and values is not None:
+			prevCursor = encodeCursor(sort, order, rowKey(rows[0], keys), "prev")
+	return rows, {"next": nextCursor, "prev": prevCursor}
+
@@ -13,10 +13,15 @@ from avr.models import (Student, User, Admin, Project, Supervisor, StudentProjec
 from flask_login import login_user, current_user, logout_user, login_required
 from flask_mail import Message
 from avr import utils
+from avr import images
+from avr import media
+from avr import uploads
+from avr import youtubeJobs
+from avr import statusHub
 from avr import database
+from avr import facets
+from avr import showcase as showcaseCache
 import traceback
-from threading import Thread
-import time
 from werkzeug.exceptions import RequestEntityTooLarge
 
 
@@ -38,7 +43,21 @@ def labOverview():
 	if not current_user.is_authenticated or current_user.userType != "admin":
 		return redirect(url_for('login'))
 	overview = database.getLabOverview()
-	return render_template("/admin/labOverview.html", overview=overview)
+	youtubeJobsList = database.getYoutubeJobsOverview()
+	return render_template("/admin/labOverview.html", overview=overview, youtubeJobs=youtubeJobsList)
+
+
+@app.route('/Admin/YoutubeJobs/<int:id>/Retry', methods=['POST'])
+def retryYoutubeJob(id):
+	if not current_user.is_authenticated or current_user.userType != "admin":
+		return redirect(url_for('login'))
+	try:
+		if youtubeJobs.retry(id):
+			flash('The YouTube job was queued again.', 'success')
+	except Exception as e:
+		app.logger.error('In retryYoutubeJob, Error is: {}\n{}'.format(e, traceback.format_exc()))
+		flash('Error: could not retry the YouTube job.', 'danger')
+	return redirect(url_for('labOverview'))
 
 
 @app.route('/Admin/Courses', methods=['GET', 'POST'])
@@ -153,8 +172,10 @@ def getCoursesTableData():
 		limit = request.args.get('limit') or 10
 		offset = request.args.get('offset') or 0
 		filters = request.args.get('filter')
+		# cursor based pagination is used only when a cursor is sent (an empty cursor is the first page)
+		cursor = request.args.get('cursor')
 		
-		totalResults, results = database.getCoursesTableData(sort, order, limit, offset, filters)
+		totalResults, results, pageCursors = database.getCoursesTableData(sort, order, limit, offset, filters, cursor)
 		
 		rows = []
 		for result in results:
@@ -174,6 +195,8 @@ def getCoursesTableData():
 		return jsonify( 
 			total=totalResults,
 			rows=rows,
+			nextCursor=pageCursors["next"],
+			prevCursor=pageCursors["prev"],
 			filterOptions={}
 		)
 		
@@ -262,8 +285,10 @@ def getSupervisorsTableData():
 		limit = request.args.get('limit') or 10
 		offset = request.args.get('offset') or 0
 		filters = request.args.get('filter')
+		# cursor based pagination is used only when a cursor is sent (an empty cursor is the first page)
+		cursor = request.args.get('cursor')
 		
-		totalResults, results = database.getSupervisorsTableData(sort, order, limit, offset, filters)	
+		totalResults, results, pageCursors = database.getSupervisorsTableData(sort, order, limit, offset, filters, cursor)	
 		rows = []
 		for result in results:
 			rows.append({
@@ -283,6 +308,8 @@ def getSupervisorsTableData():
 		return jsonify( 
 			total=totalResults,
 			rows=rows,
+			nextCursor=pageCursors["next"],
+			prevCursor=pageCursors["prev"],
 			filterOptions={
 				"status": status
 			})
@@ -434,9 +461,9 @@ def getStudentsTableForProjectData():
 		
 		rows = []
 		for result in results:
-			profilePic = f"<img style='width:50px;height:50px;margin: 0 0.7rem;' src='/static/images/profile/default.png' alt='default profile pic'>"
+			profilePic = images.picture("images/profile", "default.png", "thumb", style="width:50px;height:50px;margin: 0 0.7rem;", alt="default profile pic")
 			if result.profilePic:	
-				profilePic = f"<img style='width:50px;height:50px;margin: 0 0.7rem;' src='/static/images/profile/{result.profilePic}' alt='{result.profilePic}'>"
+				profilePic = images.picture("images/profile", result.profilePic, "thumb", style="width:50px;height:50px;margin: 0 0.7rem;", alt=result.profilePic)
 
 			rows.append({
 				"profilePic": profilePic,
@@ -451,13 +478,17 @@ def getStudentsTableForProjectData():
 				"email": result.email,
 			})
 
-		# get filters options for the table
-		filterOptions = database.getStudentsTableForProjectFilters()
+		# get filters options for the table, only if the browser doesn't have their current version
+		filterOptionsVersion = facets.version("studentsForProjectTable")
+		filterOptions = None
+		if request.args.get('filterOptionsVersion') != filterOptionsVersion:
+			filterOptions = database.getStudentsTableForProjectFilters()
 
 		return jsonify( 
 			total=totalResults,
 			rows=rows,
-			filterOptions=filterOptions
+			filterOptions=filterOptions,
+			filterOptionsVersion=filterOptionsVersion
 		)
 		
 	except Exception as e:
@@ -476,14 +507,16 @@ def getStudentsTableData():
 		limit = request.args.get('limit') or 10
 		offset = request.args.get('offset') or 0
 		filters = request.args.get('filter')
+		# cursor based pagination is used only when a cursor is sent (an empty cursor is the first page)
+		cursor = request.args.get('cursor')
 		
-		totalResults, results = database.getStudentsTableData(sort, order, limit, offset, filters)
+		totalResults, results, pageCursors = database.getStudentsTableData(sort, order, limit, offset, filters, cursor)
 		
 		rows = []
 		for result in results:
-			profilePic = f"<img style='width:50px;height:50px;' src='/static/images/profile/default.png' alt='default profile pic'>"
+			profilePic = images.picture("images/profile", "default.png", "thumb", style="width:50px;height:50px;", alt="default profile pic")
 			if result.profilePic:	
-				profilePic = f"<img style='width:50px;height:50px;' src='/static/images/profile/{result.profilePic}' alt='{result.profilePic}'>"
+				profilePic = images.picture("images/profile", result.profilePic, "thumb", style="width:50px;height:50px;", alt=result.profilePic)
 
 			lastProjectTitle = f"<span class='badge shadow-sm' name='studentNOProjectBadge'>NO PROJECT</span>"
 			if result.lastProjectTitle:
@@ -502,12 +535,18 @@ def getStudentsTableData():
 				"btnDelete": f"<button type='button' onclick='deleteStudent({result.id})' name='btnDelete' class='btn' data-toggle='modal' data-target='#deleteStudentModal'><i class='fa fa-trash fa-fw'></i> Delete</button>"
 			})
 
-		# get filters options for the table
-		filterOptions = database.getStudentsTableFilters()
+		# get filters options for the table, only if the browser doesn't have their current version
+		filterOptionsVersion = facets.version("studentsTable")
+		filterOptions = None
+		if request.args.get('filterOptionsVersion') != filterOptionsVersion:
+			filterOptions = database.getStudentsTableFilters()
 		return jsonify( 
 			total=totalResults,
 			rows=rows,
-			filterOptions=filterOptions
+			nextCursor=pageCursors["next"],
+			prevCursor=pageCursors["prev"],
+			filterOptions=filterOptions,
+			filterOptionsVersion=filterOptionsVersion
 		)
 		
 	except Exception as e:
@@ -607,23 +646,21 @@ def getProjectData(id):
 		return redirect(url_for('login'))
 	
 	try:
-		project = database.getProjectById(id)
+		project = database.getProjectWithPeople(id)
 		if not project:
 			return jsonify({})
 		studentsInProject = [{
-			"id": s.id, 
-			"studentId": s.studentId,
-			"firstNameHeb": s.firstNameHeb,
-			"lastNameHeb": s.lastNameHeb,
-			"firstNameEng": s.firstNameEng,
-			"lastNameEng": s.lastNameEng,
-			"email": s.email,
-			"profilePic": f"<img style='width:50px;height:50px;' src='/static/images/profile/{s.profilePic}' alt='{s.profilePic}'>" if s.profilePic else f"<img style='width:50px;height:50px;' src='/static/images/profile/default.png' alt='default profile pic'>"
-				
-		} for s in project.students]
-		for student in studentsInProject:
-			student["courseId"] = database.getCourseIdForStudentInProject(id, student["id"])
-		supervisors = [{"id": s.id, "fullNameEng": s.firstNameEng+" "+s.lastNameEng} for s in project.supervisors]
+			"id": sp.student.id, 
+			"studentId": sp.student.studentId,
+			"firstNameHeb": sp.student.firstNameHeb,
+			"lastNameHeb": sp.student.lastNameHeb,
+			"firstNameEng": sp.student.firstNameEng,
+			"lastNameEng": sp.student.lastNameEng,
+			"email": sp.student.email,
+			"profilePic": images.picture("images/profile", sp.student.profilePic, "thumb", style="width:50px;height:50px;", alt=sp.student.profilePic) if sp.student.profilePic else images.picture("images/profile", "default.png", "thumb", style="width:50px;height:50px;", alt="default profile pic"),
+			"courseId": sp.courseId
+		} for sp in project.studentProjects]
+		supervisors = [{"id": s.id, "fullNameEng": s.firstNameEng+" "+s.lastNameEng} for s in project.supervisorsList]
 
 		projectData = { 
 			"id": project.id,
@@ -681,15 +718,18 @@ def deleteProject():
 				utils.delete_project_image(project.image)
 			# delete project doc files
 			if project.projectDocImage:
-				utils.deleteLocalFile(os.path.join(app.root_path, "static", "project_doc", "image", project.projectDocImage))
+				utils.delete_project_doc_image(project.projectDocImage)
 			if project.report:
-				utils.deleteLocalFile(os.path.join(app.root_path, "static", "project_doc", "report", project.report))
+				utils.delete_project_doc_file(project.report, "report")
 			if project.presentation:
-				utils.deleteLocalFile(os.path.join(app.root_path, "static", "project_doc", "presentation", project.presentation))
+				utils.delete_project_doc_file(project.presentation, "presentation")
 			if project.code:
-				utils.deleteLocalFile(os.path.join(app.root_path, "static", "project_doc", "code", project.code))
+				utils.delete_project_doc_file(project.code, "code")
 			if project.poster:
-				utils.deleteLocalFile(os.path.join(app.root_path, "static", "project_doc", "poster", project.poster))
+				utils.delete_project_doc_file(project.poster, "poster")
+			# the video that was not uploaded to YouTube yet
+			if project.localVideo:
+				utils.delete_project_doc_file(project.localVideo, "video")
 			# delete project 
 			app.logger.info('In deleteProject, deleting {}'.format(project))
 			database.deleteProject(project.id)
@@ -714,8 +754,10 @@ def getProjectsTableData():
 		limit = request.args.get('limit') or 10
 		offset = request.args.get('offset') or 0
 		filters = request.args.get('filter')
+		# cursor based pagination is used only when a cursor is sent (an empty cursor is the first page)
+		cursor = request.args.get('cursor')
 		
-		totalResults, results = database.getProjectsTableData(sort, order, limit, offset, filters)
+		totalResults, results, pageCursors = database.getProjectsTableData(sort, order, limit, offset, filters, cursor)
 		
 		rows = []	
 		for result in results:
@@ -724,7 +766,7 @@ def getProjectsTableData():
 			 	btnPublished = f"<label class='switch my-auto'><input type='checkbox' name='publishStatusCheckbox' data-id={result.id} class='primary' {'checked' if result.published else ''}><span class='slider round'></span></label>"
 				 
 			rows.append({
-				"image": f"<img style='width:80px;height:70px;' src='/static/images/projects/{result.image}' alt='{result.image}'" if result.image else "",
+				"image": images.picture("images/projects", result.image, "thumb", style="width:80px;height:70px;", alt=result.image) if result.image else "",
 				"year": result.year,
 				"semester": result.semester,
 				"title": result.title,
@@ -734,13 +776,19 @@ def getProjectsTableData():
 				"btnDelete": f"<button type='button' onclick='deleteProject({result.id})' name='btnDelete' class='btn' data-toggle='modal' data-target='#deleteProjectModal'><i class='fa fa-trash fa-fw'></i> Delete</button>"
 			})
 
-		# get filters options for the table
-		filterOptions = database.getProjectsTableFilters()
+		# get filters options for the table, only if the browser doesn't have their current version
+		filterOptionsVersion = facets.version("projectsTable")
+		filterOptions = None
+		if request.args.get('filterOptionsVersion') != filterOptionsVersion:
+			filterOptions = database.getProjectsTableFilters()
 
 		return jsonify( 
 			total=totalResults,
 			rows=rows,
-			filterOptions=filterOptions
+			nextCursor=pageCursors["next"],
+			prevCursor=pageCursors["prev"],
+			filterOptions=filterOptions,
+			filterOptionsVersion=filterOptionsVersion
 		)
 		
 	except Exception as e:
@@ -768,7 +816,7 @@ def getProjectYoutubePublicStatus(id):
 			database.updateProject(project.id, {
 				"youtubeVideoPublicStatus": "changing"
 			})
-			Thread(target=utils.set_youtube_video_public, kwargs={"appArg": app, "projectId": project.id}).start()
+			youtubeJobs.enqueue("setPublic", project.id)
 	
 		status = project.youtubeVideoPublicStatus
 		if status == "success":
@@ -914,25 +962,25 @@ def manageProjects():
 						projectDocImageFileName = project.projectDocImage
 						if editForm.projectDocImage.data:
 							if project.projectDocImage:
-								utils.deleteLocalFile(os.path.join(app.root_path, "static", "project_doc", "image", project.projectDocImage))
-							projectDocImageFileName = utils.save_form_file(editForm.projectDocImage.data, os.path.join("static", "project_doc", "image"))
+								utils.delete_project_doc_image(project.projectDocImage)
+							projectDocImageFileName = utils.save_project_doc_image(editForm.projectDocImage.data)
 
 						reportFileName = project.report
 						if editForm.report.data:
 							if project.report:
-								utils.deleteLocalFile(os.path.join(app.root_path, "static", "project_doc", "report", project.report))
+								utils.delete_project_doc_file(project.report, "report")
 							reportFileName = utils.save_form_file(editForm.report.data, os.path.join("static", "project_doc", "report"))
 						
 						presentationFileName = project.presentation
 						if editForm.presentation.data:
 							if project.presentation:
-								utils.deleteLocalFile(os.path.join(app.root_path, "static", "project_doc", "presentation", project.presentation))
+								utils.delete_project_doc_file(project.presentation, "presentation")
 							presentationFileName = utils.save_form_file(editForm.presentation.data, os.path.join("static", "project_doc", "presentation"))
 						
 						codeFileName = project.code
 						if editForm.code.data:
 							if project.code:
-								utils.deleteLocalFile(os.path.join(app.root_path, "static", "project_doc", "code", project.code))
+								utils.delete_project_doc_file(project.code, "code")
 							codeFileName = utils.save_form_file(editForm.code.data, os.path.join("static", "project_doc", "code"))
 	
 						
@@ -1069,8 +1117,10 @@ def getProposedProjectsTableData():
 		limit = request.args.get('limit') or 10
 		offset = request.args.get('offset') or 0
 		filters = request.args.get('filter')
+		# cursor based pagination is used only when a cursor is sent (an empty cursor is the first page)
+		cursor = request.args.get('cursor')
 		
-		totalResults, results = database.getProposedProjectsTableData(sort, order, limit, offset, filters)
+		totalResults, results, pageCursors = database.getProposedProjectsTableData(sort, order, limit, offset, filters, cursor)
 		
 		rows = []
 		for result in results:
@@ -1080,7 +1130,7 @@ def getProposedProjectsTableData():
 			description = " ".join(wordsInDescription[:maxWordsInDescription])
 			description += ("..." if len(wordsInDescription) > maxWordsInDescription else "" )
 			rows.append({
-				"image": f"<img style='width:80px;height:70px;' src='/static/images/proposed_projects/{result.image}' alt='{result.image}'" if result.image else "",
+				"image": images.picture("images/proposed_projects", result.image, "thumb", style="width:80px;height:70px;", alt=result.image) if result.image else "",
 				"title": result.title,
 				"description": description,
 				"supervisorsNames": ",<br>".join(supervisors),
@@ -1089,10 +1139,19 @@ def getProposedProjectsTableData():
 				"btnDelete": f"<button type='button' onclick='deleteProposedProject({result.id})' name='btnDelete' class='btn' data-toggle='modal' data-target='#deleteProposedProjectModal'><i class='fa fa-trash fa-fw'></i> Delete</button>"
 			})
 
+		# get filters options for the table, only if the browser doesn't have their current version
+		filterOptionsVersion = facets.version("proposedProjectsTable")
+		filterOptions = None
+		if request.args.get('filterOptionsVersion') != filterOptionsVersion:
+			filterOptions = database.getProposedProjectsTableFilters()
+
 		return jsonify( 
 			total=totalResults,
 			rows=rows,
-			filterOptions={}
+			nextCursor=pageCursors["next"],
+			prevCursor=pageCursors["prev"],
+			filterOptions=filterOptions,
+			filterOptionsVersion=filterOptionsVersion
 		)
 		
 	except Exception as e:
@@ -1298,7 +1357,7 @@ def sendPoster(id):
 		if allowedToSend and request.method == "POST":
 			if posterForm.validate_on_submit():
 				if project.poster:
-					utils.deleteLocalFile(os.path.join(app.root_path, "static", "project_doc", "poster", project.poster))
+					utils.delete_project_doc_file(project.poster, "poster")
 				posterFileName = utils.save_form_file(posterForm.poster.data, os.path.join("static", "project_doc", "poster"))
 				database.updateProject(id, {
 					"poster": posterFileName
@@ -1340,36 +1399,33 @@ def sendPoster(id):
 
 		
 
+def getYoutubeStatusProject(id):
+	# the project whose YouTube status the current user can watch (a student of the project that sent its project doc),
+	# None when they can't. the status streams of the asgi server (asgi.py) are checked by it too
+	if not current_user.is_authenticated or current_user.userType != "student":
+		return None
+	student = database.getStudentByStudentId(current_user.userId)
+	if student is None or not database.isStudentEnrolledInProject(id, student.id):
+		return None
+	project = database.getProjectById(id)
+	if project is None or not project.projectDocImage:
+		return None
+	return project
+
+
 @app.route('/ProjectStatus/<int:id>/YoutubeStatus', methods=['GET', 'POST'])
 def getProjectYoutubeUploadStatus(id):
 	if not current_user.is_authenticated:
 		return redirect(url_for('login'))
 
-	def getStatusStream(projectId):
-		project = database.getProjectById(projectId)
-		while True:
-			db.session.refresh(project)
-			result = json.dumps({
-				"uploadStatus": project.youtubeUploadStatus,
-				"processingStatus": project.youtubeProcessingStatus,
-				"processingFailureReason": project.youtubeProcessingFailureReason,
-				"processingEstimatedTimeLeft": project.youtubeProcessingEstimatedTimeLeft
-			})
-			yield "data: {}\n\n".format(result)
-			time.sleep(3.0)
-
 	try:
-		student = database.getStudentByStudentId(current_user.userId)
-		isStudentEnrolledInProject = database.isStudentEnrolledInProject(id, student.id)
-		if not isStudentEnrolledInProject:
-			return redirect(url_for('projectStatus', id=id))
-
-		project = database.getProjectById(id)
-		if not project.projectDocImage:
+		project = getYoutubeStatusProject(id)
+		if project is None:
 			return redirect(url_for('projectStatus', id=id))
 
-		
-		return Response(getStatusStream(id), mimetype="text/event-stream") 
+		# the status changes are pushed to the stream by the YouTube jobs (statusHub.py)
+		return Response(statusHub.stream(id, statusHub.projectStatus(project)), mimetype="text/event-stream",
+			headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 			
 	except Exception as e:
 		app.logger.error('Error is: {}\n{}'.format(e, traceback.format_exc()))
@@ -1398,16 +1454,28 @@ def sendProjectDoc(id):
 
 		if allowedToSend and request.method == "POST":
 			if projectDocForm.validate_on_submit():
-				videoFileName = utils.save_form_file(projectDocForm.video.data, os.path.join("static", "project_doc", "video"))
-				if os.path.getsize(os.path.join(app.root_path, "static", "project_doc", "video", videoFileName)) == 0:
-					utils.deleteLocalFile(os.path.join(app.root_path, "static", "project_doc", "video", videoFileName))
-					return jsonify({
-						"status": "error",
-						"errors": {
-							"video": "Video file could not be empty."
-						}
-					})
-				imageFileName = utils.save_form_file(projectDocForm.image.data, os.path.join("static", "project_doc", "image"))
+				if projectDocForm.videoUpload.data:
+					# the video was uploaded in chunks (uploads.py)
+					try:
+						videoFileName = uploads.finishUpload(projectDocForm.videoUpload.data, project.id, student.id)
+					except uploads.UploadError as e:
+						return jsonify({
+							"status": "error",
+							"errors": {
+								"video": [str(e)]
+							}
+						})
+				else:
+					videoFileName = utils.save_form_file(projectDocForm.video.data, os.path.join("static", "project_doc", "video"))
+					if os.path.getsize(os.path.join(app.root_path, "static", "project_doc", "video", videoFileName)) == 0:
+						utils.delete_project_doc_file(videoFileName, "video")
+						return jsonify({
+							"status": "error",
+							"errors": {
+								"video": "Video file could not be empty."
+							}
+						})
+				imageFileName = utils.save_project_doc_image(projectDocForm.image.data)
 				reportFileName = utils.save_form_file(projectDocForm.report.data, os.path.join("static", "project_doc", "report"))
 				presentationFileName = utils.save_form_file(projectDocForm.presentation.data, os.path.join("static", "project_doc", "presentation"))
 				codeFileName = None
@@ -1429,7 +1497,7 @@ def sendProjectDoc(id):
 				})
 
 				# upload the video async
-				Thread(target=utils.upload_video_to_youtube, kwargs={"appArg": app,	"projectId": project.id}).start()				
+				youtubeJobs.enqueue("upload", project.id)
 				return jsonify({
 					"status": "success"
 				})
@@ -1485,7 +1553,7 @@ def editProjectDoc(id):
 
 		if allowedToEdit and request.method == "POST":
 			if projectDocForm.validate_on_submit():
-				if (not project.youtubeVideo) and (not projectDocForm.video.data):
+				if (not project.youtubeVideo) and (not projectDocForm.video.data) and (not projectDocForm.videoUpload.data):
 					return jsonify({
 						"status": "error",
 						"errors": {
@@ -1498,28 +1566,28 @@ def editProjectDoc(id):
 				if projectDocForm.image.data:
 					somethingChanged = True
 					if project.projectDocImage:
-						utils.deleteLocalFile(os.path.join(app.root_path, "static", "project_doc", "image", project.projectDocImage))
-					projectDocImageFileName = utils.save_form_file(projectDocForm.image.data, os.path.join("static", "project_doc", "image"))
+						utils.delete_project_doc_image(project.projectDocImage)
+					projectDocImageFileName = utils.save_project_doc_image(projectDocForm.image.data)
 
 				reportFileName = project.report
 				if projectDocForm.report.data:
 					somethingChanged = True
 					if project.report:
-						utils.deleteLocalFile(os.path.join(app.root_path, "static", "project_doc", "report", project.report))
+						utils.delete_project_doc_file(project.report, "report")
 					reportFileName = utils.save_form_file(projectDocForm.report.data, os.path.join("static", "project_doc", "report"))
 				
 				presentationFileName = project.presentation
 				if projectDocForm.presentation.data:
 					somethingChanged = True
 					if project.presentation:
-						utils.deleteLocalFile(os.path.join(app.root_path, "static", "project_doc", "presentation", project.presentation))
+						utils.delete_project_doc_file(project.presentation, "presentation")
 					presentationFileName = utils.save_form_file(projectDocForm.presentation.data, os.path.join("static", "project_doc", "presentation"))
 				
 				codeFileName = project.code
 				if projectDocForm.code.data:
 					somethingChanged = True
 					if project.code:
-						utils.deleteLocalFile(os.path.join(app.root_path, "static", "project_doc", "code", project.code))
+						utils.delete_project_doc_file(project.code, "code")
 					codeFileName = utils.save_form_file(projectDocForm.code.data, os.path.join("static", "project_doc", "code"))
 
 				if projectDocForm.githubLink.data != project.githubLink or projectDocForm.abstract.data != project.abstract:
@@ -1537,10 +1605,22 @@ def editProjectDoc(id):
 						"status": "דף פרויקט - טיוטה"
 					})
 
-				if projectDocForm.video.data:
-					videoFileName = utils.save_form_file(projectDocForm.video.data, os.path.join("static", "project_doc", "video"))
+				if projectDocForm.video.data or projectDocForm.videoUpload.data:
+					if projectDocForm.videoUpload.data:
+						# the video was uploaded in chunks (uploads.py)
+						try:
+							videoFileName = uploads.finishUpload(projectDocForm.videoUpload.data, project.id, student.id)
+						except uploads.UploadError as e:
+							return jsonify({
+								"status": "error",
+								"errors": {
+									"video": [str(e)]
+								}
+							})
+					else:
+						videoFileName = utils.save_form_file(projectDocForm.video.data, os.path.join("static", "project_doc", "video"))
 					if os.path.getsize(os.path.join(app.root_path, "static", "project_doc", "video", videoFileName)) == 0:
-						utils.deleteLocalFile(os.path.join(app.root_path, "static", "project_doc", "video", videoFileName))
+						utils.delete_project_doc_file(videoFileName, "video")
 						return jsonify({
 							"status": "error",
 							"errors": {
@@ -1549,7 +1629,7 @@ def editProjectDoc(id):
 						})
 					else:
 						if project.localVideo:
-							utils.deleteLocalFile(os.path.join(app.root_path, "static", "project_doc", "video", project.localVideo))
+							utils.delete_project_doc_file(project.localVideo, "video")
 						database.updateProject(project.id, {
 							"localVideo": videoFileName,
 							"projectDocApproved": False,
@@ -1562,13 +1642,13 @@ def editProjectDoc(id):
 						})
 						# upload the video async
 						if project.youtubeVideo:
-							Thread(target=utils.overwrite_youtube_video, kwargs={"appArg": app,	"projectId": project.id}).start()				
+							youtubeJobs.enqueue("overwrite", project.id)
 						else:
-							Thread(target=utils.upload_video_to_youtube, kwargs={"appArg": app,	"projectId": project.id}).start()
+							youtubeJobs.enqueue("upload", project.id)
 					
 
 
-				if not projectDocForm.video.data:
+				if not projectDocForm.video.data and not projectDocForm.videoUpload.data:
 					flash('Project doc was updated successfully!', 'success')
 
 				return jsonify({
@@ -1619,7 +1699,7 @@ def projectStatus(id):
 		if not isStudentEnrolledInProject:
 			flash("You are not enrolled in this project.", 'danger')
 		else:
-			project = database.getProjectById(id)
+			project = database.getProjectWithPeople(id)
 
 		return render_template('projectStatus.html', title="Project Status", student=student, project=project, isStudentEnrolledInProject=isStudentEnrolledInProject)
 	except Exception as e:
@@ -1659,7 +1739,7 @@ def home():
 		return redirect(url_for('labOverview'))
 	# user is a student
 	try:
-		student =  database.getStudentByStudentId(current_user.userId)
+		student =  database.getStudentWithProjects(current_user.userId)
 		projects = student.projects
 		return render_template('studentHome.html', title="Home", student=student, projects=projects)
 	except Exception as e:
@@ -1667,49 +1747,150 @@ def home():
 		return redirect(url_for('errorPage'))
 
 
-@app.route('/Showcase/Project/<int:projectId>', methods=['POST'])
+@app.route('/Showcase/Project/<int:projectId>', methods=['GET', 'POST'])
 def getPublishedProjectDetails(projectId):
 	try:
-		project = database.getPublishedProjectDetails(projectId)
-		projectDetails = {
-			"title": project.title,
-			"abstract": project.abstract,
-			"supervisors": project.supervisorsFullNameEng,
-			"students": project.studentsForPublishedProject,
-			"youtubeVideoId": project.youtubeVideo,
-			"image": f"static/project_doc/image/{project.projectDocImage}",
-			"report": f"static/project_doc/report/{project.report}",
-			"presentation": f"static/project_doc/presentation/{project.presentation}",
-			"code": f"static/project_doc/code/{project.code}" if project.code else "",
-			"githubLink": project.githubLink or "",
-		}
-		return jsonify(projectDetails)
+		projectDetails = showcaseCache.projectJson(projectId)
+		if projectDetails is None:
+			return jsonify({})
+		return showcaseCache.response(projectDetails)
 	except Exception as e:
 		app.logger.error('In getPublishedProjectDetails, Error is: {}\n{}'.format(e, traceback.format_exc()))
 		return jsonify({})
 
 
 
-@app.route('/Showcase/<int:year>', methods=['POST'])
+@app.route('/Showcase/<int:year>', methods=['GET', 'POST'])
 def getPublishedProjectsByYear(year):
 	try:
-		projects = database.getPublishedProjectsByYear(year)
+		return showcaseCache.response(showcaseCache.yearJson(year))
+	except Exception as e:
+		app.logger.error('In getPublishedProjectsByYear, Error is: {}\n{}'.format(e, traceback.format_exc()))
+		return jsonify({})
+
+
+
+@app.route('/Showcase/search', methods=['GET'])
+def searchPublishedProjects():
+	# published projects by title, abstract, supervisors and students: /Showcase/search?q=<words>&limit=<max results>
+	try:
+		query = request.args.get('q', '')
+		try:
+			limit = max(1, min(int(request.args.get('limit', 20)), 100))
+		except ValueError:
+			limit = 20
 		results = []
-		for project in projects:
-			maxCharsInAbstract = 250
-			abstract = project.abstract[:maxCharsInAbstract]
-			abstract += ("..." if len(project.abstract) > maxCharsInAbstract else "" )
-
-			results.append({
-				"id": project.id,
-				"title": project.title,
-				"image": f"static/project_doc/image/{project.projectDocImage}",
-				"abstract": abstract
-			})
-			
+		for project in database.searchPublishedProjects(query, limit):
+			result = showcaseCache.projectSummary(project)
+			result["year"] = project.year
+			results.append(result)
 		return jsonify(results)
 	except Exception as e:
-		app.logger.error('In getPublishedProjectsByYear, Error is: {}\n{}'.format(e, traceback.format_exc()))
+		app.logger.error('In searchPublishedProjects, Error is: {}\n{}'.format(e, traceback.format_exc()))
+		return jsonify({})
+
+
+
+def videoUploadAllowed(project):
+	# students can upload a video while they are allowed to send or edit the project doc (sendProjectDoc, editProjectDoc)
+	if project.finalMeeting and not project.projectDocImage:
+		return True
+	if project.youtubeUploadStatus == "uploading" or (project.youtubeProcessingStatus == "" and project.youtubeUploadStatus == "completed") or project.youtubeProcessingStatus == "checking" or project.youtubeProcessingStatus == "processing":
+		return False
+	return bool(project.projectDocImage and project.projectDocEditableByStudents)
+
+
+def videoUploadStudent(id):
+	# the student that uploads a video of project id, raises UploadError when it's not allowed
+	if not current_user.is_authenticated or current_user.userType != "student":
+		raise uploads.UploadError("Not logged in as a student.", 401)
+	student = database.getStudentByStudentId(current_user.userId)
+	project = database.getProjectById(id)
+	if project is None or not database.isStudentEnrolledInProject(id, student.id) or not videoUploadAllowed(project):
+		raise uploads.UploadError("You are currently not allowed to send project doc.", 403)
+	return student
+
+
+def videoUploadResponse(info, status=200):
+	response = jsonify({
+		"uploadId": info["id"],
+		"offset": info["offset"],
+		"size": info["size"],
+		"chunkSize": app.config['VIDEO_UPLOAD_CHUNK_SIZE']
+	})
+	response.status_code = status
+	response.headers["Upload-Offset"] = str(info["offset"])
+	response.headers["Upload-Length"] = str(info["size"])
+	response.headers["Cache-Control"] = "no-store"
+	return response
+
+
+def videoUploadErrorResponse(e):
+	response = jsonify({
+		"status": "error",
+		"message": str(e),
+		"offset": e.offset
+	})
+	response.status_code = e.status
+	if e.offset is not None:
+		response.headers["Upload-Offset"] = str(e.offset)
+	response.headers["Cache-Control"] = "no-store"
+	return response
+
+
+# chunked, resumable video upload of the project doc forms (uploads.py):
+# POST {name, size} creates an upload, PATCH sends a chunk (Upload-Offset and Upload-Checksum headers, the chunk bytes as body),
+# GET / HEAD returns the upload offset (to resume an upload), DELETE cancels it.
+# the form is sent with the upload id (videoUpload field) when all the chunks were sent
+@app.route('/ProjectStatus/<int:id>/VideoUploads', methods=['POST'])
+def createVideoUpload(id):
+	try:
+		student = videoUploadStudent(id)
+		data = request.get_json(silent=True) or {}
+		info = uploads.createUpload(id, student.id, data.get("name"), data.get("size"))
+		response = videoUploadResponse(info, 201)
+		response.headers["Location"] = url_for('videoUpload', id=id, uploadId=info["id"])
+		return response
+	except uploads.UploadError as e:
+		return videoUploadErrorResponse(e)
+	except Exception as e:
+		app.logger.error('In createVideoUpload, Error is: {}\n{}'.format(e, traceback.format_exc()))
+		return jsonify({"status": "error", "message": "Could not create the upload."}), 500
+
+
+@app.route('/ProjectStatus/<int:id>/VideoUploads/<uploadId>', methods=['GET', 'PATCH', 'DELETE'])
+def videoUpload(id, uploadId):
+	try:
+		student = videoUploadStudent(id)
+		if request.method == "PATCH":
+			try:
+				offset = int(request.headers.get("Upload-Offset", ""))
+			except ValueError:
+				raise uploads.UploadError("Invalid Upload-Offset header.")
+			uploads.writeChunk(uploadId, id, student.id, offset, request.content_length, request.headers.get("Upload-Checksum"), request.stream)
+			return videoUploadResponse(uploads.getUpload(uploadId, id, student.id), 200)
+		elif request.method == "DELETE":
+			uploads.getUpload(uploadId, id, student.id)
+			uploads.deleteUpload(uploadId)
+			return "", 204
+		return videoUploadResponse(uploads.getUpload(uploadId, id, student.id))
+	except uploads.UploadError as e:
+		return videoUploadErrorResponse(e)
+	except Exception as e:
+		app.logger.error('In videoUpload, Error is: {}\n{}'.format(e, traceback.format_exc()))
+		return jsonify({"status": "error", "message": "Could not write the upload."}), 500
+
+
+@app.route('/Media/Jobs/<int:id>', methods=['GET'])
+def getMediaJobStatus(id):
+	# polled by the pages that show the placeholder of an image that is being processed (js/mediaJobs.js)
+	try:
+		status = media.jobStatus(id)
+		if status is None:
+			return jsonify({}), 404
+		return jsonify(status)
+	except Exception as e:
+		app.logger.error('In getMediaJobStatus, Error is: {}\n{}'.format(e, traceback.format_exc()))
 		return jsonify({})
 
 
@@ -0,0 +1,85 @@
+# Full text search (SQLite FTS5) of the admin tables text filters (the students names) and of the showcase.
+# Every searched table has a search table with the same rowids (the ids of its rows) that is kept up to date by triggers.
+# Hebrew final letters are folded to their regular form, in the index (by the triggers) and in the searched words,
+# so a searched word matches the beginning of a word however it ends ("דן" finds "דנה").
+# Latin letters are case and accent folded by the unicode61 tokenizer.
+
+finalLetters = {"ך": "כ", "ם": "מ", "ן": "נ", "ף": "פ", "ץ": "צ"}
+
+# search table -> (table, columns)
+searchTables = {
+	"student_search": ("student", ["firstNameHeb", "lastNameHeb", "firstNameEng", "lastNameEng", "studentId", "email"])
+}
+
+# The showcase search has only the published and approved projects, ranked by bm25.
+# Its rows are built from the project, its supervisors and its students,
+# so it is refreshed by the database module whenever one of them changes (not by triggers).
+showcaseColumns = ["title", "abstract", "supervisors", "students"]
+# bm25 weight of every column, a title match is worth the most
+showcaseWeights = [10.0, 1.0, 3.0, 3.0]
+
+
+def fold(value):
+	for finalLetter, letter in finalLetters.items():
+		value = value.replace(finalLetter, letter)
+	return value
+
+
+def foldSql(expression):
+	for finalLetter, letter in finalLetters.items():
+		expression = f"replace({expression}, '{finalLetter}', '{letter}')"
+	return expression
+
+
+def matchQuery(value, allWords=False):
+	# FTS5 query of any (or all) of the words as a prefix, None if there is nothing to search
+	words = [fold(word) for word in value.split() if any(c.isalnum() for c in word)]
+	if not words:
+		return None
+	return (" AND " if allWords else " OR ").join('"{}"*'.format(word.replace('"', '""')) for word in words)
+
+
+def schema():
+	# the statements that create the search tables and their triggers
+	statements = []
+	for searchTable, (table, columns) in searchTables.items():
+		columnsList = ", ".join(columns)
+		newValues = ", ".join(foldSql(f"new.{column}") for column in columns)
+		statements += [
+			f"CREATE VIRTUAL TABLE {searchTable} USING fts5({columnsList}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+			f"CREATE TRIGGER {searchTable}_insert AFTER INSERT ON {table} BEGIN "
+			f"INSERT INTO {searchTable} (rowid, {columnsList}) VALUES (new.id, {newValues}); END",
+			f"CREATE TRIGGER {searchTable}_update AFTER UPDATE OF id, {columnsList} ON {table} BEGIN "
+			f"DELETE FROM {searchTable} WHERE rowid = old.id; "
+			f"INSERT INTO {searchTable} (rowid, {columnsList}) VALUES (new.id, {newValues}); END",
+			f"CREATE TRIGGER {searchTable}_delete AFTER DELETE ON {table} BEGIN "
+			f"DELETE FROM {searchTable} WHERE rowid = old.id; END"
+		]
+	statements.append(f"CREATE VIRTUAL TABLE showcase_search USING fts5({', '.join(showcaseColumns)}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')")
+	return statements
+
+
+def showcaseRows():
+	# SELECT of the showcase search rows (rowid is the project id), can be narrowed with more "AND" conditions.
+	# The names are coalesced: one NULL name would make the whole concatenation NULL and drop all the people of the project
+	supervisors = ("SELECT group_concat(coalesce(supervisor.firstNameEng, '') || ' ' || coalesce(supervisor.lastNameEng, '') || ' ' || coalesce(supervisor.firstNameHeb, '') || ' ' || coalesce(supervisor.lastNameHeb, ''), ' ') "
+		"FROM supervisor JOIN supervisor_project ON supervisor_project.supervisorId = supervisor.id WHERE supervisor_project.projectId = project.id")
+	students = ("SELECT group_concat(coalesce(student.firstNameEng, '') || ' ' || coalesce(student.lastNameEng, '') || ' ' || coalesce(student.firstNameHeb, '') || ' ' || coalesce(student.lastNameHeb, ''), ' ') "
+		"FROM student JOIN student_project ON student_project.studentId = student.id WHERE student_project.projectId = project.id")
+	return (f"SELECT project.id, {foldSql('project.title')}, {foldSql('project.abstract')}, {foldSql(f'({supervisors})')}, {foldSql(f'({students})')} "
+		"FROM project WHERE project.published = 1 AND project.projectDocApproved = 1")
+
+
+def fillStatements():
+	# the statements that (re)fill the search tables from their tables
+	statements = []
+	for searchTable, (table, columns) in searchTables.items():
+		statements += [
+			f"DELETE FROM {searchTable}",
+			f"INSERT INTO {searchTable} (rowid, {', '.join(columns)}) SELECT id, {', '.join(foldSql(column) for column in columns)} FROM {table}"
+		]
+	statements += [
+		"DELETE FROM showcase_search",
+		f"INSERT INTO showcase_search (rowid, {', '.join(showcaseColumns)}) {showcaseRows()}"
+	]
+	return statements
@@ -0,0 +1,284 @@
+import os
+import json
+import time
+import hashlib
+import traceback
+from threading import Lock, Thread
+from flask import Response, request
+from avr import app, db
+from avr import database
+from avr import images
+from avr import cacheSync
+from avr import locks
+
+# Cache of the showcase JSON: the published projects of every year and the details of every published project.
+# Every entry is built once, on its first request, and served from memory after that.
+# The database module calls invalidate() after committing a change to what the showcase shows of some projects,
+# which rebuilds only the entries of these projects and of the years they are (or were) in.
+# The other processes of the server remove these entries when they apply the invalidation (see cacheSync.py), they are
+# built again on their next request there.
+# The cache is saved to a file, so a restarted server starts with it instead of rebuilding every entry from the database.
+# The web workers only read it: the process that runs the YouTube jobs saves the whole showcase (every published year
+# and project) when its cache changed, at most every SHOWCASE_SAVE_INTERVAL seconds, and so does the rebuild command.
+# The file has the id of the last invalidation its entries saw (its generation), the invalidations after it are applied
+# to them when they are loaded, so a file saved before a change never brings back an old entry.
+# Run "flask rebuild-showcase-cache" after changing the database in any other way (restoring a backup etc.).
+# The GET responses of the entries can be cached by browsers and proxies:
+# their ETag is a hash of the entry, so it changes exactly when an invalidation changes what the entry shows.
+
+maxCharsInAbstract = 250
+
+# project fields that are shown in the showcase or decide if a project is shown
+projectFields = {"title", "year", "abstract", "published", "projectDocApproved", "projectDocImage", "youtubeVideo",
+	"report", "presentation", "code", "githubLink"}
+# student fields that are shown with their projects
+studentFields = {"firstNameEng", "lastNameEng", "profilePic"}
+
+_lock = Lock()
+_years = {}			# year -> json of its published projects
+_projects = {}		# project id -> json of its details
+_projectYear = {}	# project id -> the year whose json it is in
+_generation = 0		# incremented by invalidate(), entries that were built before it are not kept
+_savedGeneration = None	# the generation of the entries this process saved last
+_savingStarted = False
+
+
+def projectSummary(project):
+	abstract = project.abstract[:maxCharsInAbstract]
+	abstract += ("..." if len(project.abstract) > maxCharsInAbstract else "" )
+	imageWebp, image = images.variantUrls("project_doc/image", project.projectDocImage, "card")
+	return {
+		"id": project.id,
+		"title": project.title,
+		"image": image,
+		"imageWebp": imageWebp,
+		"abstract": abstract
+	}
+
+
+def projectDetails(project):
+	# project should be loaded with its people (database.getPublishedProjectDetails)
+	return {
+		"title": project.title,
+		"abstract": project.abstract,
+		"supervisors": project.supervisorsFullNameEng,
+		"students": project.studentsForPublishedProject,
+		"youtubeVideoId": project.youtubeVideo,
+		"image": f"static/project_doc/image/{project.projectDocImage}",
+		"report": f"static/project_doc/report/{project.report}",
+		"presentation": f"static/project_doc/presentation/{project.presentation}",
+		"code": f"static/project_doc/code/{project.code}" if project.code else "",
+		"githubLink": project.githubLink or "",
+	}
+
+
+def _toJson(data):
+	# the same JSON as jsonify (sorted keys, no spaces, a new line at the end)
+	return json.dumps(data, ensure_ascii=app.config['JSON_AS_ASCII'], sort_keys=app.config['JSON_SORT_KEYS'], separators=(",", ":")) + "\n"
+
+
+def _buildYear(year):
+	projects = list(database.getPublishedProjectsByYear(year))
+	return _toJson([projectSummary(project) for project in projects]), [project.id for project in projects]
+
+
+def _buildProject(id):
+	project = database.getPublishedProjectDetails(id)
+	return _toJson(projectDetails(project)) if project else None
+
+
+def etag(entry):
+	return hashlib.sha1(entry.encode("utf8")).hexdigest()
+
+
+def response(entry):
+	# the JSON response of an entry, a GET response is cacheable and answers a matching If-None-Match with 304
+	jsonResponse = Response(entry, mimetype="application/json")
+	if request.method == "GET":
+		jsonResponse.set_etag(etag(entry))
+		jsonResponse.headers["Cache-Control"] = "public, max-age={}, stale-while-revalidate={}".format(
+			app.config['SHOWCASE_MAX_AGE'], app.config['SHOWCASE_STALE_WHILE_REVALIDATE'])
+		jsonResponse.make_conditional(request)
+	return jsonResponse
+
+
+def _warm():
+	# builds the entries that are missing, of every published year and project
+	for year in database.getPublishedProjectsYears():
+		yearJson(year)
+	with _lock:
+		projectsIds = list(_projectYear)
+	for id in projectsIds:
+		projectJson(id)
+
+
+def save():
+	# writes the whole showcase to the file. It is replaced under its lock, so a crash while saving never leaves a broken
+	# cache and two processes never write it at the same time.
+	# the entries saved saw the invalidations up to the last one this process applied (its generation)
+	global _savedGeneration
+	invalidationId = cacheSync.sync(force=True)
+	if invalidationId is None:
+		return
+	_warm()
+	with _lock:
+		generation = _generation
+		data = {"generation": invalidationId, "years": _years.copy(), "projects": _projects.copy(), "projectYear": _projectYear.copy()}
+	cacheFile = app.config['SHOWCASE_CACHE_FILE']
+	try:
+		os.makedirs(os.path.dirname(cacheFile), exist_ok=True)
+		with locks.fileLock(cacheFile):
+			temporaryFile = cacheFile + ".tmp"
+			with open(temporaryFile, "w", encoding="utf8") as f:
+				json.dump(data, f, ensure_ascii=False)
+			os.replace(temporaryFile, cacheFile)
+		_savedGeneration = generation
+	except OSError as e:
+		app.logger.error('Saving the showcase cache failed: {}'.format(e))
+
+
+def _saveWork():
+	while True:
+		with app.app_context():
+			try:
+				# applies the invalidations of the other processes, the cache is saved if they (or this process) changed it
+				cacheSync.sync(force=True)
+				if _generation != _savedGeneration:
+					save()
+			except Exception as e:
+				app.logger.error('Saving the showcase cache failed, Error is: {}\n{}'.format(e, traceback.format_exc()))
+			finally:
+				db.session.remove()
+		time.sleep(app.config['SHOWCASE_SAVE_INTERVAL'])
+
+
+def startSaving():
+	# saves the cache in the background (once per process), by the process that runs the YouTube jobs
+	global _savingStarted
+	with _lock:
+		if _savingStarted:
+			return None
+		_savingStarted = True
+	thread = Thread(target=_saveWork, name="showcase-saver", daemon=True)
+	thread.start()
+	return thread
+
+
+def _load():
+	# warm start from the file of the previous run
+	try:
+		with open(app.config['SHOWCASE_CACHE_FILE'], encoding="utf8") as f:
+			data = json.load(f)
+	except (OSError, ValueError):
+		return
+	# a file from before the generations is as old as the first invalidation
+	cacheSync.since(data.get("generation", 0))
+	with _lock:
+		# json object keys are strings
+		_years.update({int(year): entry for year, entry in data.get("years", {}).items()})
+		_projects.update({int(id): entry for id, entry in data.get("projects", {}).items()})
+		_projectYear.update({int(id): year for id, year in data.get("projectYear", {}).items()})
+
+
+def yearJson(year):
+	with _lock:
+		if year in _years:
+			return _years[year]
+		generation = _generation
+	entry, projectsIds = _buildYear(year)
+	with _lock:
+		# don't keep an entry that was invalidated while it was built
+		if _generation != generation:
+			return entry
+		_years[year] = entry
+		for id in projectsIds:
+			_projectYear[id] = year
+	return entry
+
+
+def projectJson(id):
+	# None if the project isn't published
+	with _lock:
+		if id in _projects:
+			return _projects[id]
+		generation = _generation
+	entry = _buildProject(id)
+	if entry is None:
+		return None
+	with _lock:
+		if _generation != generation:
+			return entry
+		_projects[id] = entry
+	return entry
+
+
+def invalidate(projectsIds):
+	# rebuild the entries of these projects and the years they are in, after their change was committed
+	global _generation
+	projectsIds = set(projectsIds)
+	if not projectsIds:
+		return
+	with _lock:
+		_generation += 1
+		generation = _generation
+		oldYears = {_projectYear.pop(id) for id in projectsIds if id in _projectYear}
+		cachedProjects = projectsIds & _projects.keys()
+		for id in cachedProjects:
+			del _projects[id]
+	newYears = set(database.getPublishedProjectsYearsOf(projectsIds))
+	cacheSync.publish("showcase", {"projects": sorted(projectsIds), "years": sorted(newYears)})
+	with _lock:
+		cachedYears = (oldYears | newYears) & _years.keys()
+		for year in cachedYears:
+			del _years[year]
+	years = {year: _buildYear(year) for year in cachedYears}
+	projects = {id: _buildProject(id) for id in cachedProjects}
+	with _lock:
+		# a later invalidation removed these entries again, they are built on their next request
+		if _generation != generation:
+			return
+		for year, (entry, yearProjectsIds) in years.items():
+			_years[year] = entry
+			for id in yearProjectsIds:
+				_projectYear[id] = year
+		for id, entry in projects.items():
+			if entry is not None:
+				_projects[id] = entry
+
+
+def _remove(keys):
+	# an invalidation of another process: removes the entries of its projects and of the years they are (or were) in,
+	# they are built again on their next request. keys is None to remove all of them
+	global _generation
+	with _lock:
+		_generation += 1
+		if keys is None:
+			_years.clear()
+			_projects.clear()
+			_projectYear.clear()
+			return
+		years = set(keys["years"])
+		for id in keys["projects"]:
+			_projects.pop(id, None)
+			if id in _projectYear:
+				years.add(_projectYear.pop(id))
+		for year in years:
+			_years.pop(year, None)
+
+
+def rebuild():
+	# empty the cache (of every process, their entries are built again on their next request) and save it built again
+	_remove(None)
+	cacheSync.publish("showcase")
+	save()
+
+
+@app.before_first_request
+def startSavingOnFirstRequest():
+	# a server that runs the YouTube jobs in its own process saves the cache, the web workers of gunicorn don't (see gunicorn.conf.py)
+	if app.config['YOUTUBE_WORKERS'] > 0:
+		startSaving()
+
+
+cacheSync.register("showcase", _remove)
+_load()
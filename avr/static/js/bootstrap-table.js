@@ -1870,6 +1870,11 @@ var studentsBootstrapTable;
             params['filter'] = JSON.stringify(this.filterColumnsPartial, null);
         }
 
+        /* my addition - the server sends the filter options only when they are newer than this version */
+        if (this.filterOptionsVersion) {
+            params['filterOptionsVersion'] = this.filterOptionsVersion;
+        }
+
         data = calculateObjectValue(this.options, this.options.queryParams, [params], data);
         $.extend(data, query || {});
 
@@ -1894,6 +1899,9 @@ var studentsBootstrapTable;
                 if (res.filterOptions) {
                     that.filterOptions = res.filterOptions;
                 }
+                if (res.filterOptionsVersion) {
+                    that.filterOptionsVersion = res.filterOptionsVersion;
+                }
                 res = calculateObjectValue(that.options, that.options.responseHandler, [res], res);
 
                 that.load(res);
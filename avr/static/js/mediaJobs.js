@@ -0,0 +1,27 @@
+// images that are still being processed are shown as a placeholder with the id of their media job (data-media-job),
+// they are replaced with their image when the job is done
+let mediaJobsTimer = setInterval(function() {
+	let placeholders = $("img[data-media-job]");
+	if (placeholders.length == 0) {
+		return;
+	}
+	let jobsIds = new Set(placeholders.map(function() { return $(this).attr("data-media-job"); }).get());
+	jobsIds.forEach(function(jobId) {
+		$.get(`/Media/Jobs/${jobId}`, function(job) {
+			if (job.status == "pending") {
+				return;
+			}
+			$(`img[data-media-job='${jobId}']`).each(function() {
+				let variant = job.variants && job.variants[$(this).attr("data-media-variant")];
+				$(this).removeAttr("data-media-job");
+				if (variant) {
+					$(this).siblings("source").remove();
+					$(this).before($("<source type='image/webp'>").attr("srcset", variant.webp));
+					$(this).attr("src", variant.image);
+				}
+			});
+		}).fail(function() {
+			$(`img[data-media-job='${jobId}']`).removeAttr("data-media-job");
+		});
+	});
+}, 2000);
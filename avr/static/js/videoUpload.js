@@ -0,0 +1,155 @@
+// chunked, resumable upload of the project doc video (see uploads.py):
+// the video is sent in chunks with their offset and checksum, a chunk that failed is sent again from the offset the server has.
+// the upload id is kept in the local storage, so sending the same video again (after a reload) resumes its upload.
+// uploadVideo(uploadsUrl, file, onProgress) returns a promise of the upload id, the form is sent with it instead of the video
+
+const videoUploadRetries = 8;
+
+let crc32Table = null;
+
+function crc32(bytes) {
+	if (crc32Table == null) {
+		crc32Table = new Uint32Array(256);
+		for (let i = 0; i < 256; i++) {
+			let c = i;
+			for (let k = 0; k < 8; k++) {
+				c = (c & 1) ? (0xEDB88320 ^ (c >>> 1)) : (c >>> 1);
+			}
+			crc32Table[i] = c >>> 0;
+		}
+	}
+	let crc = 0xFFFFFFFF;
+	for (let i = 0; i < bytes.length; i++) {
+		crc = crc32Table[(crc ^ bytes[i]) & 0xFF] ^ (crc >>> 8);
+	}
+	crc = (crc ^ 0xFFFFFFFF) >>> 0;
+	return new Uint8Array([crc >>> 24, (crc >>> 16) & 0xFF, (crc >>> 8) & 0xFF, crc & 0xFF]);
+}
+
+function base64(bytes) {
+	let binary = "";
+	for (let i = 0; i < bytes.length; i++) {
+		binary += String.fromCharCode(bytes[i]);
+	}
+	return btoa(binary);
+}
+
+// the Upload-Checksum header of a chunk, sha256 where the browser has crypto.subtle (https pages) and crc32 elsewhere
+async function chunkChecksum(buffer) {
+	if (window.crypto && window.crypto.subtle) {
+		let digest = await window.crypto.subtle.digest("SHA-256", buffer);
+		return "sha256 " + base64(new Uint8Array(digest));
+	}
+	return "crc32 " + base64(crc32(new Uint8Array(buffer)));
+}
+
+function videoUploadError(message, status) {
+	let error = new Error(message);
+	error.status = status;
+	return error;
+}
+
+// sends a request, resolves with {status, body} (body is the json response when there is one)
+function videoUploadRequest(method, url, headers, body) {
+	return new Promise(function(resolve, reject) {
+		let request = new XMLHttpRequest();
+		request.open(method, url);
+		for (let name in headers) {
+			request.setRequestHeader(name, headers[name]);
+		}
+		request.addEventListener("load", function() {
+			let responseBody = {};
+			try {
+				responseBody = JSON.parse(request.responseText);
+			}
+			catch (e) {}
+			resolve({status: request.status, body: responseBody});
+		});
+		request.addEventListener("error", function() { reject(videoUploadError("Network error", 0)); });
+		request.addEventListener("timeout", function() { reject(videoUploadError("Network error", 0)); });
+		request.send(body);
+	});
+}
+
+function videoUploadKey(uploadsUrl, file) {
+	return `videoUpload ${uploadsUrl} ${file.name} ${file.size} ${file.lastModified}`;
+}
+
+function sleep(milliseconds) {
+	return new Promise(function(resolve) { setTimeout(resolve, milliseconds); });
+}
+
+// the upload of this file that was started before, or a new one: {uploadId, offset, chunkSize}
+async function startVideoUpload(uploadsUrl, file) {
+	let uploadId = localStorage.getItem(videoUploadKey(uploadsUrl, file));
+	if (uploadId) {
+		let response = await videoUploadRequest("GET", `${uploadsUrl}/${uploadId}`, {}, null);
+		if (response.status == 200) {
+			return response.body;
+		}
+		localStorage.removeItem(videoUploadKey(uploadsUrl, file));
+	}
+	let response = await videoUploadRequest("POST", uploadsUrl, {"Content-Type": "application/json"}, JSON.stringify({name: file.name, size: file.size}));
+	if (response.status != 201) {
+		throw videoUploadError(response.body.message || "Could not upload the video.", response.status);
+	}
+	localStorage.setItem(videoUploadKey(uploadsUrl, file), response.body.uploadId);
+	return response.body;
+}
+
+async function uploadVideo(uploadsUrl, file, onProgress) {
+	let upload = await startVideoUpload(uploadsUrl, file);
+	let uploadUrl = `${uploadsUrl}/${upload.uploadId}`;
+	let offset = upload.offset;
+	let failures = 0;
+	onProgress(offset, file.size);
+	while (offset < file.size) {
+		let buffer = await file.slice(offset, offset + upload.chunkSize).arrayBuffer();
+		let response = null;
+		try {
+			response = await videoUploadRequest("PATCH", uploadUrl, {
+				"Content-Type": "application/offset+octet-stream",
+				"Upload-Offset": offset,
+				"Upload-Checksum": await chunkChecksum(buffer)
+			}, buffer);
+		}
+		catch (e) {
+			response = {status: 0, body: {}};
+		}
+		if (response.status == 200) {
+			offset = response.body.offset;
+			failures = 0;
+			onProgress(offset, file.size);
+			continue;
+		}
+		// not found, not allowed or too large: the upload can't go on
+		if ([401, 403, 404, 411, 413].includes(response.status)) {
+			localStorage.removeItem(videoUploadKey(uploadsUrl, file));
+			throw videoUploadError(response.body.message || "Could not upload the video.", response.status);
+		}
+		// a dropped connection, a wrong checksum or another offset: wait and send again from the offset the server has
+		failures += 1;
+		if (failures > videoUploadRetries) {
+			throw videoUploadError("The connection was lost while sending the video, please send it again.", response.status);
+		}
+		await sleep(Math.min(1000 * 2 ** failures, 30000));
+		if (response.body.offset != null) {
+			offset = response.body.offset;
+		}
+		else {
+			try {
+				let current = await videoUploadRequest("GET", uploadUrl, {}, null);
+				if (current.status == 200) {
+					offset = current.body.offset;
+				}
+			}
+			catch (e) {}
+		}
+	}
+	return upload.uploadId;
+}
+
+// the upload id is not needed after the form was sent with it
+function forgetVideoUpload(uploadsUrl, file) {
+	localStorage.removeItem(videoUploadKey(uploadsUrl, file));
+}
@@ -0,0 +1,137 @@
+import json
+import time
+import queue
+import traceback
+from threading import Thread, Lock
+from avr import app, db
+from avr import database
+
+# Status hub: pushes the YouTube status of a project (the upload and processing of its video) to the project status pages
+# that show it, as server sent events.
+# The YouTube jobs publish the status of a project when they change it and every open stream of the project gets it,
+# so an open page doesn't read the database and a stream writes only when the status changes.
+# A stream sends a heartbeat comment every STATUS_STREAM_HEARTBEAT seconds (a closed page is noticed when it's written),
+# ends when the processing is over, and ends after STATUS_STREAM_MAX_IDLE seconds without a new status (the browser
+# connects again by itself).
+# When the YouTube jobs run in another process (YOUTUBE_WORKERS is 0) their statuses are not published in this one,
+# then one watcher thread reads the statuses of all the projects that have streams (in one query every
+# STATUS_STREAM_POLL_INTERVAL seconds) and publishes the ones that changed.
+
+# project field -> status field the page reads
+statusFields = {
+	"youtubeUploadStatus": "uploadStatus",
+	"youtubeProcessingStatus": "processingStatus",
+	"youtubeProcessingFailureReason": "processingFailureReason",
+	"youtubeProcessingEstimatedTimeLeft": "processingEstimatedTimeLeft"
+}
+
+# project id -> queues of its streams, project id -> the last status they got
+_subscribers = {}
+_lastStatus = {}
+_lock = Lock()
+_watcher = None
+
+
+def projectStatus(project):
+	return {statusField: getattr(project, field) for field, statusField in statusFields.items()}
+
+
+def isFinal(status):
+	# the processing is over (the page stops listening)
+	return (status["uploadStatus"] == "failed" or status["processingStatus"] in ("terminated", "failed")
+		or (status["uploadStatus"] == "completed" and status["processingStatus"] == "processed"))
+
+
+def hasSubscribers(projectId):
+	return projectId in _subscribers
+
+
+def publish(projectId, status):
+	# sends a status of a project to its streams (if it changed)
+	with _lock:
+		if projectId not in _subscribers or _lastStatus.get(projectId) == status:
+			return
+		_lastStatus[projectId] = status
+		for subscriber in _subscribers[projectId]:
+			subscriber.put(status)
+
+
+def publishProject(projectId):
+	# publishes the current status of a project, it's read only when the project has streams
+	if not hasSubscribers(projectId):
+		return
+	project = database.getProjectById(projectId)
+	if project is not None:
+		publish(projectId, projectStatus(project))
+
+
+def subscribe(projectId, status, subscriber=None):
+	# a queue that gets the statuses of a project published from now on (by its put method), status is its current status
+	global _watcher
+	subscriber = subscriber or queue.Queue()
+	with _lock:
+		if projectId not in _subscribers:
+			_subscribers[projectId] = set()
+			_lastStatus[projectId] = status
+		_subscribers[projectId].add(subscriber)
+		if _watcher is None and app.config['YOUTUBE_WORKERS'] == 0:
+			_watcher = Thread(target=_watch, name="status-hub-watcher", daemon=True)
+			_watcher.start()
+	return subscriber
+
+
+def unsubscribe(projectId, subscriber):
+	with _lock:
+		subscribers = _subscribers.get(projectId, set())
+		subscribers.discard(subscriber)
+		if not subscribers:
+			_subscribers.pop(projectId, None)
+			_lastStatus.pop(projectId, None)
+
+
+def formatEvent(status):
+	return "data: {}\n\n".format(json.dumps(status))
+
+
+def stream(projectId, status):
+	# the server sent events of a project status page: its current status, then every new status until the processing
+	# is over (or the stream was idle for STATUS_STREAM_MAX_IDLE seconds), with heartbeats in between.
+	# the stream subscribes right away, so a status published before the server sends the first event is not missed
+	heartbeat = app.config['STATUS_STREAM_HEARTBEAT']
+	maxIdle = app.config['STATUS_STREAM_MAX_IDLE']
+	subscriber = subscribe(projectId, status)
+
+	def events(status):
+		try:
+			yield formatEvent(status)
+			idle = 0
+			while not isFinal(status) and idle < maxIdle:
+				try:
+					status = subscriber.get(timeout=heartbeat)
+				except queue.Empty:
+					idle += heartbeat
+					yield ": heartbeat\n\n"
+					continue
+				idle = 0
+				yield formatEvent(status)
+		finally:
+			unsubscribe(projectId, subscriber)
+
+	return events(status)
+
+
+def _watch():
+	while True:
+		time.sleep(app.config['STATUS_STREAM_POLL_INTERVAL'])
+		with _lock:
+			projectsIds = list(_subscribers)
+		if not projectsIds:
+			continue
+		with app.app_context():
+			try:
+				for project in database.getProjectsByIds(projectsIds):
+					publish(project.id, projectStatus(project))
+			except Exception as e:
+				app.logger.error('status hub watcher error, Error is: {}\n{}'.format(e, traceback.format_exc()))
+			finally:
+				db.session.remove()
@@ -0,0 +1,259 @@
+import json
+from threading import Lock
+from cachetools import TTLCache, LRUCache
+from sqlalchemy import select, func, and_, or_, false, bindparam, literal_column, table as sqlTable
+from avr import db, facets
+from avr import pagination
+from avr import search
+
+# Query engine of the admin tables.
+# Every table declares once which columns it can be sorted and filtered by. A request is turned into a "shape"
+# (the filters used and their variants, the sort, the pagination mode) plus bound parameter values.
+# The SQLAlchemy Core statement of every shape is built once and reused, together with its compiled SQL,
+# so the SQL text is the same for every value and SQLite can reuse its prepared statement.
+# The rows of a page and the total number of rows matching the filters are read in one statement (COUNT(*) OVER ()).
+# The total is cached per filters, so the next pages of the same list cost only the page query.
+# A cached total is used until its table is invalidated (see facets.invalidate).
+
+_totals = TTLCache(maxsize=256, ttl=600)
+_totalsLock = Lock()
+
+
+class _LockedLRUCache:
+	# compiled_cache of the table statements, it is shared by all request threads
+	def __init__(self, maxsize):
+		self._cache = LRUCache(maxsize=maxsize)
+		self._lock = Lock()
+
+	def get(self, key, default=None):
+		with self._lock:
+			return self._cache.get(key, default)
+
+	def __setitem__(self, key, value):
+		with self._lock:
+			self._cache[key] = value
+
+	def __len__(self):
+		with self._lock:
+			return len(self._cache)
+
+
+compiledCache = _LockedLRUCache(maxsize=512)
+
+
+############################ Filters ############################
+# a filter turns the value sent by the browser into (variant, params),
+# the variant is part of the statement shape and decides the clause, params are bound to it
+
+
+class Equals:
+	def __init__(self, column, nullValue=None):
+		self.column = column
+		self.nullValue = nullValue
+
+	def bind(self, name, value):
+		if self.nullValue is not None and value == self.nullValue:
+			return "null", {}
+		return "value", {name: value}
+
+	def clause(self, table, name, variant):
+		if variant == "null":
+			return table.c[self.column].is_(None)
+		return table.c[self.column] == bindparam(name)
+
+
+class Contains:
+	def __init__(self, column):
+		self.column = column
+
+	def bind(self, name, value):
+		return "value", {name: value}
+
+	def clause(self, table, name, variant):
+		return table.c[self.column].contains(bindparam(name))
+
+
+class Search:
+	# any (or all) of the words as the beginning of a word in the full text search table of the table (see the search module)
+	def __init__(self, searchTable, allWords=False):
+		self.searchTable = searchTable
+		self.allWords = allWords
+
+	def bind(self, name, value):
+		query = search.matchQuery(value, self.allWords)
+		if query is None:
+			return "none", {}
+		return "match", {name: query}
+
+	def clause(self, table, name, variant):
+		if variant == "none":
+			return None
+		matches = select([literal_column("rowid")]).select_from(sqlTable(self.searchTable)).where(literal_column(self.searchTable).match(bindparam(name)))
+		return table.c.id.in_(matches)
+
+
+class Status:
+	# project status, "ongoing" is every status before the project was completed
+	completedStatuses = ("הושלם", "פוסטר")
+
+	def __init__(self, column, nullValue=None):
+		self.column = column
+		self.nullValue = nullValue
+
+	def bind(self, name, value):
+		if self.nullValue is not None and value == self.nullValue:
+			return "null", {}
+		if value == "ongoing":
+			return "ongoing", {}
+		if value == "הושלם":
+			return "completed", {}
+		return "value", {name: value}
+
+	def clause(self, table, name, variant):
+		column = table.c[self.column]
+		if variant == "null":
+			return column.is_(None)
+		if variant == "ongoing":
+			return and_(*[column != status for status in self.completedStatuses])
+		if variant == "completed":
+			return or_(*[column == status for status in self.completedStatuses])
+		return column == bindparam(name)
+
+
+############################ Tables ############################
+
+
+class Table:
+	def __init__(self, table, sortKeys, filters):
+		self.table = table
+		# sort name -> [(columnName, descending)], descending None means "in the requested order"
+		self.sortKeys = sortKeys
+		# filter name (as sent by the browser) -> filter
+		self.filters = filters
+		self._statements = LRUCache(maxsize=128)
+		self._statementsLock = Lock()
+
+	def _bindFilters(self, filters):
+		filtersShape = []
+		params = {}
+		for name in sorted(filters or {}):
+			if name in self.filters:
+				variant, filterParams = self.filters[name].bind(f"filter_{name}", filters[name])
+				filtersShape.append((name, variant))
+				params.update(filterParams)
+		return tuple(filtersShape), params
+
+	def _where(self, statement, filtersShape):
+		for name, variant in filtersShape:
+			clause = self.filters[name].clause(self.table, f"filter_{name}", variant)
+			if clause is not None:
+				statement = statement.where(clause)
+		return statement
+
+	def _seekClause(self, keys, nullKeys):
+		# the rows after the bound seek values, NULL is the smallest value (as SQLite sorts).
+		# built from the last key to the first: k1 > v1 OR (k1 = v1 AND (k2 > v2 OR (...)))
+		condition = None
+		for i in reversed(range(len(keys))):
+			column = self.table.c[keys[i][0]]
+			descending = keys[i][1]
+			value = bindparam(f"seek{i}")
+			if nullKeys[i]:
+				after = false() if descending else column.isnot(None)
+				equal = column.is_(None)
+			else:
+				after = or_(column < value, column.is_(None)) if descending else column > value
+				equal = column == value
+			condition = after if condition is None else or_(after, and_(equal, condition))
+		return condition
+
+	def _build(self, shape):
+		filtersShape, keys, mode, nullKeys = shape
+		if mode == "count":
+			return self._where(select([func.count()]).select_from(self.table), filtersShape)
+		columns = [self.table]
+		if mode == "pageWithTotal":
+			columns.append(func.count().over().label("totalResults"))
+		statement = self._where(select(columns), filtersShape)
+		if mode == "seek" and nullKeys is not None:
+			statement = statement.where(self._seekClause(keys, nullKeys))
+		statement = statement.order_by(*[self.table.c[name].desc() if descending else self.table.c[name].asc() for name, descending in keys])
+		statement = statement.limit(bindparam("pageLimit"))
+		if mode != "seek":
+			statement = statement.offset(bindparam("pageOffset"))
+		return statement
+
+	def statement(self, shape):
+		with self._statementsLock:
+			statement = self._statements.get(shape)
+		if statement is None:
+			statement = self._build(shape)
+			with self._statementsLock:
+				self._statements[shape] = statement
+		return statement
+
+	def _execute(self, shape, params):
+		connection = db.session.connection().execution_options(compiled_cache=compiledCache)
+		return connection.execute(self.statement(shape), params)
+
+	def _totalKey(self, filtersShape, params):
+		# the version is taken before reading, so a total read during a write is never used after it
+		return (self.table.name, filtersShape, tuple(sorted(params.items())), facets.tablesVersion([self.table.name]))
+
+	def _cachedTotal(self, key):
+		with _totalsLock:
+			return _totals.get(key)
+
+	def _cacheTotal(self, key, total):
+		with _totalsLock:
+			_totals[key] = total
+
+	def _count(self, filtersShape, params):
+		key = self._totalKey(filtersShape, params)
+		total = self._cachedTotal(key)
+		if total is None:
+			total = self._execute((filtersShape, (), "count", None), params).scalar()
+			self._cacheTotal(key, total)
+		return total
+
+	def getPage(self, sort, order, limit, offset, filters, cursor=None):
+		# returns (total, rows, pageCursors), filters is the json filter object sent by bootstrap-table
+		filtersShape, params = self._bindFilters(json.loads(filters) if filters else {})
+		keys = tuple(pagination.tableKeys(self.sortKeys, sort, order))
+		limit = int(limit)
+
+		# cursor based (keyset) pagination
+		if cursor is not None:
+			values, direction = pagination.decodeCursor(cursor, sort, order)
+			if values is not None and len(values) != len(keys):
+				values, direction = None, "next"
+			seekKeys = keys
+			if direction == "prev":
+				seekKeys = tuple((name, not descending) for name, descending in keys)
+			nullKeys = None
+			seekParams = dict(params, pageLimit=limit+1)
+			if values is not None:
+				nullKeys = tuple(value is None for value in values)
+				seekParams.update({f"seek{i}": value for i, value in enumerate(values) if value is not None})
+			rows = self._execute((filtersShape, seekKeys, "seek", nullKeys), seekParams).fetchall()
+			rows, pageCursors = pagination.keysetPage(rows, keys, limit, sort, order, values, direction)
+			return self._count(filtersShape, params), rows, pageCursors
+
+		offset = int(offset)
+		pageParams = dict(params, pageLimit=limit, pageOffset=offset)
+		totalKey = self._totalKey(filtersShape, params)
+		total = self._cachedTotal(totalKey)
+		if total is not None:
+			rows = self._execute((filtersShape, keys, "page", None), pageParams).fetchall()
+			return total, rows, pagination.noPageCursors()
+		# the page and the total in one query
+		rows = self._execute((filtersShape, keys, "pageWithTotal", None), pageParams).fetchall()
+		if rows:
+			total = rows[0].totalResults
+		elif offset == 0:
+			total = 0
+		else:
+			# the page is after the last row, count separately
+			total = self._execute((filtersShape, (), "count", None), params).scalar()
+		self._cacheTotal(totalKey, total)
+		return total, rows, pagination.noPageCursors()
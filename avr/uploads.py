@@ -0,0 +1,248 @@
+import os
+import json
+import time
+import zlib
+import base64
+import hashlib
+import secrets
+import traceback
+from avr import app
+from avr import locks
+from avr import filestore
+
+# Chunked, resumable uploads of the project doc videos (like the tus protocol, https://tus.io).
+# The page creates an upload with the name and size of the video, then sends it in chunks (PATCH requests) with the
+# offset of every chunk and its checksum. Every chunk is written straight into the video folder, in <video name>.part,
+# and the upload info (project, user, size and the offset written so far) is kept next to it in <video name>.upload.
+# When a chunk fails (a dropped connection, a wrong checksum) the page asks for the offset and sends from it again.
+# The project doc form is sent with the upload id instead of the video, then the upload is finished:
+# the .part file is moved into the file store (filestore.py, no copy) as the video and the YouTube upload starts.
+# Uploads that were not written for VIDEO_UPLOAD_EXPIRATION seconds are deleted.
+# An upload is written by one request at a time, of any process of the server (a lock of <video name>.upload.lock).
+
+videoFolder = os.path.join("static", "project_doc", "video")
+videoExtensions = {".mp4"}
+
+class UploadError(Exception):
+	# an upload request that can't be done, status is the http status of its response
+	def __init__(self, message, status=400, offset=None):
+		super().__init__(message)
+		self.status = status
+		self.offset = offset
+
+
+class _Crc32:
+	# crc32 with the interface of the hashlib objects (browsers without crypto.subtle send crc32 checksums)
+	def __init__(self):
+		self.value = 0
+
+	def update(self, data):
+		self.value = zlib.crc32(data, self.value)
+
+	def digest(self):
+		return self.value.to_bytes(4, "big")
+
+
+# algorithm name in the Upload-Checksum header -> new checksum of a chunk
+checksumAlgorithms = {
+	"sha256": hashlib.sha256,
+	"sha1": hashlib.sha1,
+	"md5": hashlib.md5,
+	"crc32": _Crc32
+}
+
+
+def _folder():
+	return os.path.join(app.root_path, videoFolder)
+
+
+def _paths(uploadId):
+	# (.part path, .upload path) of an upload, the upload id is the video name without its extension
+	if not uploadId or not all(c in "0123456789abcdef" for c in uploadId):
+		raise UploadError("Upload not found.", 404)
+	return os.path.join(_folder(), uploadId + ".mp4.part"), os.path.join(_folder(), uploadId + ".mp4.upload")
+
+
+def _lock(uploadId):
+	_, infoPath = _paths(uploadId)
+	return locks.fileLock(infoPath)
+
+
+def _readInfo(uploadId):
+	_, infoPath = _paths(uploadId)
+	try:
+		with open(infoPath) as f:
+			return json.load(f)
+	except (OSError, ValueError):
+		raise UploadError("Upload not found.", 404)
+
+
+def _writeInfo(uploadId, info):
+	# the info is written to another file and replaces the old one, so it's never half written
+	_, infoPath = _paths(uploadId)
+	with open(infoPath + ".tmp", "w") as f:
+		json.dump(info, f)
+	os.replace(infoPath + ".tmp", infoPath)
+
+
+def getUpload(uploadId, projectId, userId):
+	# the info of an upload of this project and user
+	info = _readInfo(uploadId)
+	if info["projectId"] != projectId or info["userId"] != userId:
+		raise UploadError("Upload not found.", 404)
+	return info
+
+
+def createUpload(projectId, userId, fileName, size):
+	# creates an empty upload of a video, returns its info
+	deleteExpiredUploads()
+	_, extension = os.path.splitext(fileName or "")
+	if extension.lower() not in videoExtensions:
+		raise UploadError("File does not have an approved extension: mp4")
+	if not isinstance(size, int) or size <= 0:
+		raise UploadError("Invalid video file. video can't be empty.")
+	if size > app.config['VIDEO_UPLOAD_MAX_SIZE']:
+		raise UploadError("The file you are trying to send is too large.", 413)
+	os.makedirs(_folder(), exist_ok=True)
+	# the video name is random, try maximum 20 names like utils.save_form_file
+	for i in range(20):
+		uploadId = secrets.token_hex(8)
+		partPath, infoPath = _paths(uploadId)
+		if os.path.exists(infoPath):
+			continue
+		try:
+			# fails when another request created an upload with this name in between
+			with open(partPath, "xb"):
+				pass
+			break
+		except FileExistsError:
+			continue
+	else:
+		raise UploadError("The upload could not be created, please try again.", 500)
+	now = time.time()
+	info = {
+		"id": uploadId,
+		"projectId": projectId,
+		"userId": userId,
+		"size": size,
+		"offset": 0,
+		"createdAt": now,
+		"updatedAt": now
+	}
+	_writeInfo(uploadId, info)
+	return info
+
+
+def parseChecksum(header):
+	# (algorithm, checksum bytes) of an Upload-Checksum header: "<algorithm> <base64 checksum>"
+	try:
+		algorithm, value = (header or "").split(" ", 1)
+		checksum = base64.b64decode(value.strip(), validate=True)
+	except ValueError:
+		raise UploadError("Invalid Upload-Checksum header.")
+	if algorithm not in checksumAlgorithms:
+		raise UploadError("Unsupported checksum algorithm: {}".format(algorithm))
+	return algorithm, checksum
+
+
+def writeChunk(uploadId, projectId, userId, offset, length, checksumHeader, stream):
+	# writes a chunk of an upload at its offset, returns the offset after it.
+	# a chunk that is not at the upload offset, or whose checksum is wrong, is not written (the upload stays at its offset)
+	algorithm, checksum = parseChecksum(checksumHeader)
+	if length is None:
+		raise UploadError("Content-Length is required.", 411)
+	if length > app.config['VIDEO_UPLOAD_CHUNK_SIZE']:
+		raise UploadError("Chunk is too large.", 413)
+	with _lock(uploadId):
+		info = getUpload(uploadId, projectId, userId)
+		if offset != info["offset"]:
+			raise UploadError("Upload-Offset does not match the upload offset.", 409, info["offset"])
+		if offset + length > info["size"]:
+			raise UploadError("Chunk is past the end of the upload.", 413, info["offset"])
+		partPath, _ = _paths(uploadId)
+		digest = checksumAlgorithms[algorithm]()
+		written = 0
+		with open(partPath, "r+b") as f:
+			# a chunk that was cut in the middle (a dropped connection or a stopped server) is written over
+			f.seek(offset)
+			f.truncate()
+			while written < length:
+				data = stream.read(min(64 * 1024, length - written))
+				if not data:
+					break
+				digest.update(data)
+				f.write(data)
+				written += len(data)
+			if written != length or digest.digest() != checksum:
+				f.truncate(offset)
+				if written != length:
+					raise UploadError("The chunk was not received completely.", 400, offset)
+				raise UploadError("Checksum mismatch.", 460, offset)
+			f.flush()
+			os.fsync(f.fileno())
+		info["offset"] = offset + length
+		info["updatedAt"] = time.time()
+		_writeInfo(uploadId, info)
+		return info["offset"]
+
+
+def finishUpload(uploadId, projectId, userId):
+	# stores a complete upload in the file store (named by its content, a video that is already there is kept once),
+	# returns the video name
+	with _lock(uploadId):
+		info = getUpload(uploadId, projectId, userId)
+		if info["offset"] != info["size"]:
+			raise UploadError("The video was not uploaded completely, please send it again.", 409, info["offset"])
+		partPath, infoPath = _paths(uploadId)
+		videoName, _ = filestore.storeLocalFile(partPath, videoFolder, ".mp4")
+		os.remove(infoPath)
+		_removeLock(uploadId)
+	return videoName
+
+
+def _removeLock(uploadId):
+	# a request that waits for the lock finds the upload deleted
+	_, infoPath = _paths(uploadId)
+	try:
+		os.remove(infoPath + ".lock")
+	except FileNotFoundError:
+		pass
+
+
+def deleteUpload(uploadId):
+	for path in _paths(uploadId):
+		try:
+			os.remove(path)
+		except FileNotFoundError:
+			pass
+		except OSError as e:
+			app.logger.error('could not delete upload file {}, Error is: {}\n{}'.format(path, e, traceback.format_exc()))
+	_removeLock(uploadId)
+
+
+def _expired(info):
+	# the upload was not written for VIDEO_UPLOAD_EXPIRATION seconds
+	return time.time() - info.get("updatedAt", info["createdAt"]) > app.config['VIDEO_UPLOAD_EXPIRATION']
+
+
+def deleteExpiredUploads():
+	# deletes the uploads whose last chunk was written more than VIDEO_UPLOAD_EXPIRATION seconds ago, returns their number
+	if not os.path.isdir(_folder()):
+		return 0
+	expiredUploads = 0
+	for name in os.listdir(_folder()):
+		if not name.endswith(".mp4.upload"):
+			continue
+		uploadId = name[:-len(".mp4.upload")]
+		try:
+			if not _expired(_readInfo(uploadId)):
+				continue
+			# a chunk that is written now waits for the lock, the upload is checked again after it
+			with _lock(uploadId):
+				if not _expired(_readInfo(uploadId)):
+					continue
+				deleteUpload(uploadId)
+		except UploadError:
+			continue
+		expiredUploads += 1
+	return expiredUploads
@@ -1,15 +1,13 @@
 import os
-import secrets
-from shutil import copyfile
 import datetime
 from avr import app
 import traceback
-from PIL import Image
-from avr.youtubeUpload import youtubeUpload
 from avr import database
+from avr import images
+from avr import media
+from avr import filestore
 from avr import db
 from avr.models import Project
-import time
 
 
 def deleteLocalFile(filePath):
@@ -20,177 +18,11 @@ def deleteLocalFile(filePath):
 		app.logger.error('Could not delete file: {}, {}\n{}'.format(filePath, e, traceback.format_exc()))
 
 
-def set_youtube_video_public(appArg, projectId):
-	with appArg.app_context():
-		try:
-			project = database.getProjectById(projectId)
-			success = youtubeUpload.setVideoToPublic(project.youtubeVideo)
-			if success:
-				database.updateProject(project.id, {
-					"youtubeVideoPublicStatus": "success",
-					"projectDocApproved": True,
-					"projectDocEditableByStudents": False
-				})
-				database.updateProjectStatus(project.id, {
-					"projectDoc": True
-				})
-			else:
-				database.updateProject(project.id, {
-					"youtubeVideoPublicStatus": "failed"
-				})
-		except Exception as e:
-			app.logger.error('Error is: {}\n{}'.format(e, traceback.format_exc()))
-			database.updateProject(project.id, {
-				"youtubeVideoPublicStatus": "failed"
-			})
-
-
-def update_youtube_video_processing_details(projectId):
-	while True:
-		try:
-			project = database.getProjectById(projectId)
-			database.updateProject(project.id, {
-				"youtubeProcessingStatus": "checking"
-			})
-			result = youtubeUpload.getProcessingDetails(videoId=project.youtubeVideo)
-			if result:
-				if result["pageInfo"]["totalResults"] != 0:				
-					failedStatus = {"deleted", "failed", "rejected"}
-					if result["items"][0]["status"]["uploadStatus"] in failedStatus:
-						database.updateProject(project.id, {
-							"youtubeVideo": "",		# to avoid trying to delete this video next time bacause it won't succeed
-							"youtubeProcessingFailureReason": "",
-							"youtubeProcessingStatus": "terminated",
-							"youtubeProcessingEstimatedTimeLeft": ""
-						})
-						break
-
-					elif result["items"][0]["status"]["uploadStatus"] == "uploaded":
-						youtubeVideo = project.youtubeVideo
-						youtubeProcessingStatus = ""
-						processingFailureReason = ""
-						youtubeProcessingEstimatedTimeLeft = project.youtubeProcessingEstimatedTimeLeft
-						if not "processingDetails" in result["items"][0]:	# processing failed for some reason, no info given
-							youtubeVideo = ""
-							youtubeProcessingStatus = "terminated"
-						else:
-							if result["items"][0]["processingDetails"]["processingStatus"] == "failed":
-								youtubeProcessingStatus = "failed"
-								processingFailureReason = result["items"][0]["processingDetails"]["processingFailureReason"]
-							elif result["items"][0]["processingDetails"]["processingStatus"] == "terminated":
-								youtubeProcessingStatus = "terminated"
-								youtubeVideo = ""
-							elif result["items"][0]["processingDetails"]["processingStatus"] == "processing":
-								youtubeProcessingStatus = "processing"
-								if "processingProgress" in result["items"][0]["processingDetails"]:
-									youtubeProcessingEstimatedTimeLeft = result["items"][0]["processingDetails"]["processingProgress"]["timeLeftMs"]
-	
-						database.updateProject(project.id, {
-							"youtubeVideo": youtubeVideo,
-							"youtubeProcessingStatus": youtubeProcessingStatus,
-							"youtubeProcessingFailureReason": processingFailureReason,
-							"youtubeProcessingEstimatedTimeLeft": youtubeProcessingEstimatedTimeLeft
-						})
-						if youtubeProcessingStatus != "processing":
-							break
-
-					elif result["items"][0]["status"]["uploadStatus"] == "processed":
-						database.updateProject(project.id, {
-							"youtubeProcessingStatus": "processed",
-							"youtubeProcessingEstimatedTimeLeft": "",
-							"youtubeProcessingFailureReason": "",
-							"status": "דף פרויקט - טיוטה"
-						})
-						break
-		
-
-				else:	# video processing failed because something was wrong with the video file or it was a duplicate of a video already uploaded
-					database.updateProject(project.id, {
-						"youtubeVideo": "",		# to avoid trying to delete this video next time bacause it won't succeed
-						"youtubeProcessingFailureReason": "",
-						"youtubeProcessingStatus": "terminated",
-						"youtubeProcessingEstimatedTimeLeft": ""
-					})
-					break
-
-			else:
-				database.updateProject(project.id, {
-					"youtubeProcessingStatus": ""
-				})
-		except Exception as e:
-			app.logger.error('Error is: {}\n{}'.format(e, traceback.format_exc()))
-		
-		time.sleep(3.0)
-
-
-def upload_video_to_youtube(appArg, projectId):
-	with appArg.app_context():
-		try:
-			project = database.getProjectById(projectId)
-			database.updateProject(project.id, {
-				"youtubeUploadStatus": "uploading"
-			})
-			videoPath = os.path.join(appArg.root_path, "static", "project_doc", "video", project.localVideo)
-			success = youtubeUpload.uploadVideo(
-				videoPath=videoPath, 
-				title=project.title, 
-				description=project.abstract, 
-				keywords="technion, technion avr, technion project, virtual reality lab, augmented reality lab"
-			)
-			if success:
-				deleteLocalFile(videoPath)
-				app.logger.info(f"Local video: {videoPath} was deleted")
-				database.updateProject(project.id, {
-					"localVideo": "",
-					"youtubeVideo": success,
-					"youtubeUploadStatus": "completed"
-				})
-				update_youtube_video_processing_details(projectId)
-			else:
-				database.updateProject(project.id, {
-					"youtubeUploadStatus": "failed"
-				})
-		except Exception as e:
-			app.logger.error('Error is: {}\n{}'.format(e, traceback.format_exc()))
-			database.updateProject(project.id, {
-				"youtubeUploadStatus": "failed"
-			})
-
-
-def overwrite_youtube_video(appArg, projectId):
-	with appArg.app_context():
-		try:
-			project = database.getProjectById(projectId)
-			database.updateProject(project.id, {
-				"youtubeUploadStatus": "deleting current"
-			})
-			deleteVideoResult, deleteVideoInfo = youtubeUpload.deleteVideo(project.youtubeVideo)
-			if (deleteVideoResult == "success") or (deleteVideoResult == "failure" and deleteVideoInfo == "videoNotFound"):
-				database.updateProject(project.id, {
-					"youtubeVideo": "",
-				})
-				database.updateProjectStatus(project.id, {
-					"projectDoc": False
-				})
-				upload_video_to_youtube(appArg, projectId)
-			else:
-				database.updateProject(project.id, {
-					"youtubeUploadStatus": "failed"
-				})
-		except Exception as e:
-			app.logger.error('Error is: {}\n{}'.format(e, traceback.format_exc()))
-			database.updateProject(project.id, {
-				"youtubeUploadStatus": "failed"
-			})
-
-
 def delete_image(imageName, folder):
+	# the image (and its variants) is deleted when no other row refers to it (see filestore.py)
 	if imageName is not None:
-		imageFolder = os.path.join(app.root_path, 'static', 'images', folder)
-		try:
-			os.remove(os.path.join(imageFolder, imageName))
-		except OSError as e:
-			app.logger.error('could not delete image {}, Error is: {}\n{}'.format(os.path.join(imageFolder, imageName), e, traceback.format_exc()))
+		if filestore.release(os.path.join('static', 'images', folder), imageName) and f"images/{folder}" in images.imageFolders:
+			images.deleteVariants(f"images/{folder}", imageName)
 
 
 def delete_proposed_project_image(imageName):
@@ -202,82 +34,47 @@ def delete_project_image(imageName):
 def delete_profile_image(imageName):
 	delete_image(imageName, "profile")
 
+def delete_project_doc_image(imageName):
+	if filestore.release(os.path.join("static", "project_doc", "image"), imageName):
+		images.deleteVariants("project_doc/image", imageName)
+
+def delete_project_doc_file(fileName, folder):
+	# folder is the project doc folder: report, presentation, code, poster or video
+	filestore.release(os.path.join("static", "project_doc", folder), fileName)
+
 
 def copy_project_image_from_proposed_project(matchingImageName):
-	random_hex = secrets.token_hex(8)
-	_, matchingExt = os.path.splitext(matchingImageName)
-	newImageName = random_hex + matchingExt
-	sourcePath = os.path.join(app.root_path, 'static', 'images', 'proposed_projects', matchingImageName)
-	destinationFolder = os.path.join(app.root_path, 'static', 'images', 'projects')
-	if not os.path.exists(destinationFolder):
-		try:
-			os.makedirs(destinationFolder)
-		except Exception as e:
-			app.logger.error('could not make dir {}, Error is: {}\n{}'.format(destinationFolder, e, traceback.format_exc()))
+	# the projects of a proposed project refer to its image, a hard link in the projects folder (see filestore.py)
+	sourceFolder = os.path.join('static', 'images', 'proposed_projects')
 	try:
-		copyfile(sourcePath, os.path.join(destinationFolder, newImageName))
+		newImageName, created = filestore.copyFile(sourceFolder, matchingImageName, os.path.join('static', 'images', 'projects'))
+		if created:
+			media.processImage("images/projects", newImageName)
 		return newImageName
 	except Exception as e:
-		app.logger.error('could not copyfile {}, Error is: {}\n{}'.format(sourcePath, e, traceback.format_exc()))
+		app.logger.error('could not copyfile {}, Error is: {}\n{}'.format(os.path.join(sourceFolder, matchingImageName), e, traceback.format_exc()))
 
 
 def save_form_file(file, folder):
-	random_hex = secrets.token_hex(8)
-	_, fileExt = os.path.splitext(file.filename)
-	fileExt = fileExt.lower()
-	fileName = random_hex + fileExt
-	fileFolder = os.path.join(app.root_path, folder)
-	
-	if not os.path.exists(fileFolder):
-		try:
-			os.makedirs(fileFolder)
-		except Exception as e:
-			app.logger.error('could not make dir {}, Error is: {}\n{}'.format(fileFolder, e, traceback.format_exc()))
+	# the file is named by its content, a file that is already in the folder is not saved again (see filestore.py)
+	return filestore.saveFile(file, folder)
 
-	filePath = os.path.join(fileFolder, fileName)
-	# if this file name is already taken, try maximum 20 other random file names
-	for i in range(20):
-		if not os.path.isfile(filePath):
-			break
-		fileName = secrets.token_hex(8) + fileExt
-		filePath = os.path.join(fileFolder, fileName)
-	file.save(filePath)
 
-	return fileName
+def save_project_doc_image(file):
+	imageName, _, created = filestore.storeFile(file, os.path.join("static", "project_doc", "image"))
+	if created:
+		media.processImage("project_doc/image", imageName)
+	return imageName
 
 	
 
 def save_form_image(form_image, folder):
-	random_hex = secrets.token_hex(8)
 	_, imageExt = os.path.splitext(form_image.filename)
-	imageExt = imageExt.lower()
-	imageName = random_hex + imageExt
-	imageFolder = os.path.join(app.root_path, 'static', 'images', folder)
-	
-	if not os.path.exists(imageFolder):
-		try:
-			os.makedirs(imageFolder)
-		except Exception as e:
-			app.logger.error('could not make dir {}, Error is: {}\n{}'.format(imageFolder, e, traceback.format_exc()))
-
-	imagePath = os.path.join(imageFolder, imageName)
-	# if this file name is already taken, try maximum 20 other random file names
-	for i in range(20):
-		if not os.path.isfile(imagePath):
-			break
-		imageName = secrets.token_hex(8) + imageExt
-		imagePath = os.path.join(imageFolder, imageName)
-	form_image.save(imagePath)
-	if imageExt == ".tga":
-		# convert tga image to png
-		im = Image.open(imagePath)
-		rgb_im = im.convert('RGB')
-		oldImageName = imageName
-		imageName = imageName.replace("tga", "png")
-		newImgPath = os.path.join(imageFolder, imageName)
-		rgb_im.save(newImgPath)
-		# delete old tga image
-		delete_image(oldImageName, imageFolder)
+	# the media workers convert tga images to png (and delete the tga image)
+	imageName, sourceName, created = filestore.storeFile(form_image, os.path.join('static', 'images', folder), ".png" if imageExt.lower() == ".tga" else None)
+	# an image that was already in the folder has its variants
+	if created:
+		media.processImage(f"images/{folder}", sourceName, imageName)
 
 	return imageName
 
@@ -0,0 +1,415 @@
+import os
+import time
+import random
+import socket
+import secrets
+import traceback
+from datetime import datetime, timedelta
+from threading import Thread, Event, Lock
+from avr import app, db
+from avr import database
+from avr import utils
+from avr import statusHub
+from avr.youtubeUpload import youtubeUpload
+
+# YouTube jobs: the uploads, overwrites, set public calls and processing checks of the projects videos.
+# The jobs are rows of the youtube_job table (YoutubeJob), so they are not lost when the server stops,
+# and they are run by YOUTUBE_WORKERS worker threads, so no more than this number of videos are uploaded at the same time.
+# A job that fails is queued again with a growing delay until it failed the maxAttempts of its kind, then it's failed
+# (the admins see the jobs in the lab overview and can retry the failed ones).
+# The youtube*Status columns of the project follow its jobs: they are set when a job is queued, starts and fails.
+# The processing checks of the uploaded videos are not run by the workers: their queued jobs are the videos one poller thread
+# watches, it checks them (50 videos in every API call) until their processing is over, or fails them after
+# YOUTUBE_PROCESSING_TIMEOUT seconds. Every video is checked again after a delay that follows the time YouTube reports
+# its processing has left, between YOUTUBE_PROCESSING_POLL_INTERVAL and YOUTUBE_PROCESSING_MAX_POLL_INTERVAL seconds.
+# A running job is leased by the process that claimed it: a heartbeat thread renews the leases of the jobs the process runs
+# every YOUTUBE_JOB_HEARTBEAT_INTERVAL seconds and queues again the running jobs whose lease was not renewed for
+# YOUTUBE_JOB_LEASE seconds (their process stopped), so a job that still runs in another process (a redeploy starts the new
+# workers while the old ones finish their uploads) is not run twice.
+# The workers start on the first request of the server, or by "flask run-youtube-jobs" in its own process when YOUTUBE_WORKERS is 0.
+
+_wakeUp = Event()
+_processingWakeUp = Event()
+# video id -> the schedule of its processing checks (see _scheduleCheck), kept by the poller thread
+_processingChecks = {}
+_startLock = Lock()
+_started = False
+# this process in the leases of the jobs it runs (set when the workers start, after gunicorn forked the process)
+_owner = None
+# ids of the jobs the workers of this process run
+_runningJobs = set()
+_runningJobsLock = Lock()
+
+
+class RetryJob(Exception):
+	# raised by a job that should run again later, it counts as a failed attempt unless countAttempt is False
+	def __init__(self, message, delay=None, countAttempt=True):
+		super().__init__(message)
+		self.delay = delay
+		self.countAttempt = countAttempt
+
+
+def _updateProject(projectId, data):
+	if database.getProjectById(projectId) is not None:
+		database.updateProject(projectId, data)
+		if statusHub.statusFields.keys() & data.keys():
+			statusHub.publishProject(projectId)
+
+
+############################ jobs ############################
+
+def upload(projectId):
+	project = database.getProjectById(projectId)
+	if project is None or not project.localVideo:
+		return
+	_updateProject(project.id, {"youtubeUploadStatus": "uploading"})
+	videoPath = os.path.join(app.root_path, "static", "project_doc", "video", project.localVideo)
+	videoId = youtubeUpload.uploadVideo(
+		videoPath=videoPath,
+		title=project.title,
+		description=project.abstract,
+		keywords="technion, technion avr, technion project, virtual reality lab, augmented reality lab"
+	)
+	if not videoId:
+		raise RetryJob("the video could not be uploaded")
+	utils.delete_project_doc_file(project.localVideo, "video")
+	app.logger.info(f"Local video: {videoPath} was deleted")
+	_updateProject(project.id, {
+		"localVideo": "",
+		"youtubeVideo": videoId,
+		"youtubeUploadStatus": "completed",
+		"youtubeProcessingStatus": ""
+	})
+	enqueue("processing", project.id)
+
+
+def overwrite(projectId):
+	# deletes the current video of the project, then its new video is uploaded by an upload job
+	project = database.getProjectById(projectId)
+	if project is None:
+		return
+	_updateProject(project.id, {"youtubeUploadStatus": "deleting current"})
+	if project.youtubeVideo:
+		deleteVideoResult, deleteVideoInfo = youtubeUpload.deleteVideo(project.youtubeVideo)
+		if not ((deleteVideoResult == "success") or (deleteVideoResult == "failure" and deleteVideoInfo == "videoNotFound")):
+			raise RetryJob("the current video could not be deleted ({})".format(deleteVideoInfo or deleteVideoResult))
+	_updateProject(project.id, {"youtubeVideo": ""})
+	database.updateProjectStatus(project.id, {"projectDoc": False})
+	enqueue("upload", project.id)
+
+
+def setPublic(projectId):
+	project = database.getProjectById(projectId)
+	if project is None:
+		return
+	if not youtubeUpload.setVideoToPublic(project.youtubeVideo):
+		raise RetryJob("the video could not be set to public")
+	database.updateProject(project.id, {
+		"youtubeVideoPublicStatus": "success",
+		"projectDocApproved": True,
+		"projectDocEditableByStudents": False
+	})
+	database.updateProjectStatus(project.id, {
+		"projectDoc": True
+	})
+
+
+def _processingFields(project, item):
+	# (the project fields after a processing check of its video, whether its processing is over),
+	# item is the video in the videos.list response (None when YouTube doesn't have it)
+	terminated = {
+		"youtubeVideo": "",		# to avoid trying to delete this video next time bacause it won't succeed
+		"youtubeProcessingFailureReason": "",
+		"youtubeProcessingStatus": "terminated",
+		"youtubeProcessingEstimatedTimeLeft": ""
+	}
+	if item is None:	# video processing failed because something was wrong with the video file or it was a duplicate of a video already uploaded
+		return terminated, True
+	uploadStatus = item["status"]["uploadStatus"]
+	if uploadStatus in {"deleted", "failed", "rejected"}:
+		return terminated, True
+
+	# a state this doesn't know (or no processing details yet) is checked again, until the processing job times out
+	checking = {
+		"youtubeProcessingStatus": "checking"
+	}
+	if uploadStatus == "uploaded":
+		if not "processingDetails" in item:
+			return checking, False
+		processingStatus = item["processingDetails"]["processingStatus"]
+		if processingStatus == "failed":
+			return {
+				"youtubeProcessingStatus": "failed",
+				"youtubeProcessingFailureReason": item["processingDetails"]["processingFailureReason"]
+			}, True
+		if processingStatus == "terminated":
+			return terminated, True
+		if processingStatus == "processing":
+			fields = {
+				"youtubeProcessingStatus": "processing",
+				"youtubeProcessingFailureReason": ""
+			}
+			if "processingProgress" in item["processingDetails"]:
+				fields["youtubeProcessingEstimatedTimeLeft"] = str(item["processingDetails"]["processingProgress"]["timeLeftMs"])
+			return fields, False
+		return checking, False
+
+	if uploadStatus == "processed":
+		return {
+			"youtubeProcessingStatus": "processed",
+			"youtubeProcessingEstimatedTimeLeft": "",
+			"youtubeProcessingFailureReason": "",
+			"status": "דף פרויקט - טיוטה"
+		}, True
+	return checking, False
+
+
+def _scheduleCheck(videoId, timeLeftMs, now):
+	# schedules the next processing check of a video: after half the time YouTube reports left (corrected by how fast
+	# this estimate went down since the last check), or after twice the last delay when there is no estimate,
+	# between YOUTUBE_PROCESSING_POLL_INTERVAL and YOUTUBE_PROCESSING_MAX_POLL_INTERVAL seconds
+	minimum = app.config['YOUTUBE_PROCESSING_POLL_INTERVAL']
+	maximum = app.config['YOUTUBE_PROCESSING_MAX_POLL_INTERVAL']
+	check = _processingChecks.get(videoId, {})
+	if timeLeftMs is None:
+		delay = check["delay"] * 2 if "delay" in check else minimum
+		secondsLeft = check.get("secondsLeft")
+	else:
+		secondsLeft = int(timeLeftMs) / 1000
+		rate = 1
+		if check.get("secondsLeft") is not None and now > check["checkedAt"]:
+			estimateRate = (check["secondsLeft"] - secondsLeft) / (now - check["checkedAt"])
+			if estimateRate > 0:
+				rate = estimateRate
+		delay = secondsLeft / rate / 2
+	delay = min(max(delay, minimum), maximum)
+	_processingChecks[videoId] = {"delay": delay, "secondsLeft": secondsLeft, "checkedAt": now, "nextCheckAt": now + delay}
+
+
+def pollProcessing():
+	# checks the processing of the watched videos (the queued processing jobs) whose check is due, processingBatchSize
+	# videos in every videos.list call, and updates only the projects whose fields changed.
+	# returns the seconds until the next check is due
+	timeout = timedelta(seconds=app.config['YOUTUBE_PROCESSING_TIMEOUT'])
+	now = datetime.utcnow()
+	checkTime = time.monotonic()
+	# the rows are read before anything is written (a commit expires them)
+	videos = {}
+	watchedVideos = set()
+	finishedJobs = []
+	timedOutJobs = []
+	for job, project in database.getWatchedYoutubeJobs():
+		if project is None or not project.youtubeVideo:
+			finishedJobs.append(job.id)
+		elif now - job.runAt > timeout:
+			timedOutJobs.append((job.id, job.projectId))
+		else:
+			watchedVideos.add(project.youtubeVideo)
+			if _processingChecks.get(project.youtubeVideo, {}).get("nextCheckAt", 0) <= checkTime:
+				videos[project.youtubeVideo] = (job.id, project)
+	for videoId in set(_processingChecks) - watchedVideos:
+		del _processingChecks[videoId]
+
+	changes = []
+	videosIds = list(videos)
+	for i in range(0, len(videosIds), processingBatchSize):
+		batch = videosIds[i:i + processingBatchSize]
+		result = youtubeUpload.getProcessingDetails(batch)
+		if not result:
+			# the videos are checked again later
+			app.logger.error('could not get the processing details of {} videos'.format(len(batch)))
+			for videoId in batch:
+				_scheduleCheck(videoId, None, checkTime)
+			continue
+		items = {item["id"]: item for item in result.get("items", [])}
+		for videoId in batch:
+			jobId, project = videos[videoId]
+			item = items.get(videoId)
+			fields, done = _processingFields(project, item)
+			changedFields = {field: value for field, value in fields.items() if getattr(project, field) != value}
+			changes.append((jobId, project.id, changedFields, done))
+			if done:
+				_processingChecks.pop(videoId, None)
+			else:
+				_scheduleCheck(videoId, item.get("processingDetails", {}).get("processingProgress", {}).get("timeLeftMs"), checkTime)
+
+	for jobId, projectId, changedFields, done in changes:
+		if changedFields:
+			_updateProject(projectId, changedFields)
+		if done:
+			finishedJobs.append(jobId)
+	for jobId in finishedJobs:
+		database.finishYoutubeJob(jobId)
+	for jobId, projectId in timedOutJobs:
+		app.logger.error('YouTube job {} failed: the video was still processed after {}'.format(jobId, timeout))
+		database.failYoutubeJob(jobId, "the video was still processed after {}".format(timeout))
+		_updateProject(projectId, jobKinds["processing"][4])
+
+	# no video is watched: the poller waits for a processing job to be queued (or the longest delay)
+	if not _processingChecks:
+		return app.config['YOUTUBE_PROCESSING_MAX_POLL_INTERVAL']
+	return max(min(check["nextCheckAt"] for check in _processingChecks.values()) - time.monotonic(), 0)
+
+
+# kind -> (function of the project id (None for the processing jobs, they are run by the processing poller), attempts, seconds before the first retry (doubled on every retry),
+# project fields when it's queued, project fields when it failed its last attempt)
+jobKinds = {
+	"upload": (upload, 6, 60, {"youtubeUploadStatus": "uploading"}, {"youtubeUploadStatus": "failed"}),
+	"overwrite": (overwrite, 6, 60, {"youtubeUploadStatus": "uploading"}, {"youtubeUploadStatus": "failed"}),
+	"setPublic": (setPublic, 3, 5, {"youtubeVideoPublicStatus": "changing"}, {"youtubeVideoPublicStatus": "failed"}),
+	"processing": (None, 1, 0, {}, {"youtubeProcessingStatus": ""})
+}
+maxRetryDelay = 60 * 60
+# the most ids a videos.list call takes
+processingBatchSize = 50
+
+
+############################ queue ############################
+
+def enqueue(kind, projectId):
+	# queues a job of a project (the job of this kind the project already has, if it's queued or running), returns its id
+	_, maxAttempts, _, queuedFields, _ = jobKinds[kind]
+	job = database.getActiveYoutubeJob(projectId, kind)
+	if job is not None:
+		return job.id
+	if queuedFields:
+		_updateProject(projectId, queuedFields)
+	jobId = database.addYoutubeJob(projectId, kind, maxAttempts)
+	(_processingWakeUp if kind == "processing" else _wakeUp).set()
+	return jobId
+
+
+def retry(jobId):
+	# queues a failed job again (from its first attempt), returns False when it's not failed
+	job = database.getYoutubeJobById(jobId)
+	if job is None or job.status != "failed":
+		return False
+	# the fields are set before the job can run
+	_, _, _, queuedFields, _ = jobKinds[job.kind]
+	if queuedFields:
+		_updateProject(job.projectId, queuedFields)
+	if not database.requeueYoutubeJob(jobId):
+		return False
+	(_processingWakeUp if job.kind == "processing" else _wakeUp).set()
+	return True
+
+
+def _retryDelay(kind, attempts):
+	_, _, firstDelay, _, _ = jobKinds[kind]
+	delay = min(firstDelay * 2 ** max(attempts - 1, 0), maxRetryDelay)
+	# the retries of jobs that failed together are spread
+	return delay * random.uniform(0.8, 1.2)
+
+
+def runJob(job):
+	# runs a claimed job, then marks it done, queues it again or marks it failed (unless its lease expired and it was queued again)
+	function, _, _, _, failedFields = jobKinds[job.kind]
+	try:
+		function(job.projectId)
+		database.finishYoutubeJob(job.id, job.claimedBy)
+		return
+	except RetryJob as e:
+		error, delay, countAttempt = str(e), e.delay, e.countAttempt
+	except Exception as e:
+		app.logger.error('YouTube job {} failed, Error is: {}\n{}'.format(job, e, traceback.format_exc()))
+		db.session.rollback()
+		error, delay, countAttempt = "{}: {}".format(type(e).__name__, e), None, True
+	if delay is None:
+		delay = _retryDelay(job.kind, job.attempts + 1)
+	status = database.retryYoutubeJob(job.id, datetime.utcnow() + timedelta(seconds=delay), error, countAttempt, job.claimedBy)
+	if status is None:
+		app.logger.error('YouTube job {} lost its lease, it was queued again'.format(job))
+	elif status == "failed":
+		app.logger.error('YouTube job {} failed its last attempt: {}'.format(job, error))
+		_updateProject(job.projectId, failedFields)
+
+
+def runDueJobs():
+	# runs the jobs that are due one after the other, returns their number
+	jobs = 0
+	while True:
+		job = database.claimYoutubeJob(_owner)
+		if job is None:
+			return jobs
+		with _runningJobsLock:
+			_runningJobs.add(job.id)
+		try:
+			runJob(job)
+		finally:
+			with _runningJobsLock:
+				_runningJobs.discard(job.id)
+		jobs += 1
+
+
+def renewLeases():
+	# renews the leases of the jobs this process runs and queues again the jobs whose lease expired, returns their number
+	with _runningJobsLock:
+		runningJobs = list(_runningJobs)
+	database.heartbeatYoutubeJobs(runningJobs, _owner)
+	requeuedJobs = database.requeueExpiredYoutubeJobs(datetime.utcnow() - timedelta(seconds=app.config['YOUTUBE_JOB_LEASE']))
+	if requeuedJobs:
+		app.logger.info(f'{requeuedJobs} YouTube jobs whose lease expired were queued again')
+		_wakeUp.set()
+	return requeuedJobs
+
+
+def _heartbeatWork():
+	while True:
+		with app.app_context():
+			try:
+				renewLeases()
+			except Exception as e:
+				app.logger.error('YouTube jobs heartbeat error, Error is: {}\n{}'.format(e, traceback.format_exc()))
+			finally:
+				db.session.remove()
+		time.sleep(app.config['YOUTUBE_JOB_HEARTBEAT_INTERVAL'])
+
+
+def _work():
+	while True:
+		# a job queued while the due jobs run wakes the worker up right after them
+		_wakeUp.clear()
+		with app.app_context():
+			try:
+				runDueJobs()
+			except Exception as e:
+				app.logger.error('YouTube worker error, Error is: {}\n{}'.format(e, traceback.format_exc()))
+			finally:
+				db.session.remove()
+		_wakeUp.wait(app.config['YOUTUBE_JOBS_POLL_INTERVAL'])
+
+
+def _pollProcessingWork():
+	while True:
+		_processingWakeUp.clear()
+		with app.app_context():
+			try:
+				delay = pollProcessing()
+			except Exception as e:
+				app.logger.error('YouTube processing poller error, Error is: {}\n{}'.format(e, traceback.format_exc()))
+				delay = app.config['YOUTUBE_PROCESSING_POLL_INTERVAL']
+			finally:
+				db.session.remove()
+		_processingWakeUp.wait(delay)
+
+
+def startWorkers(workers=None):
+	# starts the workers, the heartbeat of their leases and the processing poller (once per process)
+	global _started, _owner
+	workers = app.config['YOUTUBE_WORKERS'] if workers is None else workers
+	with _startLock:
+		if _started or workers <= 0:
+			return []
+		_started = True
+		_owner = "{}:{}:{}".format(socket.gethostname(), os.getpid(), secrets.token_hex(4))
+	threads = [Thread(target=_work, name=f"youtube-worker-{i}", daemon=True) for i in range(workers)]
+	threads.append(Thread(target=_heartbeatWork, name="youtube-heartbeat", daemon=True))
+	threads.append(Thread(target=_pollProcessingWork, name="youtube-processing-poller", daemon=True))
+	for thread in threads:
+		thread.start()
+	return threads
+
+
+@app.before_first_request
+def startWorkersOnFirstRequest():
+	startWorkers()
@@ -9,14 +9,19 @@ import traceback
 import logging
 from logging.handlers import RotatingFileHandler
 import secrets
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from dateutil import tz
 
-from apiclient.discovery import build
+from apiclient.discovery import build_from_document, DISCOVERY_URI
 from apiclient.errors import HttpError
 from apiclient.http import MediaFileUpload
 from oauth2client.client import flow_from_clientsecrets
 from oauth2client.file import Storage
 from oauth2client.tools import argparser, run_flow
 from argparse import Namespace
+from avr import locks
 
 
 ytlogger = logging.getLogger('youtubeUpload')
@@ -46,40 +51,178 @@ RETRIABLE_STATUS_CODES = [500, 502, 503, 504]
 
 VALID_PRIVACY_STATUSES = ("public", "private", "unlisted")
 
+YOUTUBE_API_SERVICE_NAME = "youtube"
+YOUTUBE_API_VERSION = "v3"
+YOUTUBE_UPLOAD_SCOPE = ["https://www.googleapis.com/auth/youtube", "https://www.googleapis.com/auth/youtube.upload", "https://www.googleapis.com/auth/youtube.force-ssl"]
+MISSING_CLIENT_SECRETS_MESSAGE = "Missing client_secrets.json file"
+
+# Clients registry: the discovery document of the API is downloaded once, the credentials of every client are read once
+# from its oauth2.json (their tokens are refreshed in memory and saved back to the file by their storage),
+# and every thread builds the service of a client once and keeps it, with its http connection.
+# (a service and its httplib2.Http can't be shared by threads)
+_discovery_document = None
+_discovery_lock = threading.Lock()
+_credentials_folder = os.path.join(os.path.dirname(__file__), "credentials")
+_credentials = {}
+_credentials_lock = threading.Lock()
+_thread_clients = threading.local()
+
+
+def get_discovery_document():
+	global _discovery_document
+	with _discovery_lock:
+		if _discovery_document is None:
+			response, content = httplib2.Http().request(DISCOVERY_URI.format(api=YOUTUBE_API_SERVICE_NAME, apiVersion=YOUTUBE_API_VERSION))
+			if response.status != 200:
+				raise HttpError(response, content, uri=DISCOVERY_URI)
+			_discovery_document = content.decode("utf-8") if isinstance(content, bytes) else content
+		return _discovery_document
+
+
+def get_credentials(args, clientNum):
+	# the credentials of a client, read from its oauth2.json the first time (or when they are not valid anymore)
+	with _credentials_lock:
+		credentials = _credentials.get(clientNum)
+		if credentials is None or credentials.invalid:
+			credentials_path = os.path.join(_credentials_folder, str(clientNum))
+			storage = Storage( os.path.join(credentials_path, "oauth2.json") )
+			credentials = storage.get()
+			if credentials is None or credentials.invalid:
+				CLIENT_SECRETS_FILE = os.path.join(credentials_path, "client_secrets.json")
+				flow = flow_from_clientsecrets(CLIENT_SECRETS_FILE, scope=YOUTUBE_UPLOAD_SCOPE, message=MISSING_CLIENT_SECRETS_MESSAGE)
+				credentials = run_flow(flow, storage, args)
+			_credentials[clientNum] = credentials
+		# refreshed once for all the threads (instead of a 401 response to each of them)
+		if credentials.access_token_expired:
+			credentials.refresh(httplib2.Http())
+		return credentials
+
 
 def get_authenticated_service(args, clientNum):
-	credentials_path = os.path.join(os.path.dirname(__file__), "credentials", str(clientNum))
-	CLIENT_SECRETS_FILE = os.path.join(credentials_path, "client_secrets.json")
-	YOUTUBE_API_SERVICE_NAME = "youtube"
-	YOUTUBE_API_VERSION = "v3"
-	YOUTUBE_UPLOAD_SCOPE = ["https://www.googleapis.com/auth/youtube", "https://www.googleapis.com/auth/youtube.upload", "https://www.googleapis.com/auth/youtube.force-ssl"]
-	MISSING_CLIENT_SECRETS_MESSAGE = "Missing client_secrets.json file"
+	# the service of a client for this thread
+	services = getattr(_thread_clients, "services", None)
+	if services is None:
+		services = _thread_clients.services = {}
+	credentials = get_credentials(args, clientNum)
+	service, service_credentials = services.get(clientNum, (None, None))
+	if service is None or service_credentials is not credentials:
+		http = credentials.authorize(httplib2.Http())
+		service = build_from_document(get_discovery_document(), http=http)
+		services[clientNum] = (service, credentials)
+	return service
+
+
+def reset_clients():
+	# forgets the services and credentials of all the clients (they are built and read again)
+	with _credentials_lock:
+		_credentials.clear()
+	_thread_clients.services = {}
+
+
+# Quota of the clients: every client (a Google Cloud project) has QUOTA_PER_DAY units a day, and every call costs
+# QUOTA_COSTS units of its method. The units every client used today (estimated, they are counted before every call)
+# and the clients that got a quotaExceeded error are kept in quota.json until the quota is reset at midnight Pacific time.
+# Every process of the server (the gunicorn workers and the YouTube jobs process) changes it under a lock of
+# quota.json.lock (locks.fileLock), and writes it to another file that replaces it, so no count is lost and it's never half written.
+# The calls try the least used clients first (so the calls are spread over the clients) and skip the exhausted ones,
+# a client whose credentials could not be loaded is skipped for CLIENT_FAILURE_DELAY seconds.
+QUOTA_PER_DAY = 10000
+QUOTA_COSTS = {"insert": 1600, "list": 1, "update": 50, "delete": 50, "search": 100}
+QUOTA_TIMEZONE = tz.gettz("America/Los_Angeles")
+QUOTA_EXCEEDED_REASONS = ("quotaExceeded", "dailyLimitExceeded")
+CLIENT_FAILURE_DELAY = 10 * 60
+_quota_path = os.path.join(os.path.dirname(__file__), "quota.json")
+_client_failures = {}
+
+
+def get_quota_day():
+	return datetime.now(QUOTA_TIMEZONE).date().isoformat()
+
+
+def _read_quota():
+	# the quota of today, a new day starts with no used units and no exhausted clients
+	try:
+		with open(_quota_path) as f:
+			quota = json.load(f)
+	except (OSError, ValueError):
+		quota = {}
+	if quota.get("day") != get_quota_day():
+		quota = {"day": get_quota_day(), "used": {}, "exhausted": []}
+	return quota
+
+
+@contextmanager
+def _locked_quota():
+	# the quota of today, it's written when the block ends (no other thread or process changes it in between)
+	with locks.fileLock(_quota_path):
+		quota = _read_quota()
+		yield quota
+		_write_quota(quota)
+
+
+def _write_quota(quota):
+	try:
+		with open(_quota_path + ".{}.tmp".format(os.getpid()), "w") as f:
+			json.dump(quota, f)
+		os.replace(_quota_path + ".{}.tmp".format(os.getpid()), _quota_path)
+	except OSError as e:
+		ytlogger.error("Could not save the quota: {}\n{}".format(e, traceback.format_exc()))
+
+
+def get_quota():
+	# {"day": the Pacific day, "used": {client: estimated units}, "exhausted": [clients]}
+	# (quota.json is replaced as a whole, it's read without the lock)
+	return _read_quota()
+
 
-	flow = flow_from_clientsecrets(CLIENT_SECRETS_FILE, scope=YOUTUBE_UPLOAD_SCOPE, message=MISSING_CLIENT_SECRETS_MESSAGE)	
-	storage = Storage( os.path.join(credentials_path, "oauth2.json") )
-	credentials = storage.get()
+def record_quota_usage(clientNum, method):
+	with _locked_quota() as quota:
+		quota["used"][str(clientNum)] = quota["used"].get(str(clientNum), 0) + QUOTA_COSTS[method]
 
-	if credentials is None or credentials.invalid:
-		credentials = run_flow(flow, storage, args)
 
-	return build(YOUTUBE_API_SERVICE_NAME, YOUTUBE_API_VERSION,	http=credentials.authorize(httplib2.Http()))
+def record_quota_exceeded(clientNum):
+	ytlogger.info(f"Client {clientNum} exceeded its quota, it won't be used until midnight Pacific time")
+	with _locked_quota() as quota:
+		if clientNum not in quota["exhausted"]:
+			quota["exhausted"].append(clientNum)
+
+
+def get_clients(method):
+	# the clients to try for a call, the least used first. the clients that exceeded their quota today and the clients
+	# that failed recently are skipped, the clients that would exceed their estimated quota are tried last
+	quota = get_quota()
+	clients = []
+	for clientNum in range(1, num_of_clients+1):
+		if clientNum in quota["exhausted"] or time.time() - _client_failures.get(clientNum, 0) < CLIENT_FAILURE_DELAY:
+			continue
+		used = quota["used"].get(str(clientNum), 0)
+		clients.append((used + QUOTA_COSTS[method] > QUOTA_PER_DAY, used, clientNum))
+	return [clientNum for _, _, clientNum in sorted(clients)]
+
+
+def get_error_reason(e):
+	# the reason of an HttpError ("quotaExceeded", "videoNotFound"...)
+	try:
+		return json.loads(e.content)["error"]["errors"][0]["reason"]
+	except (ValueError, KeyError, IndexError, TypeError):
+		return ""
+
 
 def start_delete_process(clientNum, videoId):
 	youtube = start_auth_process(clientNum)
 	if not youtube:
 		return False
 	try: 
+		record_quota_usage(clientNum, "delete")
 		delete_request = youtube.videos().delete(id=videoId).execute()
 		ytlogger.info(f"Successfully deleted video with id: {videoId}")
 		return ("success", "")
 	except HttpError as e:
-		response = json.loads(e.content)
-		reason = ""
-		if "errors" in response["error"]:
-			reason = response["error"]["errors"][0]["reason"]		
+		reason = get_error_reason(e)
 		if reason == "videoNotFound":
 			return ("failure", "videoNotFound")
-		elif reason == "quotaExceeded" or reason == "dailyLimitExceeded":
+		elif reason in QUOTA_EXCEEDED_REASONS:
+			record_quota_exceeded(clientNum)
 			return ("failure", "quotaExceeded")
 	except Exception as e:
 		ytlogger.error("{}\n{}".format(e, traceback.format_exc()))
@@ -90,7 +233,7 @@ def deleteVideo(videoId):
 	# try number of clients to increase quota limit
 	result = "failure"
 	info = ""
-	for i in range(1, num_of_clients+1):
+	for i in get_clients("delete"):
 		ytlogger.info(f"Client {i} trying to delete...")
 		result, info = start_delete_process(i, videoId)
 		if result == "success" or (result == "failure" and info == "videoNotFound"):
@@ -196,6 +339,7 @@ def start_auth_process(clientNum):
 		return youtube
 	except Exception as e:
 		ytlogger.error("{}\n{}".format(e, traceback.format_exc()))
+	_client_failures[clientNum] = time.time()
 	return False
 
 def start_upload_process(clientNum, videoPath, title, description, keywords):
@@ -211,18 +355,14 @@ def start_upload_process(clientNum, videoPath, title, description, keywords):
 		"title": title
 	}
 	try:
+		record_quota_usage(clientNum, "insert")
 		uploadSuccess = initialize_upload(youtube, data)
 		return uploadSuccess
 	except HttpError as e:
-		response = json.loads(e.content)
-		quotaExceeded = False
-		if "error" in response:
-			if "errors" in response["error"]:
-				reason = response["error"]["errors"][0]["reason"]
-				if reason == "quotaExceeded" or reason == "dailyLimitExceeded":
-					quotaExceeded = True
-					ytlogger.info("Couldn't upload file, quota exceeded")
-		if not quotaExceeded:
+		if get_error_reason(e) in QUOTA_EXCEEDED_REASONS:
+			ytlogger.info("Couldn't upload file, quota exceeded")
+			record_quota_exceeded(clientNum)
+		else:
 			ytlogger.error("An HTTP error %d occurred:\n%s" % (e.resp.status, e.content))
 	except Exception as e:
 		ytlogger.error("{}\n{}".format(e, traceback.format_exc()))
@@ -232,7 +372,7 @@ def start_upload_process(clientNum, videoPath, title, description, keywords):
 def uploadVideo(videoPath, title, description, keywords):
 	# try number of clients to increase quota limit
 	success = False
-	for i in range(1, num_of_clients+1):
+	for i in get_clients("insert"):
 		ytlogger.info(f"Client {i} trying to upload...")
 		success = start_upload_process(clientNum=i, videoPath=videoPath, title=title, description=description, keywords=keywords)
 		if success:
@@ -248,6 +388,7 @@ def start_setVideoToPublic_process(clientNum, videoId):
 	if not youtube:
 		return False
 	try: 
+		record_quota_usage(clientNum, "update")
 		delete_request = youtube.videos().update(part="status", body={
 			"id": videoId,
 			"status": {
@@ -259,6 +400,12 @@ def start_setVideoToPublic_process(clientNum, videoId):
 		ytlogger.info(delete_request)
 		ytlogger.info(f"Successfully set video: {videoId} to public")
 		return True
+	except HttpError as e:
+		if get_error_reason(e) in QUOTA_EXCEEDED_REASONS:
+			ytlogger.info(f"Couldn't set video: {videoId} to public, quota exceeded")
+			record_quota_exceeded(clientNum)
+		else:
+			ytlogger.error("An HTTP error %d occurred:\n%s" % (e.resp.status, e.content))
 	except Exception as e:
 		ytlogger.error("{}\n{}".format(e, traceback.format_exc()))
 	return False
@@ -267,7 +414,7 @@ def start_setVideoToPublic_process(clientNum, videoId):
 def setVideoToPublic(videoId):
 	# try number of clients to increase quota limit
 	success = False
-	for i in range(1, num_of_clients+1):
+	for i in get_clients("update"):
 		ytlogger.info(f"Client {i} trying to set video to public...")
 		success = start_setVideoToPublic_process(i, videoId)
 		if success:
@@ -278,37 +425,36 @@ def setVideoToPublic(videoId):
 	return success
 
 
-def start_getProcessingDetails_process(clientNum, videoId):
+def start_getProcessingDetails_process(clientNum, videoIds):
 	youtube = start_auth_process(clientNum)
 	if not youtube:
 		return False
 	try: 
-		request = youtube.videos().list(part="processingDetails,status", id=videoId).execute()
-		ytlogger.info(f"Successfully got processing details of video: {videoId}: {request}")
+		record_quota_usage(clientNum, "list")
+		request = youtube.videos().list(part="id,processingDetails,status", id=",".join(videoIds)).execute()
+		ytlogger.info(f"Successfully got processing details of {len(videoIds)} videos: {request}")
 		return request
 	except HttpError as e:
-		response = json.loads(e.content)
-		if "error" in response:
-			if "errors" in response["error"]:
-				reason = response["error"]["errors"][0]["reason"]
-				if reason == "dailyLimitExceeded" or reason == "quotaExceeded":
-					ytlogger.info(f"Couldn't get processing details of {videoId}, quota exceeded")
+		if get_error_reason(e) in QUOTA_EXCEEDED_REASONS:
+			ytlogger.info(f"Couldn't get processing details of {len(videoIds)} videos, quota exceeded")
+			record_quota_exceeded(clientNum)
 	except Exception as e:
 		ytlogger.error("{}\n{}".format(e, traceback.format_exc()))
 	return False
 
 
-def getProcessingDetails(videoId):
+def getProcessingDetails(videoIds):
+	# the processing details of a list of videos (up to 50) in one call, a video YouTube doesn't have is not in the items
 	# try number of clients to increase quota limit
 	success = False
-	for i in range(1, num_of_clients+1):
+	for i in get_clients("list"):
 		ytlogger.info(f"Client {i} trying to get processing details")
-		success = start_getProcessingDetails_process(i, videoId)
+		success = start_getProcessingDetails_process(i, videoIds)
 		if success:
 			break
 		ytlogger.info(f"Client {i} couldn't get processing details, trying next client...")
 	if not success:
-		ytlogger.info(f"All clients failed, couldn't get processing details of video {videoId} :(")
+		ytlogger.info(f"All clients failed, couldn't get processing details of videos {videoIds} :(")
 	return success
 
 
@@ -317,6 +463,7 @@ def start_delete_partially_uploaded_video_process(clientNum, tag_video_identifie
 	if not youtube:
 		return False
 	try: 
+		record_quota_usage(clientNum, "search")
 		request = youtube.search().list(part="snippet", forMine=True, type="video", q=tag_video_identifier).execute()
 		if request['pageInfo']['totalResults'] == 1:
 			videoId = request['items'][0]['id']['videoId']
@@ -332,7 +479,7 @@ def start_delete_partially_uploaded_video_process(clientNum, tag_video_identifie
 def deletePartiallyUploadedVideo(tag_video_identifier):
 	# try number of clients to increase quota limit
 	success = False
-	for i in range(1, num_of_clients+1):
+	for i in get_clients("search"):
 		ytlogger.info(f"Client {i} trying to delete partially uploaded video {tag_video_identifier}")
 		success = start_delete_partially_uploaded_video_process(i, tag_video_identifier)
 		if success:
@@ -0,0 +1,69 @@
+import os
+import sys
+import signal
+import subprocess
+import multiprocessing
+
+# Production server of the site, run it in the main folder with: gunicorn
+# (gunicorn reads this file, the settings can be changed by the environment variables below).
+# The app is loaded once by the master process before it forks its workers (preload_app), so the workers share its memory
+# (copy on write) and start right away. Every worker serves WEB_THREADS requests at the same time.
+# The YouTube jobs and the processing poller run in one process of their own ("flask run-youtube-jobs", started and
+# stopped by the master), not in every worker: the workers have YOUTUBE_WORKERS 0.
+# Every worker (and the jobs process) has its own in-memory caches (filter options, table totals, showcase): a process
+# applies the invalidations of the others within CACHE_SYNC_INTERVAL seconds (avr/cacheSync.py). The files they all
+# change are locked between them: the chunked uploads, the file store and the YouTube quota (avr/locks.py). The showcase
+# cache file is written only by the jobs process, the workers read it when they start (avr/showcase.py).
+# With WEB_ASGI=1 the workers are uvicorn workers that serve avr.asgi:application (the YouTube status streams of the
+# project status pages don't take a thread, see avr/asgi.py).
+# Reload the workers gracefully with: kill -HUP <master pid> (the requests they serve are finished first, up to
+# graceful_timeout seconds). HUP doesn't load new code because the app is preloaded, to deploy new code start a new
+# master with: kill -USR2 <master pid>, then stop the old one with: kill -TERM <old master pid>
+
+asgi = os.environ.get("WEB_ASGI") == "1"
+
+wsgi_app = "avr.asgi:application" if asgi else "run:app"
+worker_class = "uvicorn.workers.UvicornWorker" if asgi else "gthread"
+bind = os.environ.get("WEB_BIND", "0.0.0.0:80")
+workers = int(os.environ.get("WEB_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("WEB_THREADS", 4))
+preload_app = True
+# a worker that doesn't answer the master for this number of seconds (a stuck request) is killed and replaced
+timeout = int(os.environ.get("WEB_TIMEOUT", 60))
+graceful_timeout = int(os.environ.get("WEB_GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+# the workers are replaced after this number of requests (and a random part of max_requests_jitter), so memory they leak is freed
+max_requests = int(os.environ.get("WEB_MAX_REQUESTS", 5000))
+max_requests_jitter = max_requests // 10
+# threads of the YouTube jobs process, 0 to run the jobs somewhere else
+youtubeJobsWorkers = int(os.environ.get("YOUTUBE_JOBS_WORKERS", 2))
+
+_youtubeJobsProcess = None
+
+
+def when_ready(server):
+	# the master starts the YouTube jobs process once the workers are listening
+	global _youtubeJobsProcess
+	if youtubeJobsWorkers <= 0:
+		return
+	environment = dict(os.environ, FLASK_APP="run.py")
+	_youtubeJobsProcess = subprocess.Popen([sys.executable, "-m", "flask", "run-youtube-jobs", "--workers", str(youtubeJobsWorkers)], env=environment)
+	server.log.info("YouTube jobs process started (pid: %s)", _youtubeJobsProcess.pid)
+
+
+def post_fork(server, worker):
+	from avr import app, db
+	# the YouTube jobs run in the jobs process (the status streams read the statuses they change, see avr/statusHub.py)
+	app.config['YOUTUBE_WORKERS'] = 0
+	# the connections the master opened are not shared with the workers
+	db.engine.dispose()
+
+
+def on_exit(server):
+	if _youtubeJobsProcess is not None and _youtubeJobsProcess.poll() is None:
+		_youtubeJobsProcess.send_signal(signal.SIGTERM)
+		try:
+			_youtubeJobsProcess.wait(graceful_timeout)
+		except subprocess.TimeoutExpired:
+			_youtubeJobsProcess.kill()
+		server.log.info("YouTube jobs process stopped")
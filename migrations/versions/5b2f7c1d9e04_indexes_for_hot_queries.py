@@ -0,0 +1,51 @@
+"""indexes for the hot queries
+
+Revision ID: 5b2f7c1d9e04
+Revises:
+Create Date: 2026-10-18 12:50:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b2f7c1d9e04'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# (index name, table, columns), the same indexes are declared in models.py so new databases get them from db.create_all()
+indexes = [
+	('ix_project_year_semester_status', 'project', ['year', 'semester', 'status']),
+	('ix_project_published_projectDocApproved_year', 'project', ['published', 'projectDocApproved', 'year']),
+	('ix_project_title', 'project', ['title']),
+	('ix_project_status', 'project', ['status']),
+	('ix_student_year_semester', 'student', ['year', 'semester']),
+	('ix_student_email', 'student', ['email']),
+	('ix_student_project_projectId', 'student_project', ['projectId']),
+	('ix_student_project_courseId', 'student_project', ['courseId']),
+	('ix_supervisor_status', 'supervisor', ['status']),
+	('ix_supervisor_project_supervisorId', 'supervisor_project', ['supervisorId']),
+	('ix_supervisor_project_projectId', 'supervisor_project', ['projectId']),
+	('ix_supervisor_proposed_project_supervisorId', 'supervisor_proposed_project', ['supervisorId']),
+	('ix_supervisor_proposed_project_proposedProjectId', 'supervisor_proposed_project', ['proposedProjectId']),
+	('ix_proposed_project_published', 'proposed_project', ['published']),
+]
+
+
+def existingIndexes(table):
+	return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+	for name, table, columns in indexes:
+		# a database created after this revision already has them
+		if name not in existingIndexes(table):
+			op.create_index(name, table, columns)
+
+
+def downgrade():
+	for name, table, columns in reversed(indexes):
+		if name in existingIndexes(table):
+			op.drop_index(name, table_name=table)
@@ -0,0 +1,59 @@
+"""full text search tables
+
+Revision ID: 8d41e6a0c3b2
+Revises: 5b2f7c1d9e04
+Create Date: 2026-10-18 14:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d41e6a0c3b2'
+down_revision = '5b2f7c1d9e04'
+branch_labels = None
+depends_on = None
+
+# the statements that create the search tables of this revision and index the existing rows, as they were written then
+# (avr/search.py creates the current ones for new databases)
+searchTables = {
+	"student_search": [
+		"CREATE VIRTUAL TABLE student_search USING fts5(firstNameHeb, lastNameHeb, firstNameEng, lastNameEng, studentId, email, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+		"CREATE TRIGGER student_search_insert AFTER INSERT ON student BEGIN INSERT INTO student_search (rowid, firstNameHeb, lastNameHeb, firstNameEng, lastNameEng, studentId, email) VALUES (new.id, replace(replace(replace(replace(replace(new.firstNameHeb, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ'), replace(replace(replace(replace(replace(new.lastNameHeb, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ'), replace(replace(replace(replace(replace(new.firstNameEng, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ'), replace(replace(replace(replace(replace(new.lastNameEng, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ'), replace(replace(replace(replace(replace(new.studentId, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ'), replace(replace(replace(replace(replace(new.email, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ')); END",
+		"CREATE TRIGGER student_search_update AFTER UPDATE OF id, firstNameHeb, lastNameHeb, firstNameEng, lastNameEng, studentId, email ON student BEGIN DELETE FROM student_search WHERE rowid = old.id; INSERT INTO student_search (rowid, firstNameHeb, lastNameHeb, firstNameEng, lastNameEng, studentId, email) VALUES (new.id, replace(replace(replace(replace(replace(new.firstNameHeb, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ'), replace(replace(replace(replace(replace(new.lastNameHeb, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ'), replace(replace(replace(replace(replace(new.firstNameEng, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ'), replace(replace(replace(replace(replace(new.lastNameEng, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ'), replace(replace(replace(replace(replace(new.studentId, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ'), replace(replace(replace(replace(replace(new.email, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ')); END",
+		"CREATE TRIGGER student_search_delete AFTER DELETE ON student BEGIN DELETE FROM student_search WHERE rowid = old.id; END",
+		"INSERT INTO student_search (rowid, firstNameHeb, lastNameHeb, firstNameEng, lastNameEng, studentId, email) SELECT id, replace(replace(replace(replace(replace(firstNameHeb, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ'), replace(replace(replace(replace(replace(lastNameHeb, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ'), replace(replace(replace(replace(replace(firstNameEng, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ'), replace(replace(replace(replace(replace(lastNameEng, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ'), replace(replace(replace(replace(replace(studentId, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ'), replace(replace(replace(replace(replace(email, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ') FROM student"
+	],
+	"project_search": [
+		"CREATE VIRTUAL TABLE project_search USING fts5(title, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+		"CREATE TRIGGER project_search_insert AFTER INSERT ON project BEGIN INSERT INTO project_search (rowid, title) VALUES (new.id, replace(replace(replace(replace(replace(new.title, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ')); END",
+		"CREATE TRIGGER project_search_update AFTER UPDATE OF id, title ON project BEGIN DELETE FROM project_search WHERE rowid = old.id; INSERT INTO project_search (rowid, title) VALUES (new.id, replace(replace(replace(replace(replace(new.title, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ')); END",
+		"CREATE TRIGGER project_search_delete AFTER DELETE ON project BEGIN DELETE FROM project_search WHERE rowid = old.id; END",
+		"INSERT INTO project_search (rowid, title) SELECT id, replace(replace(replace(replace(replace(title, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ') FROM project"
+	],
+	"proposed_project_search": [
+		"CREATE VIRTUAL TABLE proposed_project_search USING fts5(title, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+		"CREATE TRIGGER proposed_project_search_insert AFTER INSERT ON proposed_project BEGIN INSERT INTO proposed_project_search (rowid, title) VALUES (new.id, replace(replace(replace(replace(replace(new.title, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ')); END",
+		"CREATE TRIGGER proposed_project_search_update AFTER UPDATE OF id, title ON proposed_project BEGIN DELETE FROM proposed_project_search WHERE rowid = old.id; INSERT INTO proposed_project_search (rowid, title) VALUES (new.id, replace(replace(replace(replace(replace(new.title, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ')); END",
+		"CREATE TRIGGER proposed_project_search_delete AFTER DELETE ON proposed_project BEGIN DELETE FROM proposed_project_search WHERE rowid = old.id; END",
+		"INSERT INTO proposed_project_search (rowid, title) SELECT id, replace(replace(replace(replace(replace(title, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ') FROM proposed_project"
+	]
+}
+
+
+def upgrade():
+	existingTables = sa.inspect(op.get_bind()).get_table_names()
+	for searchTable, statements in searchTables.items():
+		# a database created after this revision already has them
+		if searchTable in existingTables:
+			continue
+		for statement in statements:
+			op.execute(statement)
+
+
+def downgrade():
+	for searchTable in searchTables:
+		for trigger in ("insert", "update", "delete"):
+			op.execute(f"DROP TRIGGER IF EXISTS {searchTable}_{trigger}")
+		op.execute(f"DROP TABLE IF EXISTS {searchTable}")
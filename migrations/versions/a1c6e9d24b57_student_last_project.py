@@ -0,0 +1,54 @@
+"""student last project table
+
+Revision ID: a1c6e9d24b57
+Revises: d5f1a7c3e820
+Create Date: 2026-10-20 11:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1c6e9d24b57'
+down_revision = 'd5f1a7c3e820'
+branch_labels = None
+depends_on = None
+
+# the columns of the table, in the order students_view has them
+columns = ['id', 'profilePic', 'year', 'semester', 'studentId', 'firstNameHeb', 'lastNameHeb', 'lastProjectTitle', 'lastProjectStatus', 'lastProjectId']
+# the columns the students admin table filters and sorts by, an index each (like the index=True columns of models.py)
+indexedColumns = ['year', 'semester', 'studentId', 'firstNameHeb', 'lastNameHeb', 'lastProjectTitle', 'lastProjectStatus', 'lastProjectId']
+
+
+def upgrade():
+	# a database created after this table was added (or whose table was created by "flask rebuild-students-table") already has it
+	if "student_last_project" in sa.inspect(op.get_bind()).get_table_names():
+		return
+	op.create_table('student_last_project',
+		sa.Column('id', sa.Integer(), nullable=False),
+		sa.Column('profilePic', sa.String(length=50), nullable=True),
+		sa.Column('year', sa.Integer(), nullable=True),
+		sa.Column('semester', sa.String(length=20), nullable=True),
+		sa.Column('studentId', sa.String(length=20), nullable=False),
+		sa.Column('firstNameHeb', sa.String(length=30), nullable=False),
+		sa.Column('lastNameHeb', sa.String(length=30), nullable=False),
+		sa.Column('lastProjectTitle', sa.String(length=60), nullable=True),
+		sa.Column('lastProjectStatus', sa.String(length=50), nullable=True),
+		sa.Column('lastProjectId', sa.Integer(), nullable=True),
+		sa.ForeignKeyConstraint(['id'], ['student.id'], ),
+		sa.PrimaryKeyConstraint('id')
+	)
+	with op.batch_alter_table('student_last_project', schema=None) as batch_op:
+		for column in indexedColumns:
+			batch_op.create_index(batch_op.f('ix_student_last_project_' + column), [column], unique=False)
+	# every student and their last project, from the view the table is a copy of
+	columnsList = ', '.join('"{}"'.format(column) for column in columns)
+	op.execute(f'INSERT INTO student_last_project ({columnsList}) SELECT {columnsList} FROM students_view')
+
+
+def downgrade():
+	with op.batch_alter_table('student_last_project', schema=None) as batch_op:
+		for column in reversed(indexedColumns):
+			batch_op.drop_index(batch_op.f('ix_student_last_project_' + column))
+	op.drop_table('student_last_project')
@@ -0,0 +1,41 @@
+"""stored files
+
+Revision ID: a9d3e5c71f02
+Revises: e2b6d4f81a37
+Create Date: 2026-10-18 21:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9d3e5c71f02'
+down_revision = 'e2b6d4f81a37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+	# a database created after this revision already has it
+	if "stored_file" in sa.inspect(op.get_bind()).get_table_names():
+		return
+	op.create_table('stored_file',
+		sa.Column('id', sa.Integer(), nullable=False),
+		sa.Column('folder', sa.String(length=50), nullable=False),
+		sa.Column('name', sa.String(length=50), nullable=False),
+		sa.Column('hash', sa.String(length=64), nullable=False),
+		sa.Column('size', sa.Integer(), nullable=False),
+		sa.Column('refCount', sa.Integer(), nullable=False),
+		sa.Column('createdAt', sa.DateTime(), nullable=False),
+		sa.PrimaryKeyConstraint('id'),
+		sa.UniqueConstraint('folder', 'name')
+	)
+	with op.batch_alter_table('stored_file', schema=None) as batch_op:
+		batch_op.create_index(batch_op.f('ix_stored_file_hash'), ['hash'], unique=False)
+
+
+def downgrade():
+	with op.batch_alter_table('stored_file', schema=None) as batch_op:
+		batch_op.drop_index(batch_op.f('ix_stored_file_hash'))
+	op.drop_table('stored_file')
@@ -0,0 +1,46 @@
+"""youtube jobs
+
+Revision ID: b4e8f2a6c913
+Revises: a9d3e5c71f02
+Create Date: 2026-10-18 23:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4e8f2a6c913'
+down_revision = 'a9d3e5c71f02'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+	# a database created after this revision already has it
+	if "youtube_job" in sa.inspect(op.get_bind()).get_table_names():
+		return
+	op.create_table('youtube_job',
+		sa.Column('id', sa.Integer(), nullable=False),
+		sa.Column('projectId', sa.Integer(), nullable=False),
+		sa.Column('kind', sa.String(length=20), nullable=False),
+		sa.Column('status', sa.String(length=20), nullable=False),
+		sa.Column('attempts', sa.Integer(), nullable=False),
+		sa.Column('maxAttempts', sa.Integer(), nullable=False),
+		sa.Column('runAt', sa.DateTime(), nullable=False),
+		sa.Column('error', sa.Text(), nullable=True),
+		sa.Column('createdAt', sa.DateTime(), nullable=False),
+		sa.Column('startedAt', sa.DateTime(), nullable=True),
+		sa.Column('finishedAt', sa.DateTime(), nullable=True),
+		sa.PrimaryKeyConstraint('id')
+	)
+	with op.batch_alter_table('youtube_job', schema=None) as batch_op:
+		batch_op.create_index('ix_youtube_job_status_runAt', ['status', 'runAt'], unique=False)
+		batch_op.create_index(batch_op.f('ix_youtube_job_projectId'), ['projectId'], unique=False)
+
+
+def downgrade():
+	with op.batch_alter_table('youtube_job', schema=None) as batch_op:
+		batch_op.drop_index(batch_op.f('ix_youtube_job_projectId'))
+		batch_op.drop_index('ix_youtube_job_status_runAt')
+	op.drop_table('youtube_job')
@@ -0,0 +1,49 @@
+"""drop the title search tables
+
+Revision ID: b8e2d7f04c93
+Revises: a1c6e9d24b57
+Create Date: 2026-10-20 13:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e2d7f04c93'
+down_revision = 'a1c6e9d24b57'
+branch_labels = None
+depends_on = None
+
+# the title filters of the projects and proposed projects tables are dropdowns of the titles (an index of the title),
+# their full text search tables are not used anymore.
+# the statements that create them again (downgrade), as they were written when they were dropped
+searchTables = {
+	"project_search": [
+		"CREATE VIRTUAL TABLE project_search USING fts5(title, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+		"CREATE TRIGGER project_search_insert AFTER INSERT ON project BEGIN INSERT INTO project_search (rowid, title) VALUES (new.id, replace(replace(replace(replace(replace(new.title, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ')); END",
+		"CREATE TRIGGER project_search_update AFTER UPDATE OF id, title ON project BEGIN DELETE FROM project_search WHERE rowid = old.id; INSERT INTO project_search (rowid, title) VALUES (new.id, replace(replace(replace(replace(replace(new.title, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ')); END",
+		"CREATE TRIGGER project_search_delete AFTER DELETE ON project BEGIN DELETE FROM project_search WHERE rowid = old.id; END",
+		"INSERT INTO project_search (rowid, title) SELECT id, replace(replace(replace(replace(replace(title, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ') FROM project"
+	],
+	"proposed_project_search": [
+		"CREATE VIRTUAL TABLE proposed_project_search USING fts5(title, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+		"CREATE TRIGGER proposed_project_search_insert AFTER INSERT ON proposed_project BEGIN INSERT INTO proposed_project_search (rowid, title) VALUES (new.id, replace(replace(replace(replace(replace(new.title, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ')); END",
+		"CREATE TRIGGER proposed_project_search_update AFTER UPDATE OF id, title ON proposed_project BEGIN DELETE FROM proposed_project_search WHERE rowid = old.id; INSERT INTO proposed_project_search (rowid, title) VALUES (new.id, replace(replace(replace(replace(replace(new.title, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ')); END",
+		"CREATE TRIGGER proposed_project_search_delete AFTER DELETE ON proposed_project BEGIN DELETE FROM proposed_project_search WHERE rowid = old.id; END",
+		"INSERT INTO proposed_project_search (rowid, title) SELECT id, replace(replace(replace(replace(replace(title, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ') FROM proposed_project"
+	]
+}
+
+
+def upgrade():
+	for searchTable in searchTables:
+		for trigger in ("insert", "update", "delete"):
+			op.execute(f"DROP TRIGGER IF EXISTS {searchTable}_{trigger}")
+		op.execute(f"DROP TABLE IF EXISTS {searchTable}")
+
+
+def downgrade():
+	for statements in searchTables.values():
+		for statement in statements:
+			op.execute(statement)
@@ -0,0 +1,34 @@
+"""showcase search table
+
+Revision ID: c7a93f2e5d18
+Revises: 8d41e6a0c3b2
+Create Date: 2026-10-18 15:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7a93f2e5d18'
+down_revision = '8d41e6a0c3b2'
+branch_labels = None
+depends_on = None
+
+# the statements that create the showcase search table of this revision and index the published projects, as they were
+# written then (avr/search.py creates the current one for new databases)
+statements = [
+	"CREATE VIRTUAL TABLE showcase_search USING fts5(title, abstract, supervisors, students, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+	"INSERT INTO showcase_search (rowid, title, abstract, supervisors, students) SELECT project.id, replace(replace(replace(replace(replace(project.title, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ'), replace(replace(replace(replace(replace(project.abstract, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ'), replace(replace(replace(replace(replace((SELECT group_concat(coalesce(supervisor.firstNameEng, '') || ' ' || coalesce(supervisor.lastNameEng, '') || ' ' || coalesce(supervisor.firstNameHeb, '') || ' ' || coalesce(supervisor.lastNameHeb, ''), ' ') FROM supervisor JOIN supervisor_project ON supervisor_project.supervisorId = supervisor.id WHERE supervisor_project.projectId = project.id), 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ'), replace(replace(replace(replace(replace((SELECT group_concat(coalesce(student.firstNameEng, '') || ' ' || coalesce(student.lastNameEng, '') || ' ' || coalesce(student.firstNameHeb, '') || ' ' || coalesce(student.lastNameHeb, ''), ' ') FROM student JOIN student_project ON student_project.studentId = student.id WHERE student_project.projectId = project.id), 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ') FROM project WHERE project.published = 1 AND project.projectDocApproved = 1"
+]
+
+
+def upgrade():
+	if "showcase_search" in sa.inspect(op.get_bind()).get_table_names():
+		return
+	for statement in statements:
+		op.execute(statement)
+
+
+def downgrade():
+	op.execute("DROP TABLE IF EXISTS showcase_search")
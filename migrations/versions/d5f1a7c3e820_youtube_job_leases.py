@@ -0,0 +1,31 @@
+"""youtube job leases
+
+Revision ID: d5f1a7c3e820
+Revises: f3c81d5a7b26
+Create Date: 2026-10-20 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5f1a7c3e820'
+down_revision = 'f3c81d5a7b26'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+	# a database created after this revision already has them
+	if "claimedBy" in [column["name"] for column in sa.inspect(op.get_bind()).get_columns('youtube_job')]:
+		return
+	with op.batch_alter_table('youtube_job', schema=None) as batch_op:
+		batch_op.add_column(sa.Column('claimedBy', sa.String(length=64), nullable=True))
+		batch_op.add_column(sa.Column('heartbeatAt', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+	with op.batch_alter_table('youtube_job', schema=None) as batch_op:
+		batch_op.drop_column('heartbeatAt')
+		batch_op.drop_column('claimedBy')
@@ -0,0 +1,41 @@
+"""media jobs
+
+Revision ID: e2b6d4f81a37
+Revises: c7a93f2e5d18
+Create Date: 2026-10-18 19:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b6d4f81a37'
+down_revision = 'c7a93f2e5d18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+	# a database created after this revision already has it
+	if "media_job" in sa.inspect(op.get_bind()).get_table_names():
+		return
+	op.create_table('media_job',
+		sa.Column('id', sa.Integer(), nullable=False),
+		sa.Column('folder', sa.String(length=50), nullable=False),
+		sa.Column('sourceName', sa.String(length=50), nullable=False),
+		sa.Column('imageName', sa.String(length=50), nullable=False),
+		sa.Column('status', sa.String(length=20), nullable=False),
+		sa.Column('error', sa.Text(), nullable=True),
+		sa.Column('createdAt', sa.DateTime(), nullable=False),
+		sa.Column('finishedAt', sa.DateTime(), nullable=True),
+		sa.PrimaryKeyConstraint('id')
+	)
+	with op.batch_alter_table('media_job', schema=None) as batch_op:
+		batch_op.create_index(batch_op.f('ix_media_job_status'), ['status'], unique=False)
+
+
+def downgrade():
+	with op.batch_alter_table('media_job', schema=None) as batch_op:
+		batch_op.drop_index(batch_op.f('ix_media_job_status'))
+	op.drop_table('media_job')
@@ -0,0 +1,42 @@
+"""refill the showcase search table
+
+Revision ID: e9c4b1f7a263
+Revises: b8e2d7f04c93
+Create Date: 2026-10-21 10:15:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9c4b1f7a263'
+down_revision = 'b8e2d7f04c93'
+branch_labels = None
+depends_on = None
+
+# the showcase search rows were filled without coalescing the names of the people, a project with a NULL name had no
+# supervisors (or students) in its row. The rows are refilled with the names coalesced (the SELECT of avr/search.py
+# showcaseRows as it was in this revision)
+showcaseRows = ("SELECT project.id, "
+	"replace(replace(replace(replace(replace(project.title, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ'), "
+	"replace(replace(replace(replace(replace(project.abstract, 'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ'), "
+	"replace(replace(replace(replace(replace((SELECT group_concat(coalesce(supervisor.firstNameEng, '') || ' ' || coalesce(supervisor.lastNameEng, '') || ' ' || "
+	"coalesce(supervisor.firstNameHeb, '') || ' ' || coalesce(supervisor.lastNameHeb, ''), ' ') "
+	"FROM supervisor JOIN supervisor_project ON supervisor_project.supervisorId = supervisor.id WHERE supervisor_project.projectId = project.id), "
+	"'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ'), "
+	"replace(replace(replace(replace(replace((SELECT group_concat(coalesce(student.firstNameEng, '') || ' ' || coalesce(student.lastNameEng, '') || ' ' || "
+	"coalesce(student.firstNameHeb, '') || ' ' || coalesce(student.lastNameHeb, ''), ' ') "
+	"FROM student JOIN student_project ON student_project.studentId = student.id WHERE student_project.projectId = project.id), "
+	"'ך', 'כ'), 'ם', 'מ'), 'ן', 'נ'), 'ף', 'פ'), 'ץ', 'צ') "
+	"FROM project WHERE project.published = 1 AND project.projectDocApproved = 1")
+
+
+def upgrade():
+	op.execute("DELETE FROM showcase_search")
+	op.execute(f"INSERT INTO showcase_search (rowid, title, abstract, supervisors, students) {showcaseRows}")
+
+
+def downgrade():
+	# the coalesced rows are correct for the previous revision too
+	pass
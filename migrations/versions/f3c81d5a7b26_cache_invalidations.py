@@ -0,0 +1,39 @@
+"""cache invalidations
+
+Revision ID: f3c81d5a7b26
+Revises: b4e8f2a6c913
+Create Date: 2026-10-19 10:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c81d5a7b26'
+down_revision = 'b4e8f2a6c913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+	# a database created after this revision already has it
+	if "cache_invalidation" in sa.inspect(op.get_bind()).get_table_names():
+		return
+	op.create_table('cache_invalidation',
+		sa.Column('id', sa.Integer(), nullable=False),
+		sa.Column('cache', sa.String(length=20), nullable=False),
+		sa.Column('keys', sa.Text(), nullable=True),
+		sa.Column('origin', sa.String(length=16), nullable=False),
+		sa.Column('createdAt', sa.DateTime(), nullable=False),
+		sa.PrimaryKeyConstraint('id'),
+		sqlite_autoincrement=True
+	)
+	with op.batch_alter_table('cache_invalidation', schema=None) as batch_op:
+		batch_op.create_index(batch_op.f('ix_cache_invalidation_createdAt'), ['createdAt'], unique=False)
+
+
+def downgrade():
+	with op.batch_alter_table('cache_invalidation', schema=None) as batch_op:
+		batch_op.drop_index(batch_op.f('ix_cache_invalidation_createdAt'))
+	op.drop_table('cache_invalidation')
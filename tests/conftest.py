@@ -0,0 +1,62 @@
+import os
+import random
+import shutil
+import tempfile
+import pytest
+
+# The tests run against a database of their own in a temporary folder: avr creates its tables (and the students view and
+# the full text search tables) when it's imported and the database doesn't exist, and seededDatabase adds the rows of
+# the tests. Run them in the main folder with: python -m pytest
+_folder = tempfile.mkdtemp(prefix="avr-tests-")
+os.environ["DATABASE_URI"] = "sqlite:///" + os.path.join(_folder, "site.db")
+_cwd = os.getcwd()
+# the log of the site (siteLog.log) is written in the current folder
+os.chdir(_folder)
+try:
+	from avr import app, db, models, database
+finally:
+	os.chdir(_cwd)
+
+app.config['SHOWCASE_CACHE_FILE'] = os.path.join(_folder, "showcase_cache.json")
+# the requests of the tests don't start YouTube workers
+app.config['YOUTUBE_WORKERS'] = 0
+
+
+def _seed():
+	# 60 students, 5 supervisors, 30 projects (the first 25 with 2 students each, the project i has student 2i+1 and 2i+2)
+	# and 15 proposed projects
+	random.seed(1)
+	db.session.add(models.User(userId="admin", userType="admin"))
+	db.session.add(models.Admin(adminId="admin", password="x"))
+	db.session.add(models.Course(number="1", name="c1", academicPoints=3, isDefault=True))
+	for i in range(5):
+		db.session.add(models.Supervisor(supervisorId=str(i), firstNameEng="S" + str(i), lastNameEng="L", firstNameHeb="ש",
+			lastNameHeb="ל", status="active" if i % 2 else "not active"))
+	for i in range(60):
+		db.session.add(models.Student(studentId=str(1000 + i), password="x", firstNameHeb="דני" + str(i % 7), lastNameHeb="כהן" + str(i % 5),
+			firstNameEng="Dan" + str(i), lastNameEng="Cohen", faculty="f", email=f"s{i}@x.com", semester=random.choice(["Winter", "Spring"]),
+			year=random.choice([2019, 2020, 2021])))
+	db.session.commit()
+	for i in range(30):
+		projectId = database.addProject({"title": "proj %d" % (i % 12), "year": random.choice([2019, 2020]), "semester": random.choice(["Winter", "Spring"]),
+			"status": random.choice(["הרשמה", "הושלם", "פוסטר"]), "abstract": "abstract about robots %d" % i, "published": i % 3 == 0,
+			"projectDocApproved": i % 2 == 0, "projectDocImage": "img.png", "youtubeVideo": "vid%d" % i})
+		database.updateProjectStudents(projectId, [{"id": 2 * i + 1, "courseId": 1}, {"id": 2 * i + 2, "courseId": 1}] if i < 25 else [])
+		database.updateProjectSupervisors(projectId, {1 + i % 5})
+	for i in range(15):
+		database.addProposedProject({"title": "pp %d" % i, "description": "desc words " * 5})
+	# the students were added without the functions that keep their last projects
+	database.rebuildStudentsLastProject()
+
+
+@pytest.fixture(scope="session")
+def seededDatabase():
+	with app.app_context():
+		_seed()
+		yield db
+		db.session.remove()
+
+
+def pytest_sessionfinish(session, exitstatus):
+	db.engine.dispose()
+	shutil.rmtree(_folder, ignore_errors=True)
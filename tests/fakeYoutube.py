@@ -0,0 +1,156 @@
+import os
+import json
+import shutil
+import tempfile
+import threading
+import collections
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from oauth2client.client import OAuth2Credentials
+from oauth2client.file import Storage
+from avr.youtubeUpload import youtubeUpload
+
+# Fake YouTube service of the YouTube tests: a local http server that answers the videos.list, update and delete calls
+# of the YouTube clients like YouTube does, with a daily quota of every client (by its access token).
+# fakeClients points youtubeUpload at it, with its credentials and quota.json in a temporary folder (the real ones are
+# not read or changed).
+
+# http method of a call -> its quota cost
+_costs = {
+	"GET": youtubeUpload.QUOTA_COSTS["list"],
+	"PUT": youtubeUpload.QUOTA_COSTS["update"],
+	"DELETE": youtubeUpload.QUOTA_COSTS["delete"]
+}
+
+
+def _method(id, httpMethod, parameters, request=False):
+	method = {
+		"id": id,
+		"path": "videos",
+		"httpMethod": httpMethod,
+		"parameters": parameters
+	}
+	if httpMethod == "GET":
+		method["response"] = {"$ref": "Response"}
+	if request:
+		method["request"] = {"$ref": "Response"}
+	return method
+
+
+def _discoveryDocument(url):
+	# the part of the YouTube discovery document the checked calls use
+	return json.dumps({
+		"kind": "discovery#restDescription",
+		"discoveryVersion": "v1",
+		"id": "youtube:v3",
+		"name": "youtube",
+		"version": "v3",
+		"rootUrl": url,
+		"servicePath": "youtube/v3/",
+		"baseUrl": url + "youtube/v3/",
+		"parameters": {},
+		"schemas": {"Response": {"id": "Response", "type": "object"}},
+		"resources": {"videos": {"methods": {
+			"list": _method("youtube.videos.list", "GET", {
+				"part": {"type": "string", "required": True, "location": "query"},
+				"id": {"type": "string", "location": "query"}
+			}),
+			"update": _method("youtube.videos.update", "PUT", {
+				"part": {"type": "string", "required": True, "location": "query"}
+			}, request=True),
+			"delete": _method("youtube.videos.delete", "DELETE", {
+				"id": {"type": "string", "required": True, "location": "query"}
+			})
+		}}}
+	})
+
+
+class _Handler(BaseHTTPRequestHandler):
+	protocol_version = "HTTP/1.1"
+
+	def handleCall(self):
+		self.rfile.read(int(self.headers.get("Content-Length") or 0))
+		service = self.server.service
+		# the access token of client n is "client<n>"
+		clientNum = int(self.headers.get("Authorization", "").replace("Bearer client", "") or 0)
+		with service.lock:
+			service.calls[clientNum] += 1
+			exceeded = service.used[clientNum] + _costs[self.command] > service.limits.get(clientNum, youtubeUpload.QUOTA_PER_DAY)
+			if not exceeded:
+				service.used[clientNum] += _costs[self.command]
+		if exceeded:
+			status, body = 403, {"error": {"code": 403, "errors": [{"reason": "quotaExceeded"}]}}
+		elif self.command == "GET":
+			videoIds = parse_qs(urlparse(self.path).query).get("id", [""])[0].split(",")
+			status, body = 200, {
+				"pageInfo": {"totalResults": len(videoIds)},
+				"items": [{"id": videoId, "status": {"uploadStatus": "processed"}} for videoId in videoIds]
+			}
+		elif self.command == "PUT":
+			status, body = 200, {"status": {"privacyStatus": "public"}}
+		else:
+			status, body = 204, None
+		data = json.dumps(body).encode("utf-8") if body is not None else b""
+		self.send_response(status)
+		self.send_header("Content-Type", "application/json")
+		self.send_header("Content-Length", str(len(data)))
+		self.end_headers()
+		self.wfile.write(data)
+
+	do_GET = do_PUT = do_DELETE = handleCall
+
+	def log_message(self, format, *args):
+		pass
+
+
+class FakeYoutube:
+	# limits: client number -> its quota units a day (QUOTA_PER_DAY for the clients that are not in it)
+	def __init__(self, limits=None):
+		self.limits = limits or {}
+		self.used = collections.Counter()
+		self.calls = collections.Counter()
+		self.lock = threading.Lock()
+		self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+		self.server.service = self
+		self.url = "http://127.0.0.1:{}/".format(self.server.server_address[1])
+
+	def __enter__(self):
+		threading.Thread(target=self.server.serve_forever, name="fake-youtube", daemon=True).start()
+		return self
+
+	def __exit__(self, *exception):
+		self.server.shutdown()
+		self.server.server_close()
+
+
+@contextmanager
+def fakeClients(service):
+	# points the clients of youtubeUpload at the fake service, with credentials and quota.json in a temporary folder
+	folder = tempfile.mkdtemp(prefix="fake-youtube-")
+	saved = (youtubeUpload._discovery_document, youtubeUpload._credentials_folder, youtubeUpload._quota_path, dict(youtubeUpload._client_failures))
+	try:
+		youtubeUpload._discovery_document = _discoveryDocument(service.url)
+		youtubeUpload._credentials_folder = os.path.join(folder, "credentials")
+		youtubeUpload._quota_path = os.path.join(folder, "quota.json")
+		youtubeUpload._client_failures.clear()
+		for clientNum in range(1, youtubeUpload.num_of_clients + 1):
+			os.makedirs(os.path.join(youtubeUpload._credentials_folder, str(clientNum)))
+			Storage(os.path.join(youtubeUpload._credentials_folder, str(clientNum), "oauth2.json")).put(OAuth2Credentials(
+				"client{}".format(clientNum), "fake", "fake", "fake", datetime.utcnow() + timedelta(hours=1), service.url + "token", "fake"))
+		youtubeUpload.reset_clients()
+		yield
+	finally:
+		youtubeUpload._discovery_document, youtubeUpload._credentials_folder, youtubeUpload._quota_path, clientFailures = saved
+		youtubeUpload._client_failures.clear()
+		youtubeUpload._client_failures.update(clientFailures)
+		youtubeUpload.reset_clients()
+		shutil.rmtree(folder, ignore_errors=True)
+
+
+def recordUsage(quotaPath, calls):
+	# runs in another process: counts the quota of calls list calls of client 1
+	youtubeUpload._quota_path = quotaPath
+	for i in range(calls):
+		youtubeUpload.record_quota_usage(1, "list")
@@ -0,0 +1,51 @@
+import os
+import pytest
+from PIL import Image
+from avr import app
+from avr import images
+
+# The variants of an image are looked up once, on its first render: the next renders don't read the file system,
+# and writing or deleting its variants (or its pending marker) shows in the next render.
+
+folder = "images/projects"
+
+
+@pytest.fixture
+def image(seededDatabase, monkeypatch, tmp_path):
+	monkeypatch.setattr(app, "static_folder", str(tmp_path))
+	os.makedirs(tmp_path / folder)
+	Image.new("RGB", (400, 300), "red").save(tmp_path / folder / "test.jpg")
+	images._forget(None)
+	yield "test.jpg"
+	images._forget(None)
+
+
+def _countFileChecks(monkeypatch):
+	checks = []
+	exists = os.path.exists
+	monkeypatch.setattr(os.path, "exists", lambda path: checks.append(path) or exists(path))
+	return checks
+
+
+def testRendersDontCheckTheFiles(image, monkeypatch):
+	images.saveVariants(folder, image)
+	images.forget(folder, image)
+	checks = _countFileChecks(monkeypatch)
+	first = images.picture(folder, image, "thumb")
+	assert checks and "test.thumb.webp" in first
+	checks.clear()
+	for i in range(10):
+		assert images.picture(folder, image, "thumb") == first
+		images.variantUrls(folder, image, "card")
+	assert checks == []
+
+
+def testChangedVariantsShowInTheNextRender(image):
+	assert images.variantUrls(folder, image, "thumb") == (f"/static/{folder}/{image}",) * 2
+	images.markPending(folder, image, 12)
+	assert "data-media-job='12'" in images.picture(folder, image, "thumb")
+	images.saveVariants(folder, image)
+	images.clearPending(folder, image)
+	assert images.variantUrls(folder, image, "thumb") == (f"/static/{folder}/variants/test.thumb.webp", f"/static/{folder}/variants/test.thumb.jpg")
+	images.deleteVariants(folder, image)
+	assert images.variantUrls(folder, image, "thumb") == (f"/static/{folder}/{image}",) * 2
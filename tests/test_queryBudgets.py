@@ -0,0 +1,71 @@
+import pytest
+from contextlib import contextmanager
+from sqlalchemy import event
+from avr import db
+from avr import database
+
+# Query budgets of the pages that show projects with their people: the statements getProjectWithPeople and
+# getStudentWithProjects send (with what the pages read of their results) must not grow with the number of students,
+# supervisors and projects.
+
+
+@contextmanager
+def countStatements(statements):
+	# appends every statement executed inside the block
+	def count(conn, cursor, statement, parameters, context, executemany):
+		statements.append(statement)
+
+	event.listen(db.engine, "before_cursor_execute", count)
+	try:
+		yield
+	finally:
+		event.remove(db.engine, "before_cursor_execute", count)
+
+
+@pytest.fixture
+def bigProject(seededDatabase):
+	# a project of 20 students (students 1 to 20, who already have a project) and all the supervisors, deleted after the test
+	projectId = database.addProject({"title": "big project", "year": 2021, "semester": "Winter", "status": "הרשמה"})
+	database.updateProjectStudents(projectId, [{"id": studentId, "courseId": 1} for studentId in range(1, 21)])
+	database.updateProjectSupervisors(projectId, set(range(1, 6)))
+	yield projectId
+	database.deleteProject(projectId)
+
+
+def _projectStatements(projectId):
+	# the statements of the project with what the admin project page reads of its students and supervisors
+	statements = []
+	db.session.expire_all()
+	with countStatements(statements):
+		project = database.getProjectWithPeople(projectId)
+		students = [(sp.student.studentId, sp.student.email, sp.courseId) for sp in project.studentProjects]
+		supervisors = [s.firstNameEng + " " + s.lastNameEng for s in project.supervisorsList]
+	return statements, len(students), len(supervisors)
+
+
+def _studentStatements(studentId):
+	# the statements of the student with what the student home page reads of their projects
+	statements = []
+	db.session.expire_all()
+	with countStatements(statements):
+		student = database.getStudentWithProjects(studentId)
+		projects = [(project.title, project.year, project.semester, project.status) for project in student.projects]
+	return statements, len(projects)
+
+
+def testProjectWithPeopleBudget(bigProject):
+	# the project, its students (with their course ids) and its supervisors
+	emptyStatements, emptyStudents, _ = _projectStatements(30)
+	bigStatements, bigStudents, bigSupervisors = _projectStatements(bigProject)
+	assert (emptyStudents, bigStudents, bigSupervisors) == (0, 20, 5)
+	assert len(bigStatements) <= 3, "\n".join(bigStatements)
+	assert len(bigStatements) == len(emptyStatements)
+
+
+def testStudentWithProjectsBudget(bigProject):
+	# the student and their projects
+	noProjectStatements, noProjects = _studentStatements("1059")
+	twoProjectsStatements, twoProjects = _studentStatements("1000")
+	assert (noProjects, twoProjects) == (0, 2)
+	assert len(twoProjectsStatements) <= 2, "\n".join(twoProjectsStatements)
+	assert len(twoProjectsStatements) == len(noProjectStatements)
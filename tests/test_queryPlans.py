@@ -0,0 +1,183 @@
+import re
+import json
+import pytest
+from contextlib import contextmanager
+from sqlalchemy import event
+from avr import db, models
+from avr import database
+from avr import pagination
+
+# Query plan tests of the database module: every check calls database functions on the seeded database and explains
+# (EXPLAIN QUERY PLAN) each statement they send to SQLite. A statement that scans a table (reads all its rows, with or
+# without an index) fails the check, unless the check lists the table as one it is expected to scan:
+# counts and lists of a whole table, filter options, unselective filters and ordered pages that stop after the page.
+# The session is rolled back after every check.
+
+_scanPattern = re.compile(r"^SCAN (?:TABLE )?(\w+)")
+_aliasPattern = re.compile(r'\b(\w+) AS "?(\w+)"?')
+
+
+@contextmanager
+def explainStatements(plans):
+	# appends (statement, plan) of every statement executed inside the block
+	def explain(conn, cursor, statement, parameters, context, executemany):
+		if executemany:
+			parameters = parameters[0]
+		planCursor = conn.connection.cursor()
+		plan = [row[-1] for row in planCursor.execute("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()]
+		planCursor.close()
+		plans.append((statement, plan))
+
+	event.listen(db.engine, "before_cursor_execute", explain)
+	try:
+		yield
+	finally:
+		event.remove(db.engine, "before_cursor_execute", explain)
+
+
+def scannedTables(statement, plan):
+	# the plan names a table by its alias when the statement has one (supervisor_project AS supervisor_project_1)
+	names = {name: name for name in db.metadata.tables}
+	names.update({alias: name for name, alias in _aliasPattern.findall(statement) if name in db.metadata.tables})
+	tables = set()
+	for detail in plan:
+		match = _scanPattern.match(detail)
+		if match and match.group(1) in names:
+			tables.add(names[match.group(1)])
+	return tables
+
+
+def _tableChecks(name, table, filters, scans):
+	# filters maps a filter name to (sample value, tables the filtered page may scan)
+	yield (f"{name} page", lambda: table.getPage(None, "asc", 10, 0, None), scans)
+	for filterName, (value, filterScans) in filters.items():
+		filtersJson = json.dumps({filterName: value})
+		yield (f"{name} page filtered by {filterName}", lambda filtersJson=filtersJson: table.getPage(None, "asc", 10, 0, filtersJson), filterScans)
+	for sort in table.sortKeys:
+		keys = pagination.tableKeys(table.sortKeys, sort, "asc")
+		cursor = pagination.encodeCursor(sort, "asc", ["a"] * (len(keys) - 1) + [1], "next")
+		yield (f"{name} next page sorted by {sort}", lambda sort=sort, cursor=cursor: table.getPage(sort, "asc", 10, 0, None, cursor), scans)
+
+
+def _checks():
+	# (check name, call, tables it may scan)
+	yield ("getProjectById", lambda: database.getProjectById(1), ())
+	yield ("getProjectsByIds", lambda: database.getProjectsByIds([1, 2]), ())
+	yield ("getProjectWithPeople", lambda: database.getProjectWithPeople(1), ())
+	yield ("getProjectsCount", database.getProjectsCount, ("project",))
+	yield ("getProjectStudentsIds", lambda: database.getProjectStudentsIds(1), ())
+	yield ("project students", lambda: models.Student.query.with_parent(models.Project(id=1), "students").all(), ())
+	yield ("project supervisors", lambda: models.Supervisor.query.with_parent(models.Project(id=1), "supervisors").all(), ())
+	yield ("project courses", lambda: models.Course.query.with_parent(models.Project(id=1), "courses").all(), ())
+	yield ("getProjectsTableFilters", database.getProjectsTableFilters.__wrapped__, ("project",))
+	yield ("getPublishedProjectsYears", database.getPublishedProjectsYears, ())
+	yield ("getPublishedProjectsByYear", lambda: database.getPublishedProjectsByYear(2020).all(), ())
+	yield ("getPublishedProjectDetails", lambda: database.getPublishedProjectDetails(1), ())
+	yield ("searchPublishedProjects", lambda: database.searchPublishedProjects("a", 20), ())
+	yield ("refreshShowcaseSearch", lambda: database.refreshShowcaseSearch([1, 2]), ())
+	yield ("getStudentProjectsIds", lambda: database.getStudentProjectsIds(1), ())
+	yield from _tableChecks("projects table", database.projectsTable, {
+		"year": ("2020", ()),
+		# a semester or ongoing status is about half of the projects
+		"semester": ("A", ("project",)),
+		"status": ("ongoing", ("project",)),
+		"title": ("a", ())
+	}, ("project",))
+
+	yield ("getStudentsCount", database.getStudentsCount, ("student",))
+	yield ("getStudentById", lambda: database.getStudentById(1), ())
+	yield ("getStudentByStudentId", lambda: database.getStudentByStudentId("1"), ())
+	yield ("getStudentWithProjects", lambda: database.getStudentWithProjects("1"), ())
+	yield ("getStudentByEmail", lambda: database.getStudentByEmail("a@a"), ())
+	yield ("getCourseIdForStudentInProject", lambda: database.getCourseIdForStudentInProject(1, 1), ())
+	yield ("studentHasRelatedProjects", lambda: database.studentHasRelatedProjects(1), ())
+	yield ("isStudentEnrolledInProject", lambda: database.isStudentEnrolledInProject(1, 1), ())
+	yield ("student projects", lambda: models.Project.query.with_parent(models.Student(id=1), "projects").all(), ())
+	yield ("getStudentsTableFilters", database.getStudentsTableFilters.__wrapped__, ("student_last_project",))
+	yield from _tableChecks("students table", database.studentsTable, {
+		"year": ("2020", ()),
+		"semester": ("A", ("student_last_project",)),
+		"firstNameHeb": ("a", ()),
+		"lastProjectTitle": ("a", ()),
+		"lastProjectStatus": ("ongoing", ("student_last_project",))
+	}, ("student_last_project",))
+	yield ("getStudentsTableForProjectFilters", database.getStudentsTableForProjectFilters.__wrapped__, ("student",))
+	yield from _tableChecks("students table for project", database.studentsForProjectTable, {
+		"registrationYear": ("2020", ()),
+		"registrationSemester": ("A", ("student",)),
+		"firstNameHeb": ("a", ())
+	}, ("student",))
+	yield ("refreshStudentsLastProject", lambda: database.refreshStudentsLastProject([1, 2]), ())
+	yield ("checkStudentsLastProject", database.checkStudentsLastProject, ("student", "student_last_project"))
+
+	yield ("getCoursesCount", database.getCoursesCount, ("course",))
+	yield ("getCourseById", lambda: database.getCourseById(1), ())
+	yield ("getAllCourses", database.getAllCourses, ("course",))
+	yield ("course projects", lambda: models.Project.query.with_parent(models.Course(id=1), "projects").all(), ())
+	yield ("default course", lambda: models.Course.query.filter_by(isDefault=True).first(), ())
+	# courses, supervisors and proposed projects are short lists, their text filters scan them
+	yield from _tableChecks("courses table", database.coursesTable, {
+		"name": ("a", ("course",)),
+		"number": ("1", ("course",))
+	}, ("course",))
+
+	yield ("getSupervisorById", lambda: database.getSupervisorById(1), ())
+	yield ("getAllSupervisors", database.getAllSupervisors, ("supervisor",))
+	yield ("getActiveSupervisors", database.getActiveSupervisors, ())
+	yield ("getSupervisorsCount", database.getSupervisorsCount, ("supervisor",))
+	yield ("supervisor projects", lambda: models.Project.query.with_parent(models.Supervisor(id=1), "projects").all(), ())
+	yield ("supervisor proposed projects", lambda: models.ProposedProject.query.with_parent(models.Supervisor(id=1), "proposedProjects").all(), ())
+	yield from _tableChecks("supervisors table", database.supervisorsTable, {
+		"status": ("active", ())
+	}, ("supervisor",))
+
+	yield ("getAllPublishedProposedProjects", database.getAllPublishedProposedProjects, ())
+	yield ("getAllProposedProjects", database.getAllProposedProjects, ("proposed_project",))
+	yield ("getLimitedProposedProjects", lambda: database.getLimitedProposedProjects(3), ("proposed_project",))
+	yield ("getProposedProjectById", lambda: database.getProposedProjectById(1), ())
+	yield ("getProposedProjectsCount", database.getProposedProjectsCount, ("proposed_project",))
+	yield ("getProposedProjectByTitle", lambda: database.getProposedProjectByTitle("a"), ())
+	yield ("getProposedProjectsTableFilters", database.getProposedProjectsTableFilters.__wrapped__, ("proposed_project",))
+	yield ("proposed project supervisors", lambda: models.Supervisor.query.with_parent(models.ProposedProject(id=1), "supervisors").all(), ())
+	yield from _tableChecks("proposed projects table", database.proposedProjectsTable, {
+		"title": ("a", ())
+	}, ("proposed_project",))
+
+	yield ("getUserByUserId", lambda: database.getUserByUserId("1"), ())
+	yield ("getAdminByAdminId", lambda: database.getAdminByAdminId("1"), ())
+	yield ("getAdminsCount", database.getAdminsCount, ("admin",))
+	# the totals are counts of whole tables
+	yield ("getLabOverview", database.getLabOverview, ("project", "student", "proposed_project", "supervisor"))
+	yield ("getMediaJobById", lambda: database.getMediaJobById(1), ())
+	yield ("getPendingMediaJobs", database.getPendingMediaJobs, ())
+	# called once for every processed image
+	yield ("getProjectsIdsShowingImage project doc", lambda: database.getProjectsIdsShowingImage("project_doc/image", "a.png"), ("project",))
+	yield ("getProjectsIdsShowingImage profile", lambda: database.getProjectsIdsShowingImage("images/profile", "a.png"), ("student",))
+	yield ("getStoredFile", lambda: database.getStoredFile("static/images/profile", "a.png"), ())
+	yield ("isBlobReferenced", lambda: database.isBlobReferenced("a"), ())
+	yield ("getActiveYoutubeJob", lambda: database.getActiveYoutubeJob(1, "upload"), ())
+	# the workers look for a due job every few seconds
+	yield ("getDueYoutubeJob", database.getDueYoutubeJob, ())
+	yield ("getWatchedYoutubeJobs", database.getWatchedYoutubeJobs, ())
+	yield ("getYoutubeJobsOverview", database.getYoutubeJobsOverview, ())
+	# every process reads the last invalidation id before its requests
+	yield ("getLastCacheInvalidationId", database.getLastCacheInvalidationId, ())
+	yield ("getCacheInvalidationsAfter", lambda: database.getCacheInvalidationsAfter(1), ())
+
+
+
+@pytest.mark.parametrize("name, call, scans", list(_checks()), ids=[name for name, _, _ in _checks()])
+def testQueryPlan(seededDatabase, name, call, scans):
+	plans = []
+	try:
+		with explainStatements(plans):
+			call()
+	finally:
+		db.session.rollback()
+	assert plans, "{} sent no statements".format(name)
+	failures = []
+	for statement, plan in plans:
+		unexpectedScans = scannedTables(statement, plan) - set(scans)
+		if unexpectedScans:
+			failures.append("{} scans {}:\n{}\n    {}".format(name, ", ".join(sorted(unexpectedScans)), statement, "\n    ".join(plan)))
+	assert not failures, "\n\n".join(failures)
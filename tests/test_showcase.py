@@ -0,0 +1,46 @@
+import os
+import json
+from avr import app
+from avr import database
+from avr import showcase
+
+# The showcase cache file: the requests don't write it, save() (of the process that runs the YouTube jobs and of the
+# rebuild command) writes every published year and project, and a change of the cache is saved by the next save.
+
+
+def _read():
+	with open(app.config['SHOWCASE_CACHE_FILE'], encoding="utf8") as f:
+		return json.load(f)
+
+
+def testRequestsDontWriteTheFile(seededDatabase):
+	cacheFile = app.config['SHOWCASE_CACHE_FILE']
+	if os.path.exists(cacheFile):
+		os.remove(cacheFile)
+	for year in database.getPublishedProjectsYears():
+		showcase.yearJson(year)
+	assert showcase.projectJson(1) is not None
+	assert not os.path.exists(cacheFile)
+
+
+def testSaveWritesEveryPublishedEntry(seededDatabase):
+	showcase.save()
+	data = _read()
+	years = database.getPublishedProjectsYears()
+	assert sorted(int(year) for year in data["years"]) == sorted(years)
+	# the published (and approved) projects of the seed are 1, 7, 13, 19 and 25
+	assert sorted(int(id) for id in data["projects"]) == [1, 7, 13, 19, 25]
+	assert not os.path.exists(app.config['SHOWCASE_CACHE_FILE'] + ".tmp")
+
+
+def testChangeIsSavedByTheNextSave(seededDatabase):
+	showcase.save()
+	assert showcase._savedGeneration == showcase._generation
+	title = database.getProjectById(7).title
+	database.updateProject(7, {"title": "changed title"})
+	try:
+		assert showcase._savedGeneration != showcase._generation
+		showcase.save()
+		assert "changed title" in _read()["projects"]["7"]
+	finally:
+		database.updateProject(7, {"title": title})
@@ -0,0 +1,64 @@
+import os
+import json
+import multiprocessing
+import pytest
+from datetime import datetime, timedelta
+from avr.youtubeUpload import youtubeUpload
+import fakeYoutube
+
+# How the YouTube calls use the clients and count their quota, against the fake YouTube service: the calls are spread
+# over the clients, a client that exceeded its quota is skipped until the next quota day, and the quota several
+# processes use at the same time is all counted.
+
+clients = range(1, youtubeUpload.num_of_clients + 1)
+
+
+@pytest.fixture
+def service():
+	# client 2 exceeds its quota on its second update
+	with fakeYoutube.FakeYoutube({2: youtubeUpload.QUOTA_COSTS["update"] + 10}) as service, fakeYoutube.fakeClients(service):
+		yield service
+
+
+def testCallsAreSpreadOverClients(service):
+	assert all(youtubeUpload.setVideoToPublic("a{}".format(clientNum)) for clientNum in clients)
+	assert all(service.calls[clientNum] == 1 for clientNum in clients), dict(service.calls)
+
+
+def testQuotaExceededCallIsSentByAnotherClient(service):
+	for videoId in ("a", "b"):
+		assert all(youtubeUpload.setVideoToPublic("{}{}".format(videoId, clientNum)) for clientNum in clients)
+	assert youtubeUpload.get_quota()["exhausted"] == [2]
+
+
+def testExhaustedClientIsSkipped(service):
+	for clientNum in clients:
+		youtubeUpload.setVideoToPublic("a{}".format(clientNum))
+		youtubeUpload.setVideoToPublic("b{}".format(clientNum))
+	exhaustedCalls = service.calls[2]
+	assert youtubeUpload.getProcessingDetails(["c{}".format(i) for i in range(50)])
+	assert youtubeUpload.deleteVideo("d")[0] == "success"
+	assert service.calls[2] == exhaustedCalls
+	assert 2 not in youtubeUpload.get_clients("update")
+
+
+def testNewQuotaDayHasNoExhaustedClients(service):
+	youtubeUpload.record_quota_exceeded(2)
+	with open(youtubeUpload._quota_path) as f:
+		quota = json.load(f)
+	quota["day"] = (datetime.now(youtubeUpload.QUOTA_TIMEZONE).date() - timedelta(days=1)).isoformat()
+	with open(youtubeUpload._quota_path, "w") as f:
+		json.dump(quota, f)
+	assert 2 in youtubeUpload.get_clients("update")
+	assert youtubeUpload.get_quota()["exhausted"] == []
+
+
+def testQuotaOfSeveralProcessesIsAllCounted(service):
+	if os.path.exists(youtubeUpload._quota_path):
+		os.remove(youtubeUpload._quota_path)
+	processes = [multiprocessing.Process(target=fakeYoutube.recordUsage, args=(youtubeUpload._quota_path, 50)) for i in range(4)]
+	for process in processes:
+		process.start()
+	for process in processes:
+		process.join()
+	assert youtubeUpload.get_quota()["used"].get("1", 0) == 4 * 50 * youtubeUpload.QUOTA_COSTS["list"]
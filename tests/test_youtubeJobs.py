@@ -0,0 +1,110 @@
+import pytest
+from datetime import datetime, timedelta
+from avr import app, db, models
+from avr import database
+from avr import youtubeJobs
+import fakeYoutube
+
+# The scheduling of the YouTube jobs: one worker claims a job, the leases of the running jobs, the retries of the
+# failed attempts, and the processing checks of the uploaded videos (against the fake YouTube service).
+
+
+@pytest.fixture
+def jobs(seededDatabase, monkeypatch):
+	monkeypatch.setattr(youtubeJobs, "_owner", "test")
+	yield
+	models.YoutubeJob.query.delete()
+	db.session.commit()
+	youtubeJobs._processingChecks.clear()
+
+
+def testJobIsClaimedOnce(jobs):
+	jobId = database.addYoutubeJob(1, "setPublic", 3)
+	job = database.claimYoutubeJob("first")
+	assert (job.id, job.status, job.claimedBy) == (jobId, "running", "first")
+	assert job.heartbeatAt is not None
+	assert database.claimYoutubeJob("second") is None
+
+
+def testExpiredLeaseIsQueuedAgain(jobs):
+	renewedId = database.addYoutubeJob(1, "setPublic", 3)
+	expiredId = database.addYoutubeJob(2, "setPublic", 3)
+	database.claimYoutubeJob("test")
+	database.claimYoutubeJob("stopped")
+	models.YoutubeJob.query.update({"heartbeatAt": datetime.utcnow() - timedelta(seconds=app.config['YOUTUBE_JOB_LEASE'] + 60)})
+	db.session.commit()
+	youtubeJobs._runningJobs.add(renewedId)
+	try:
+		assert youtubeJobs.renewLeases() == 1
+	finally:
+		youtubeJobs._runningJobs.discard(renewedId)
+	assert database.getYoutubeJobById(renewedId).status == "running"
+	expiredJob = database.getYoutubeJobById(expiredId)
+	assert (expiredJob.status, expiredJob.claimedBy) == ("queued", None)
+
+
+def testLostLeaseDoesNotFinishTheJob(jobs):
+	jobId = database.addYoutubeJob(1, "setPublic", 3)
+	database.claimYoutubeJob("stopped")
+	database.requeueExpiredYoutubeJobs(datetime.utcnow() + timedelta(seconds=1))
+	assert database.retryYoutubeJob(jobId, datetime.utcnow(), "error", True, "stopped") is None
+	database.finishYoutubeJob(jobId, "stopped")
+	assert database.getYoutubeJobById(jobId).status == "queued"
+
+
+def testFailedAttemptsAreRetriedThenFailed(jobs, monkeypatch):
+	def setPublic(projectId):
+		raise youtubeJobs.RetryJob("the video could not be set to public")
+
+	_, attempts, firstDelay, queuedFields, failedFields = youtubeJobs.jobKinds["setPublic"]
+	monkeypatch.setitem(youtubeJobs.jobKinds, "setPublic", (setPublic, 2, firstDelay, queuedFields, failedFields))
+	jobId = youtubeJobs.enqueue("setPublic", 3)
+	assert database.getProjectById(3).youtubeVideoPublicStatus == "changing"
+	assert youtubeJobs.runDueJobs() == 1
+	job = database.getYoutubeJobById(jobId)
+	assert (job.status, job.attempts) == ("queued", 1)
+	assert job.runAt > datetime.utcnow() + timedelta(seconds=firstDelay * 0.8 - 1)
+	# the retry is due later, nothing runs now
+	assert youtubeJobs.runDueJobs() == 0
+	database.retryYoutubeJob(jobId, datetime.utcnow(), countAttempt=False)
+	assert youtubeJobs.runDueJobs() == 1
+	assert database.getYoutubeJobById(jobId).status == "failed"
+	assert database.getProjectById(3).youtubeVideoPublicStatus == "failed"
+	assert youtubeJobs.retry(jobId)
+	assert database.getYoutubeJobById(jobId).status == "queued"
+
+
+def testRetryDelayGrows():
+	_, _, firstDelay, _, _ = youtubeJobs.jobKinds["upload"]
+	for attempts in range(1, 12):
+		delay = youtubeJobs._retryDelay("upload", attempts)
+		expected = min(firstDelay * 2 ** (attempts - 1), youtubeJobs.maxRetryDelay)
+		assert expected * 0.8 <= delay <= expected * 1.2
+
+
+def testProcessingCheckFollowsTheTimeLeft(jobs):
+	minimum = app.config['YOUTUBE_PROCESSING_POLL_INTERVAL']
+	maximum = app.config['YOUTUBE_PROCESSING_MAX_POLL_INTERVAL']
+	# no estimate: the delay doubles from the shortest one
+	youtubeJobs._scheduleCheck("a", None, 0)
+	assert youtubeJobs._processingChecks["a"]["delay"] == minimum
+	youtubeJobs._scheduleCheck("a", None, 10)
+	assert youtubeJobs._processingChecks["a"]["delay"] == 2 * minimum
+	# half the time left, between the shortest and the longest delay
+	youtubeJobs._scheduleCheck("b", 100 * 1000, 0)
+	assert youtubeJobs._processingChecks["b"]["delay"] == 50
+	youtubeJobs._scheduleCheck("c", 10 ** 9, 0)
+	assert youtubeJobs._processingChecks["c"]["delay"] == maximum
+	# the estimate went down twice as fast as the time passed, the check is twice as early
+	youtubeJobs._scheduleCheck("b", 200 * 1000, 0)
+	youtubeJobs._scheduleCheck("b", 100 * 1000, 50)
+	assert youtubeJobs._processingChecks["b"]["delay"] == 25
+
+
+def testProcessedVideoFinishesItsJob(jobs):
+	database.updateProject(4, {"youtubeVideo": "processedVideo", "youtubeProcessingStatus": ""})
+	jobId = youtubeJobs.enqueue("processing", 4)
+	with fakeYoutube.FakeYoutube() as service, fakeYoutube.fakeClients(service):
+		youtubeJobs.pollProcessing()
+	assert database.getYoutubeJobById(jobId).status == "done"
+	assert database.getProjectById(4).youtubeProcessingStatus == "processed"